@@ -0,0 +1,395 @@
+import numpy as np
+from typing import Optional
+
+# BC7 partition tables, one bit (2 subsets) or two bits (3 subsets) per texel
+BC7_PARTITIONS_2 = [
+    0xcccc, 0x8888, 0xeeee, 0xecc8, 0xc880, 0xfeec, 0xfec8, 0xec80,
+    0xc800, 0xffec, 0xfe80, 0xe800, 0xffe8, 0xff00, 0xfff0, 0xf000,
+    0xf710, 0x008e, 0x7100, 0x08ce, 0x008c, 0x7310, 0x3100, 0x8cce,
+    0x088c, 0x3110, 0x6666, 0x366c, 0x17e8, 0x0ff0, 0x718e, 0x399c,
+    0xaaaa, 0xf0f0, 0x5a5a, 0x33cc, 0x3c3c, 0x55aa, 0x9696, 0xa55a,
+    0x73ce, 0x13c8, 0x324c, 0x3bdc, 0x6996, 0xc33c, 0x9966, 0x0660,
+    0x0272, 0x04e4, 0x4e40, 0x2720, 0xc936, 0x936c, 0x39c6, 0x639c,
+    0x9336, 0x9cc6, 0x817e, 0xe718, 0xccf0, 0x0fcc, 0x7744, 0xee22,
+]
+
+BC7_PARTITIONS_3 = [
+    0xaa685050, 0x6a5a5040, 0x5a5a4200, 0x5450a0a8, 0xa5a50000, 0xa0a05050, 0x5555a0a0, 0x5a5a5050,
+    0xaa550000, 0xaa555500, 0xaaaa5500, 0x90909090, 0x94949494, 0xa4a4a4a4, 0xa9a59450, 0x2a0a4250,
+    0xa5945040, 0x0a425054, 0xa5a5a500, 0x55a0a0a0, 0xa8a85454, 0x6a6a4040, 0xa4a45000, 0x1a1a0500,
+    0x0050a4a4, 0xaaa59090, 0x14696914, 0x69691400, 0xa08585a0, 0xaa821414, 0x50a4a450, 0x6a5a0200,
+    0xa9a58000, 0x5090a0a8, 0xa8a09050, 0x24242424, 0x00aa5500, 0x24924924, 0x24499224, 0x50a50a50,
+    0x500aa550, 0xaaaa4444, 0x66660000, 0xa5a0a5a0, 0x50a050a0, 0x69286928, 0x44aaaa44, 0x66666600,
+    0xaa444444, 0x54a854a8, 0x95809580, 0x96969600, 0xa85454a8, 0x80959580, 0xaa141414, 0x96960000,
+    0xaaaa1414, 0xa05050a0, 0xa0a5a5a0, 0x96000000, 0x40804080, 0xa9a8a9a8, 0xaaaaaa44, 0x2a4a5254,
+]
+
+# Anchor texels of the second subset (2 subsets) and of the second and third subsets (3 subsets)
+BC7_ANCHORS_2 = [
+    15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,
+    15, 2, 8, 2, 2, 8, 8, 15, 2, 8, 2, 2, 8, 8, 2, 2,
+    15, 15, 6, 8, 2, 8, 15, 15, 2, 8, 2, 2, 2, 15, 15, 6,
+    6, 2, 6, 8, 15, 15, 2, 2, 15, 15, 15, 15, 15, 2, 2, 15,
+]
+
+BC7_ANCHORS_3_SECOND = [
+    3, 3, 15, 15, 8, 3, 15, 15, 8, 8, 6, 6, 6, 5, 3, 3,
+    3, 3, 8, 15, 3, 3, 6, 10, 5, 8, 8, 6, 8, 5, 15, 15,
+    8, 15, 3, 5, 6, 10, 8, 15, 15, 3, 15, 5, 15, 15, 15, 15,
+    3, 15, 5, 5, 5, 8, 5, 10, 5, 10, 8, 13, 15, 12, 3, 3,
+]
+
+BC7_ANCHORS_3_THIRD = [
+    15, 8, 8, 3, 15, 15, 3, 8, 15, 15, 15, 15, 15, 15, 15, 8,
+    15, 8, 15, 3, 15, 8, 15, 8, 3, 15, 6, 10, 15, 15, 10, 8,
+    15, 3, 15, 10, 10, 8, 9, 10, 6, 15, 8, 15, 3, 6, 6, 8,
+    15, 3, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 3, 15, 15, 8,
+]
+
+# Interpolation weights by index size in bits
+BC7_WEIGHTS = {
+    2: [0, 21, 43, 64],
+    3: [0, 9, 18, 27, 37, 46, 55, 64],
+    4: [0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64],
+}
+
+# BC7 modes: (subsets, partition bits, rotation bits, index selection bits,
+#             color bits, alpha bits, P-bits, index bits, secondary index bits)
+BC7_MODES = [
+    (3, 4, 0, 0, 4, 0, "unique", 3, 0),
+    (2, 6, 0, 0, 6, 0, "shared", 3, 0),
+    (3, 6, 0, 0, 5, 0, None, 2, 0),
+    (2, 6, 0, 0, 7, 0, "unique", 2, 0),
+    (1, 0, 2, 1, 5, 6, None, 2, 3),
+    (1, 0, 2, 0, 7, 8, None, 2, 2),
+    (1, 0, 0, 0, 7, 7, "unique", 4, 0),
+    (2, 6, 0, 0, 5, 5, "unique", 2, 0),
+]
+
+
+def _texel_table(table, bits_per_texel: int) -> np.ndarray:
+    """Unpacks a table of packed per texel values into a (len(table), 16) array"""
+    values = np.array(table, dtype=np.uint32)[:, None]
+    shifts = np.arange(16, dtype=np.uint32) * bits_per_texel
+    return ((values >> shifts) & ((1 << bits_per_texel) - 1)).astype(np.int64)
+
+
+_SUBSETS = {
+    1: np.zeros((1, 16), dtype=np.int64),
+    2: _texel_table(BC7_PARTITIONS_2, 1),
+    3: _texel_table(BC7_PARTITIONS_3, 2),
+}
+
+_ANCHORS = {
+    1: np.zeros((1, 1), dtype=np.int64),
+    2: np.stack([np.zeros(64, dtype=np.int64), BC7_ANCHORS_2], axis=1),
+    3: np.stack([np.zeros(64, dtype=np.int64), BC7_ANCHORS_3_SECOND, BC7_ANCHORS_3_THIRD], axis=1),
+}
+
+
+def _to_blocks(data, bytes_per_block: int) -> np.ndarray:
+    """Views the compressed data as an (n, bytes per block) array"""
+    data = np.frombuffer(data, dtype=np.uint8)
+    count = len(data) // bytes_per_block
+    return data[:count * bytes_per_block].reshape(count, bytes_per_block)
+
+
+def _expand_bits(values: np.ndarray, bits: int) -> np.ndarray:
+    """Expands values of the given bit depth to 8 bits by replicating the high bits"""
+    return (values << (8 - bits)) | (values >> (2 * bits - 8))
+
+
+def _decode_color_blocks(blocks: np.ndarray, punchthrough: bool) -> np.ndarray:
+    """
+    Decodes BC1 color blocks (the first 8 bytes of BC1, BC2 and BC3 blocks)
+
+    Args:
+        blocks: (n, 8) array with the color blocks
+        punchthrough: If True, endpoints with color0 <= color1 select the 3 color mode with transparency
+
+    Returns:
+        (n, 16, 4) array with RGBA texels
+    """
+    endpoints = blocks[:, :4].copy().view("<u2").astype(np.int32)
+    red = _expand_bits((endpoints >> 11) & 0x1f, 5)
+    green = _expand_bits((endpoints >> 5) & 0x3f, 6)
+    blue = _expand_bits(endpoints & 0x1f, 5)
+    color0 = np.stack([red[:, 0], green[:, 0], blue[:, 0]], axis=1)
+    color1 = np.stack([red[:, 1], green[:, 1], blue[:, 1]], axis=1)
+
+    palette = np.empty((len(blocks), 4, 4), dtype=np.int32)
+    palette[:, :, 3] = 255
+    palette[:, 0, :3] = color0
+    palette[:, 1, :3] = color1
+    palette[:, 2, :3] = (2 * color0 + color1 + 1) // 3
+    palette[:, 3, :3] = (color0 + 2 * color1 + 1) // 3
+
+    if punchthrough:
+        three_colors = endpoints[:, 0] <= endpoints[:, 1]
+        palette[three_colors, 2, :3] = (color0[three_colors] + color1[three_colors] + 1) // 2
+        palette[three_colors, 3] = 0
+
+    indices = blocks[:, 4:8].copy().view("<u4").astype(np.int64)
+    indices = (indices >> (np.arange(16) * 2)) & 3
+    return np.take_along_axis(palette, indices[:, :, None], axis=1)
+
+
+def _decode_alpha_blocks(blocks: np.ndarray, signed: bool = False) -> np.ndarray:
+    """
+    Decodes BC4 blocks (also the alpha of BC3 and each channel of BC5)
+
+    Args:
+        blocks: (n, 8) array with the blocks
+        signed: If True, the endpoints are signed values mapped to 0-255
+
+    Returns:
+        (n, 16) array with the decoded values
+    """
+    if signed:
+        endpoints = blocks[:, :2].view(np.int8).astype(np.int32)
+        endpoints = np.maximum(endpoints, -127)
+    else:
+        endpoints = blocks[:, :2].astype(np.int32)
+    value0, value1 = endpoints[:, 0:1], endpoints[:, 1:2]
+
+    steps = np.arange(1, 7)
+    eight_values = ((7 - steps) * value0 + steps * value1 + 3) // 7
+    six_values = ((5 - steps[:4]) * value0 + steps[:4] * value1 + 2) // 5
+    low, high = (-127, 127) if signed else (0, 255)
+    six_values = np.concatenate([six_values, np.full_like(value0, low), np.full_like(value0, high)], axis=1)
+
+    palette = np.where(value0 > value1, eight_values, six_values)
+    palette = np.concatenate([value0, value1, palette], axis=1)
+    if signed:
+        palette = ((palette + 127) * 255 + 127) // 254
+
+    padded = np.zeros((len(blocks), 8), dtype=np.uint8)
+    padded[:, :6] = blocks[:, 2:8]
+    indices = padded.view("<u8").astype(np.uint64)
+    indices = ((indices >> (np.arange(16, dtype=np.uint64) * 3)) & 7).astype(np.int64)
+    return np.take_along_axis(palette, indices, axis=1)
+
+
+def decode_bc1(data) -> np.ndarray:
+    """Decodes BC1 data into an (n, 16, 4) array of RGBA texels"""
+    return _decode_color_blocks(_to_blocks(data, 8), punchthrough=True)
+
+
+def decode_bc2(data) -> np.ndarray:
+    """Decodes BC2 data into an (n, 16, 4) array of RGBA texels"""
+    blocks = _to_blocks(data, 16)
+    texels = _decode_color_blocks(blocks[:, 8:], punchthrough=False)
+    alpha = blocks[:, :8].copy().view("<u8").astype(np.uint64)
+    alpha = ((alpha >> (np.arange(16, dtype=np.uint64) * 4)) & 0xf).astype(np.int32)
+    texels[:, :, 3] = alpha * 17
+    return texels
+
+
+def decode_bc3(data) -> np.ndarray:
+    """Decodes BC3 data into an (n, 16, 4) array of RGBA texels"""
+    blocks = _to_blocks(data, 16)
+    texels = _decode_color_blocks(blocks[:, 8:], punchthrough=False)
+    texels[:, :, 3] = _decode_alpha_blocks(blocks[:, :8])
+    return texels
+
+
+def decode_bc4(data, signed: bool = False) -> np.ndarray:
+    """Decodes BC4 data into an (n, 16, 4) array of grayscale texels"""
+    values = _decode_alpha_blocks(_to_blocks(data, 8), signed)
+    texels = np.empty(values.shape + (4,), dtype=np.int32)
+    texels[:, :, :3] = values[:, :, None]
+    texels[:, :, 3] = 255
+    return texels
+
+
+def decode_bc5(data, signed: bool = False) -> np.ndarray:
+    """Decodes BC5 data into an (n, 16, 4) array with the two channels in red and green"""
+    blocks = _to_blocks(data, 16)
+    texels = np.zeros((len(blocks), 16, 4), dtype=np.int32)
+    texels[:, :, 0] = _decode_alpha_blocks(blocks[:, :8], signed)
+    texels[:, :, 1] = _decode_alpha_blocks(blocks[:, 8:], signed)
+    texels[:, :, 3] = 255
+    return texels
+
+
+def _read_bits(bits: np.ndarray, start: int, count: int) -> np.ndarray:
+    """Reads a little endian field of count bits starting at start from each row of a bit array"""
+    if count == 0:
+        return np.zeros(len(bits), dtype=np.int32)
+    weights = 1 << np.arange(count, dtype=np.int32)
+    return bits[:, start:start + count].astype(np.int32) @ weights
+
+
+def _read_indices(bits: np.ndarray, start: int, index_bits: int, anchors: np.ndarray) -> np.ndarray:
+    """
+    Reads the 16 texel indices of each block, where anchor texels are stored with one bit less
+
+    Args:
+        bits: (n, 128) bit array of the blocks
+        start: Position of the first index
+        index_bits: Size of the indices in bits
+        anchors: (n, subsets) array with the anchor texel of each subset
+
+    Returns:
+        (n, 16) array with the indices
+    """
+    is_anchor = (np.arange(16)[None, :, None] == anchors[:, None, :]).any(axis=2)
+    widths = index_bits - is_anchor.astype(np.int64)
+    offsets = start + np.cumsum(widths, axis=1) - widths
+
+    bit_numbers = np.arange(index_bits)
+    positions = np.minimum(offsets[:, :, None] + bit_numbers, 127)
+    values = np.take_along_axis(bits, positions.reshape(len(bits), -1), axis=1).reshape(positions.shape)
+    values = values.astype(np.int64) * (bit_numbers < widths[:, :, None])
+    return values @ (1 << bit_numbers)
+
+
+def _decode_bc7_mode(bits: np.ndarray, mode: int) -> np.ndarray:
+    """Decodes the BC7 blocks of a single mode into an (n, 16, 4) array of RGBA texels"""
+    (subsets, partition_bits, rotation_bits, selection_bits,
+     color_bits, alpha_bits, pbit_type, index_bits, index2_bits) = BC7_MODES[mode]
+    count = len(bits)
+    position = mode + 1
+
+    partition = _read_bits(bits, position, partition_bits)
+    position += partition_bits
+    rotation = _read_bits(bits, position, rotation_bits)
+    position += rotation_bits
+    selection = _read_bits(bits, position, selection_bits)
+    position += selection_bits
+
+    # Endpoints are stored channel by channel
+    endpoint_count = subsets * 2
+    endpoints = np.full((count, endpoint_count, 4), 255, dtype=np.int32)
+    channels = 4 if alpha_bits else 3
+    for channel in range(channels):
+        bits_per_value = color_bits if channel < 3 else alpha_bits
+        for endpoint in range(endpoint_count):
+            endpoints[:, endpoint, channel] = _read_bits(bits, position, bits_per_value)
+            position += bits_per_value
+
+    if pbit_type is not None:
+        pbit_count = endpoint_count if pbit_type == "unique" else subsets
+        pbits = bits[:, position:position + pbit_count].astype(np.int32)
+        position += pbit_count
+        if pbit_type == "shared":
+            pbits = np.repeat(pbits, 2, axis=1)
+        endpoints[:, :, :channels] = (endpoints[:, :, :channels] << 1) | pbits[:, :, None]
+        color_bits += 1
+        alpha_bits += 1 if alpha_bits else 0
+
+    endpoints[:, :, :3] = _expand_bits(endpoints[:, :, :3], color_bits)
+    if alpha_bits:
+        endpoints[:, :, 3] = _expand_bits(endpoints[:, :, 3], alpha_bits)
+
+    anchors = _ANCHORS[subsets][partition]
+    indices = _read_indices(bits, position, index_bits, anchors)
+    position += 16 * index_bits - subsets
+    subset_of_texel = _SUBSETS[subsets][partition]
+
+    weights = np.array(BC7_WEIGHTS[index_bits])[indices]
+    if index2_bits:
+        indices2 = _read_indices(bits, position, index2_bits, anchors)
+        weights2 = np.array(BC7_WEIGHTS[index2_bits])[indices2]
+        swap = selection[:, None] == 1
+        color_weights = np.where(swap, weights2, weights)
+        alpha_weights = np.where(swap, weights, weights2)
+    else:
+        color_weights = alpha_weights = weights
+
+    start = np.take_along_axis(endpoints, (subset_of_texel * 2)[:, :, None], axis=1)
+    end = np.take_along_axis(endpoints, (subset_of_texel * 2 + 1)[:, :, None], axis=1)
+    texel_weights = np.empty((count, 16, 4), dtype=np.int32)
+    texel_weights[:, :, :3] = color_weights[:, :, None]
+    texel_weights[:, :, 3] = alpha_weights
+    texels = ((64 - texel_weights) * start + texel_weights * end + 32) >> 6
+
+    if rotation_bits:
+        for channel in range(3):
+            rotated = rotation == channel + 1
+            texels[rotated, :, channel], texels[rotated, :, 3] = \
+                texels[rotated, :, 3].copy(), texels[rotated, :, channel].copy()
+
+    return texels
+
+
+def decode_bc7(data) -> np.ndarray:
+    """Decodes BC7 data into an (n, 16, 4) array of RGBA texels"""
+    blocks = _to_blocks(data, 16)
+    bits = np.unpackbits(blocks, axis=1, bitorder="little")
+
+    # The mode is the position of the first set bit, blocks without any are invalid
+    modes = np.argmax(bits[:, :8], axis=1)
+    modes[bits[:, :8].max(axis=1) == 0] = -1
+
+    texels = np.zeros((len(blocks), 16, 4), dtype=np.int32)
+    for mode in range(8):
+        selected = np.nonzero(modes == mode)[0]
+        if len(selected):
+            texels[selected] = _decode_bc7_mode(bits[selected], mode)
+    return texels
+
+
+# Block decoders by the name of the NUTEXB format
+BLOCK_DECODERS = {
+    "BC1Unorm": decode_bc1,
+    "BC1Srgb": decode_bc1,
+    "BC2Unorm": decode_bc2,
+    "BC2Srgb": decode_bc2,
+    "BC3Unorm": decode_bc3,
+    "BC3Srgb": decode_bc3,
+    "BC4Unorm": decode_bc4,
+    "BC4Snorm": lambda data: decode_bc4(data, signed=True),
+    "BC5Unorm": decode_bc5,
+    "BC5Snorm": lambda data: decode_bc5(data, signed=True),
+    "BC7Unorm": decode_bc7,
+    "BC7Srgb": decode_bc7,
+}
+
+
+def decode_uncompressed(format_name: str, data, width: int, height: int) -> Optional[np.ndarray]:
+    """
+    Converts uncompressed pixels to an (height, width, 4) RGBA array
+
+    Returns:
+        The image or None if the format is not supported
+    """
+    if format_name == "R8Unorm":
+        values = np.frombuffer(data, dtype=np.uint8)[:width * height].reshape(height, width)
+        image = np.empty((height, width, 4), dtype=np.uint8)
+        image[:, :, :3] = values[:, :, None]
+        image[:, :, 3] = 255
+        return image
+    if format_name in ("R8G8B8A8Unorm", "R8G8B8A8Srgb"):
+        return np.frombuffer(data, dtype=np.uint8)[:width * height * 4].reshape(height, width, 4).copy()
+    if format_name in ("B8G8R8A8Unorm", "B8G8R8A8Srgb"):
+        return np.frombuffer(data, dtype=np.uint8)[:width * height * 4].reshape(height, width, 4)[:, :, [2, 1, 0, 3]]
+    if format_name == "R32G32B32A32Float":
+        values = np.frombuffer(data, dtype="<f4")[:width * height * 4].reshape(height, width, 4)
+        return (np.clip(values, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+    return None
+
+
+def decode_blocks(format_name: str, data, width: int, height: int) -> Optional[np.ndarray]:
+    """
+    Decodes a linear (already deswizzled) surface into an RGBA image
+
+    Args:
+        format_name: Name of the image format (see nutexb.NUTEXB_FORMATS)
+        data: Blocks of the surface in row order
+        width: Width of the surface in pixels
+        height: Height of the surface in pixels
+
+    Returns:
+        (height, width, 4) uint8 array or None if the format is not supported
+    """
+    decoder = BLOCK_DECODERS.get(format_name)
+    if decoder is None:
+        return decode_uncompressed(format_name, data, width, height)
+
+    width_in_blocks = (width + 3) // 4
+    height_in_blocks = (height + 3) // 4
+    texels = decoder(data)[:width_in_blocks * height_in_blocks]
+    image = texels.reshape(height_in_blocks, width_in_blocks, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+    image = image.reshape(height_in_blocks * 4, width_in_blocks * 4, 4)
+    return np.clip(image[:height, :width], 0, 255).astype(np.uint8)
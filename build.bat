@@ -5,12 +5,12 @@ echo Creating executable for PyInstaller...
 pip install pyinstaller
 
 :: Texture Analyzer tools
-pyinstaller --noconfirm --onefile --console --add-data "texture_analyzer.py;." "texture_manager_gui.py"
+pyinstaller --noconfirm --onefile --console --add-data "texture_analyzer.py;." --add-data "junk_transaction.py;." --add-data "mod_config.py;." "texture_manager_gui.py"
 
 :: Reslotter tools
-pyinstaller --noconfirm --onefile --console --add-data "dir_info_with_files_trimmed.json;." --add-data "reslotter.py;." "reslotterGUI.py"
+pyinstaller --noconfirm --onefile --console --add-data "dir_info_with_files_trimmed.json;." --add-data "reslotter.py;." --add-data "mod_config.py;." --add-data "junk_transaction.py;." "reslotterGUI.py"
 
 :: Moveset optimizer tools
-pyinstaller --noconfirm --onefile --console --add-data "moveset_optimizer.py;." "moveset_optimizer_gui.py" --hidden-import PIL --hidden-import numpy
+pyinstaller --noconfirm --onefile --console --add-data "moveset_optimizer.py;." --add-data "nutexb.py;." --add-data "bcn.py;." --add-data "junk_transaction.py;." --add-data "mod_config.py;." "moveset_optimizer_gui.py" --hidden-import numpy
 
 echo Process complete. The executables are in the "dist" folder.
\ No newline at end of file
@@ -0,0 +1,276 @@
+import os
+import json
+import errno
+import shutil
+from typing import Dict, Optional
+
+# Files kept in the junk folder while a transaction is in progress
+JOURNAL_NAME = ".junk_journal.json"
+PENDING_CONFIG_NAME = ".config_pending.json"
+CONFIG_BACKUP_NAME = ".config_backup.json"
+
+
+def fsync_directory(directory: str):
+    """Flushes a directory entry to disk, where the platform supports it"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(path: str, data, **dump_kwargs):
+    """
+    Writes a JSON file through a temporary file in the same directory, which
+    replaces the target only once it is completely written to disk
+
+    Args:
+        path: Path to the JSON file
+        data: Object to serialize
+        dump_kwargs: Extra arguments for json.dump (indent, ensure_ascii...)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    fsync_directory(directory)
+
+
+def move_file(src: str, dst: str):
+    """Renames a file, copying it only if the destination is on another file system"""
+    # os.replace would silently overwrite it, a file already at dst is never lost
+    if os.path.exists(dst):
+        raise FileExistsError(errno.EEXIST, "Destination already exists", dst)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+
+class JunkTransaction:
+    """
+    Moves files to the junk folder and updates config.json as one operation
+
+    The whole batch is written to a journal before anything is touched, so an
+    interrupted run can be resumed or rolled back from it:
+    1. The new config.json and a backup of the current one are written to the junk folder
+    2. The journal with every move is written
+    3. The files are renamed into the junk folder
+    4. The new config.json replaces the old one
+    5. The journal is removed (commit)
+    """
+
+    def __init__(self, mod_directory: str, junk_dir: str = None):
+        """
+        Initializes the transaction
+
+        Args:
+            mod_directory: Path to the mod directory
+            junk_dir: Junk folder (optional, defaults to mod_directory/junk)
+        """
+        self.mod_directory = mod_directory
+        self.junk_dir = junk_dir or os.path.join(mod_directory, "junk")
+        self.moves = []            # Paths relative to the mod directory
+        self._move_set = set()     # Same paths, for fast duplicate checks in add()
+        self.config = None
+        self.config_dump_kwargs = {}
+        self._journal = None       # Journal of an interrupted transaction, see pending()
+
+    def add(self, file_path: str) -> bool:
+        """
+        Adds a file to move to the junk folder
+
+        Args:
+            file_path: Path of the file relative to the mod directory
+
+        Returns:
+            True if the file exists and was added, False otherwise
+        """
+        if not os.path.isfile(os.path.join(self.mod_directory, file_path)):
+            print(f"File not found, it will not be moved: {file_path}")
+            return False
+        if file_path not in self._move_set:
+            self._move_set.add(file_path)
+            self.moves.append(file_path)
+        return True
+
+    def set_config(self, config: Dict, **dump_kwargs):
+        """
+        Sets the config.json to write when the transaction is committed
+
+        Args:
+            config: Complete new configuration
+            dump_kwargs: Arguments for json.dump (defaults to indent=4)
+        """
+        self.config = config
+        self.config_dump_kwargs = dump_kwargs or {"indent": 4}
+
+    @property
+    def config_path(self) -> str:
+        return os.path.join(self.mod_directory, "config.json")
+
+    def commit(self) -> bool:
+        """
+        Performs every move and writes config.json, rolling everything back on error
+
+        Returns:
+            True if the transaction was committed, False if it was rolled back
+        """
+        if not self.moves and self.config is None:
+            return True
+
+        # Junk keeps the paths of the mod, a file left there by an earlier run would be overwritten
+        conflicts = [file_path for file_path in self.moves if os.path.exists(os.path.join(self.junk_dir, file_path))]
+        if conflicts:
+            print(f"{len(conflicts)} files already exist in the junk folder, nothing was moved:")
+            for file_path in conflicts:
+                print(f"  - {file_path}")
+            return False
+
+        os.makedirs(self.junk_dir, exist_ok=True)
+        journal = {
+            "moves": self.moves,
+            "junk_dir": os.path.relpath(self.junk_dir, self.mod_directory),
+            "config": self.config is not None,
+            "config_existed": os.path.exists(self.config_path),
+        }
+
+        try:
+            if self.config is not None:
+                write_json_atomic(os.path.join(self.junk_dir, PENDING_CONFIG_NAME), self.config, **self.config_dump_kwargs)
+                if os.path.exists(self.config_path):
+                    shutil.copy2(self.config_path, os.path.join(self.junk_dir, CONFIG_BACKUP_NAME))
+            write_json_atomic(os.path.join(self.junk_dir, JOURNAL_NAME), journal, indent=2)
+        except OSError as e:
+            print(f"Could not write the junk journal, nothing was moved: {e}")
+            self._cleanup()
+            return False
+
+        try:
+            self._apply(journal)
+        except OSError as e:
+            print(f"Error moving files to junk, rolling back: {e}")
+            self._rollback(journal)
+            return False
+
+        self._cleanup()
+        print(f"Moved {len(self.moves)} files to junk")
+        return True
+
+    def _apply(self, journal: Dict):
+        """Performs the moves of a journal that are not done yet and installs the new config"""
+        for file_path in journal["moves"]:
+            src = os.path.join(self.mod_directory, file_path)
+            dst = os.path.join(self.junk_dir, file_path)
+            if os.path.exists(src):
+                move_file(src, dst)
+            elif not os.path.exists(dst):
+                raise FileNotFoundError(errno.ENOENT, "File disappeared during the transaction", src)
+
+        pending_config = os.path.join(self.junk_dir, PENDING_CONFIG_NAME)
+        if journal["config"] and os.path.exists(pending_config):
+            os.replace(pending_config, self.config_path)
+            fsync_directory(self.mod_directory)
+
+    def _rollback(self, journal: Dict):
+        """Moves back every file of a journal that reached the junk folder and restores config.json"""
+        for file_path in reversed(journal["moves"]):
+            src = os.path.join(self.mod_directory, file_path)
+            dst = os.path.join(self.junk_dir, file_path)
+            if os.path.exists(dst) and not os.path.exists(src):
+                try:
+                    move_file(dst, src)
+                except OSError as e:
+                    print(f"Could not restore {file_path}: {e}")
+
+        pending_config = os.path.join(self.junk_dir, PENDING_CONFIG_NAME)
+        backup_config = os.path.join(self.junk_dir, CONFIG_BACKUP_NAME)
+        # The new config was already installed only if the pending file is gone
+        if journal["config"] and not os.path.exists(pending_config):
+            if os.path.exists(backup_config):
+                os.replace(backup_config, self.config_path)
+            elif not journal.get("config_existed", True) and os.path.exists(self.config_path):
+                os.remove(self.config_path)
+        self._cleanup()
+
+    def _cleanup(self):
+        for name in (JOURNAL_NAME, PENDING_CONFIG_NAME, CONFIG_BACKUP_NAME):
+            path = os.path.join(self.junk_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    @classmethod
+    def pending(cls, mod_directory: str, junk_dir: str = None) -> Optional['JunkTransaction']:
+        """
+        Returns the interrupted transaction of a mod, if its journal exists
+
+        Args:
+            mod_directory: Path to the mod directory
+            junk_dir: Junk folder (optional)
+        """
+        transaction = cls(mod_directory, junk_dir)
+        journal_path = os.path.join(transaction.junk_dir, JOURNAL_NAME)
+        if not os.path.exists(journal_path):
+            return None
+        try:
+            with open(journal_path, "r", encoding="utf-8") as f:
+                journal = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read the junk journal {journal_path}: {e}")
+            return None
+        transaction.moves = journal.get("moves", [])
+        transaction._move_set = set(transaction.moves)
+        transaction._journal = journal
+        return transaction
+
+    def resume(self) -> bool:
+        """Finishes an interrupted transaction loaded with pending()"""
+        try:
+            self._apply(self._journal)
+        except OSError as e:
+            print(f"Could not resume the junk transaction: {e}")
+            return False
+        self._cleanup()
+        print(f"Resumed junk transaction: {len(self.moves)} files in junk")
+        return True
+
+    def rollback(self) -> bool:
+        """Undoes an interrupted transaction loaded with pending()"""
+        self._rollback(self._journal)
+        print(f"Rolled back junk transaction of {len(self.moves)} files")
+        return True
+
+
+def recover_pending_transaction(mod_directory: str, junk_dir: str = None, rollback: bool = False) -> bool:
+    """
+    Resumes or rolls back the interrupted junk transaction of a mod, if any
+
+    Args:
+        mod_directory: Path to the mod directory
+        junk_dir: Junk folder (optional)
+        rollback: If True the transaction is undone, otherwise it is completed
+
+    Returns:
+        True if there was a transaction and it was recovered
+    """
+    transaction = JunkTransaction.pending(mod_directory, junk_dir)
+    if transaction is None:
+        return False
+    return transaction.rollback() if rollback else transaction.resume()
@@ -0,0 +1,413 @@
+import os
+import json
+import time
+import shutil
+from contextlib import contextmanager
+from typing import Dict, Iterable
+
+from junk_transaction import write_json_atomic
+
+CONFIG_NAME = "config.json"
+LOCK_SUFFIX = ".lock"
+DELTA_SUFFIX = ".delta"
+BACKUP_SUFFIX = ".bak"
+
+# Order of the ARCropolis sections when config.json is written
+SECTION_ORDER = ["new-dir-infos", "new-dir-infos-base", "share-to-vanilla", "new-dir-files", "share-to-added"]
+
+# Same format for every tool: UTF-8 paths kept as they are and 4 spaces of indentation
+DUMP_KWARGS = {"ensure_ascii": False, "indent": 4}
+
+# A lock older than this is considered left behind by a process that crashed
+STALE_LOCK_SECONDS = 300
+
+
+class ConfigLockError(OSError):
+    """Raised when another process keeps config.json locked for too long"""
+
+
+class ModConfig:
+    """
+    config.json of a mod, shared by every tool
+
+    The file is read once on first access, every change is applied to the data in
+    memory and the result is written in a single step through a temporary file that
+    replaces config.json. Writes are serialized with a lock file next to config.json
+    so two tools working on the same mod never interleave their changes.
+
+    Inside batch() the changes of each save are appended to config.json.delta (one
+    JSON line per change) instead of rewriting the whole file, and config.json is
+    compacted once when the batch ends. A delta log left by an interrupted run is
+    replayed the next time the configuration is loaded. Junk transactions always
+    write config.json together with their moves, also inside batch(), so files are
+    never in the junk folder without the entries that share them.
+    """
+
+    def __init__(self, mod_directory: str, lock_timeout: float = 10.0):
+        """
+        Initializes the store, nothing is read until the data is needed
+
+        Args:
+            mod_directory: Path to the mod directory
+            lock_timeout: Seconds to wait for another writer before giving up
+        """
+        self.mod_directory = mod_directory
+        self.lock_timeout = lock_timeout
+        self._data = None
+        self._disk_stamp = None    # (size, mtime_ns) of the file that was loaded
+        self._ops = []             # Changes not written to config.json or the delta log yet
+        self._batch_depth = 0
+        self.dirty = False
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.mod_directory, CONFIG_NAME)
+
+    @property
+    def lock_path(self) -> str:
+        return self.path + LOCK_SUFFIX
+
+    @property
+    def delta_path(self) -> str:
+        return self.path + DELTA_SUFFIX
+
+    @property
+    def deferred(self) -> bool:
+        """True inside batch(), where saves go to the delta log"""
+        return self._batch_depth > 0
+
+    @property
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    @property
+    def data(self) -> Dict:
+        """Configuration in memory, loaded from disk on first access"""
+        if self._data is None:
+            self._data = self._load()
+            self._replay_delta()
+        return self._data
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _load(self) -> Dict:
+        """Reads config.json, falling back to other encodings and to the backup"""
+        self._disk_stamp = self._stamp()
+        self.dirty = False
+        if self._disk_stamp is None:
+            return {}
+
+        for encoding in ("utf-8", "utf-8-sig", "latin-1", "cp1252"):
+            try:
+                with open(self.path, "r", encoding=encoding) as f:
+                    content = f.read().strip()
+                config = json.loads(content) if content else {}
+            except UnicodeDecodeError:
+                continue
+            except (OSError, ValueError) as e:
+                print(f"Error reading {CONFIG_NAME}: {e}")
+                return self._load_backup()
+            if encoding != "utf-8":
+                print(f"{CONFIG_NAME} loaded using encoding {encoding}")
+            if not isinstance(config, dict):
+                print(f"Warning: {CONFIG_NAME} does not contain a valid dictionary")
+                return {}
+            return config
+
+        print(f"Could not read {CONFIG_NAME} with any encoding")
+        return {}
+
+    def _load_backup(self) -> Dict:
+        backup_path = self.path + BACKUP_SUFFIX
+        if not os.path.exists(backup_path):
+            return {}
+        try:
+            with open(backup_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading backup {backup_path}: {e}")
+            return {}
+        print(f"Config loaded from backup {backup_path}")
+        return config if isinstance(config, dict) else {}
+
+    def reload(self) -> Dict:
+        """Discards the changes in memory and reads config.json again"""
+        self.invalidate()
+        return self.data
+
+    def invalidate(self):
+        """Forgets the data in memory, the next access reads config.json again"""
+        self._data = None
+        self._ops = []
+        self.dirty = False
+
+    def _replay_delta(self):
+        """Applies the changes of a delta log that was not compacted into config.json"""
+        if not os.path.exists(self.delta_path):
+            return
+        count = 0
+        try:
+            with open(self.delta_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._apply_op(json.loads(line))
+                    except ValueError:
+                        # A line cut by a crash is the last one, nothing after it was committed
+                        break
+                    count += 1
+        except OSError as e:
+            print(f"Error reading {self.delta_path}: {e}")
+            return
+        if count:
+            print(f"Replayed {count} pending changes of {CONFIG_NAME} from {self.delta_path}")
+            self.dirty = True
+
+    def _record(self, op: Dict):
+        """Applies a change to the data in memory and keeps it for the next save"""
+        self._apply_op(op)
+        self._ops.append(op)
+        self.dirty = True
+
+    def _apply_op(self, op: Dict):
+        kind = op.get("op")
+        if kind == "replace":
+            self._data = op["config"]
+        elif kind == "share-to-added":
+            share = self.section("share-to-added")
+            targets = share.get(op["source"])
+            if not isinstance(targets, list):
+                targets = share[op["source"]] = []
+            existing = set(targets)
+            targets.extend(f for f in op["files"] if f not in existing)
+        elif kind == "remove-new-dir-files":
+            new_dir_files = self.section("new-dir-files")
+            for dir_info, files in op["dirs"].items():
+                if dir_info in new_dir_files:
+                    files = set(files)
+                    new_dir_files[dir_info] = [f for f in new_dir_files[dir_info] if f not in files]
+        else:
+            print(f"Unknown {CONFIG_NAME} change ignored: {kind}")
+
+    def section(self, name: str) -> Dict:
+        """Returns a section of the configuration, creating it if needed"""
+        default = [] if name == "new-dir-infos" else {}
+        value = self.data.get(name)
+        if not isinstance(value, type(default)):
+            value = self.data[name] = default
+        return value
+
+    def replace(self, config: Dict):
+        """Replaces the whole configuration"""
+        self._record({"op": "replace", "config": config if isinstance(config, dict) else {}})
+
+    def ordered(self) -> Dict:
+        """Configuration with the ARCropolis sections in their usual order"""
+        config = {section: self.data[section] for section in SECTION_ORDER if section in self.data}
+        for key, value in self.data.items():
+            if key not in config:
+                config[key] = value
+        return config
+
+    def add_share_to_added(self, source_path: str, files: Iterable[str]) -> int:
+        """
+        Adds files that share a source file to share-to-added
+
+        Args:
+            source_path: File that is shared
+            files: Files that share it
+
+        Returns:
+            Number of new entries
+        """
+        source_path = source_path.replace('\\', '/')
+        targets = self.section("share-to-added").get(source_path)
+        existing = set(targets) if isinstance(targets, list) else set()
+        new_files = []
+        for file_path in files:
+            file_path = file_path.replace('\\', '/')
+            if file_path not in existing:
+                existing.add(file_path)
+                new_files.append(file_path)
+        if new_files or not isinstance(targets, list):
+            self._record({"op": "share-to-added", "source": source_path, "files": new_files})
+        return len(new_files)
+
+    def remove_new_dir_files(self, files: Iterable[str], dir_filter=None) -> int:
+        """
+        Removes files from the lists of new-dir-files
+
+        Args:
+            files: Files to remove
+            dir_filter: Function that receives a dir info and tells if it should be updated (optional, all of them)
+
+        Returns:
+            Number of removed entries
+        """
+        files = set(files)
+        removed = {}
+        for dir_info, files_list in self.section("new-dir-files").items():
+            if dir_filter is not None and not dir_filter(dir_info):
+                continue
+            matches = [f for f in files_list if f in files]
+            if matches:
+                removed[dir_info] = matches
+        if removed:
+            self._record({"op": "remove-new-dir-files", "dirs": removed})
+        return sum(len(matches) for matches in removed.values())
+
+    @contextmanager
+    def lock(self):
+        """Holds the lock file of config.json, waiting for other writers"""
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > STALE_LOCK_SECONDS:
+                        print(f"Removing stale lock {self.lock_path}")
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise ConfigLockError(f"{CONFIG_NAME} is locked by another process: {self.lock_path}")
+                time.sleep(0.1)
+        try:
+            os.write(fd, str(os.getpid()).encode("ascii"))
+            os.close(fd)
+            yield
+        finally:
+            try:
+                os.remove(self.lock_path)
+            except OSError:
+                pass
+
+    def _check_disk(self):
+        """Reloads config.json if another tool wrote it since it was loaded and applies the pending changes again (caller holds the lock)"""
+        if self._data is None or self._stamp() == self._disk_stamp:
+            return
+        print(f"{CONFIG_NAME} changed on disk since it was loaded, merging the pending changes")
+        ops = self._ops
+        self._data = self._load()
+        self._replay_delta()
+        for op in ops:
+            self._apply_op(op)
+        self._ops = ops
+        if ops:
+            self.dirty = True
+
+    def _write(self, backup: bool = False):
+        """Rewrites config.json with the data in memory and drops the delta log (caller holds the lock)"""
+        self._check_disk()
+        if backup and self.exists:
+            shutil.copy2(self.path, self.path + BACKUP_SUFFIX)
+        write_json_atomic(self.path, self.ordered(), **DUMP_KWARGS)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._disk_stamp = self._stamp()
+        self._ops = []
+        self.dirty = False
+
+    def _append_delta(self):
+        """Appends the pending changes to the delta log (caller holds the lock)"""
+        with open(self.delta_path, "a", encoding="utf-8") as f:
+            for op in self._ops:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._ops = []
+
+    def save(self, backup: bool = False) -> bool:
+        """
+        Writes the configuration if it has changes, or appends them to the delta log inside batch()
+
+        Args:
+            backup: Keep a copy of the previous file as config.json.bak
+
+        Returns:
+            True if the changes are on disk, False if they could not be written
+        """
+        if not self.dirty:
+            return True
+        try:
+            with self.lock():
+                if self.deferred and self._ops and not backup:
+                    self._append_delta()
+                else:
+                    self._write(backup)
+        except OSError as e:
+            print(f"Error saving {CONFIG_NAME}: {e}")
+            return False
+        return True
+
+    def commit(self, transaction) -> bool:
+        """
+        Commits a junk transaction that writes the configuration together with its moves
+
+        The whole config.json is written by the transaction even inside batch(), the
+        delta log is only used by save(). Once committed, config.json already holds
+        every change of the delta log, which is dropped.
+
+        Args:
+            transaction: JunkTransaction with the files to move
+
+        Returns:
+            True if the transaction was committed
+        """
+        try:
+            with self.lock():
+                self._check_disk()
+                if self.dirty:
+                    transaction.set_config(self.ordered(), **DUMP_KWARGS)
+                committed = transaction.commit()
+                if committed and os.path.exists(self.delta_path):
+                    os.remove(self.delta_path)
+        except OSError as e:
+            print(f"Error saving {CONFIG_NAME}: {e}")
+            committed = False
+        if committed:
+            self._disk_stamp = self._stamp()
+            self._ops = []
+            self.dirty = False
+        else:
+            # The file on disk was restored, drop the changes that were not written
+            self.invalidate()
+        return committed
+
+    def flush(self) -> bool:
+        """
+        Compacts every change, including the delta log, into config.json
+
+        Returns:
+            True if config.json is up to date
+        """
+        if not self.dirty and not os.path.exists(self.delta_path):
+            return True
+        try:
+            with self.lock():
+                self._write()
+        except OSError as e:
+            print(f"Error saving {CONFIG_NAME}: {e}")
+            return False
+        return True
+
+    @contextmanager
+    def batch(self):
+        """Collects every save of the block in the delta log and writes config.json once at the end"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
@@ -1,23 +1,22 @@
 import os
 import re
 import sys
-import json
-import shutil
 import argparse
 import glob
 import traceback
-import tempfile
-import subprocess
-import uuid
-import time
+import hashlib
+import mmap
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Optional
-try:
-    import numpy as np
-    from PIL import Image, ImageChops, ImageDraw
-    NUTEXB_COMPARISON_AVAILABLE = True
-except ImportError:
-    NUTEXB_COMPARISON_AVAILABLE = False
+from typing import Callable, Dict, List, Set, Tuple, Optional
+
+from junk_transaction import JunkTransaction, recover_pending_transaction
+from mod_config import ModConfig
+from nutexb import DECODER_AVAILABLE, PerceptualIndex, TextureCache, nutexb_files_identical
+
+# Bytes compared at the start and the end of files before comparing everything
+COMPARE_SAMPLE_SIZE = 4096
+# Size of the blocks compared once the samples match
+COMPARE_BLOCK_SIZE = 1024 * 1024
 
 
 class MovesetOptimizer:
@@ -39,6 +38,14 @@ class MovesetOptimizer:
         self.user_main_slot = main_slot
         self.main_slot = None
         self.junk_dir = os.path.join(mod_directory, "junk")
+        # Main slot file that each duplicate found by compare_specific_slots or compare_nutexb_files is identical to
+        self.duplicate_sources = {}
+        # Stat of every file found while enumerating slots, by normalized path
+        self.file_stats = {}
+        # Signatures and decoded pixels of compared textures, so main slot textures are read once per run
+        self.texture_cache = TextureCache()
+        # config.json of the mod, read once and written together with the junk moves
+        self.mod_config = ModConfig(mod_directory)
         
         # Auto-detect fighter if not specified
         if self.fighter_name is None:
@@ -51,6 +58,10 @@ class MovesetOptimizer:
         if not simulation and not os.path.exists(self.junk_dir):
             os.makedirs(self.junk_dir)
         
+        # A previous run may have been interrupted while moving files to junk
+        if JunkTransaction.pending(mod_directory, self.junk_dir) is not None:
+            print("Warning: an interrupted move to junk was found, run with --resume-junk or --rollback-junk to recover it")
+        
     def _detect_fighter_name(self) -> str:
         """
         Detects the fighter name from the mod directory
@@ -156,7 +167,7 @@ class MovesetOptimizer:
         
         if os.path.exists(camera_dir):
             print(f"Searching camera directory: {camera_dir}")
-            for root, _, filenames in os.walk(camera_dir):
+            for root, filenames in self._walk_files(camera_dir):
                 for filename in filenames:
                     # Skip .marker files from comparison
                     if filename.endswith('.marker'):
@@ -238,7 +249,7 @@ class MovesetOptimizer:
             print(f"Searching in: {search_dir}")
             if os.path.exists(search_dir):
                 print(f"Directory exists: {search_dir}")
-                for root, _, filenames in os.walk(search_dir):
+                for root, filenames in self._walk_files(search_dir):
                     for filename in filenames:
                         # Skip .marker files from comparison
                         if filename.endswith('.marker'):
@@ -264,7 +275,7 @@ class MovesetOptimizer:
         for subdir in additional_dirs:
             search_dir = os.path.join(fighter_dir, subdir)
             if os.path.exists(search_dir):
-                for root, _, filenames in os.walk(search_dir):
+                for root, filenames in self._walk_files(search_dir):
                     for filename in filenames:
                         # Skip .marker files from comparison
                         if filename.endswith('.marker'):
@@ -290,7 +301,7 @@ class MovesetOptimizer:
                 print(f"Searching for sound files in: {base_path}")
                 file_prefix = os.path.basename(pattern)
                 
-                for root, _, filenames in os.walk(base_path):
+                for root, filenames in self._walk_files(base_path):
                     for filename in filenames:
                         # Check if the file matches our pattern (se_fighter_cXX or vc_fighter_cXX)
                         if filename.startswith(file_prefix):
@@ -306,9 +317,52 @@ class MovesetOptimizer:
         print(f"Total files found for {slot}: {len(files)}")
         return files
     
+    def _walk_files(self, directory: str):
+        """
+        Walks a directory like os.walk, yielding (root, file names), and keeps the
+        stat of every file found so comparisons don't need to stat them again
+        
+        Args:
+            directory: Directory to walk
+        """
+        pending = [directory]
+        while pending:
+            root = pending.pop()
+            filenames = []
+            try:
+                with os.scandir(root) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file():
+                            filenames.append(entry.name)
+                            try:
+                                self.file_stats[os.path.normcase(os.path.abspath(entry.path))] = entry.stat()
+                            except OSError:
+                                pass
+            except OSError:
+                continue
+            yield root, filenames
+    
+    def _file_stat(self, file_path: str) -> os.stat_result:
+        """
+        Returns the stat of a file, reusing the one taken when the file was enumerated
+        
+        Raises:
+            OSError: If the file doesn't exist
+        """
+        key = os.path.normcase(os.path.abspath(file_path))
+        stat = self.file_stats.get(key)
+        if stat is None:
+            stat = os.stat(file_path)
+            self.file_stats[key] = stat
+        return stat
+    
     def are_files_identical(self, file1: str, file2: str) -> bool:
         """
         Compares two files binary to determine if they are identical
+        Sizes come from the enumeration pass, then a sample of the start and the
+        end of the files is compared before the whole memory mapped content
         
         Args:
             file1: Path to the first file
@@ -317,26 +371,40 @@ class MovesetOptimizer:
         Returns:
             True if the files are identical, False otherwise
         """
-        # Check if both files exist
-        if not os.path.exists(file1) or not os.path.exists(file2):
+        try:
+            size1 = self._file_stat(file1).st_size
+            size2 = self._file_stat(file2).st_size
+        except OSError:
             return False
             
         # Check if sizes are different (quick)
-        if os.path.getsize(file1) != os.path.getsize(file2):
+        if size1 != size2:
             return False
+        if size1 == 0:
+            return True
             
-        # Compare byte by byte (may be slow for large files)
-        with open(file1, 'rb') as f1, open(file2, 'rb') as f2:
-            # Read and compare in blocks for efficiency
-            while True:
-                b1 = f1.read(8192)  # 8KB chunks
-                b2 = f2.read(8192)
-                
-                if b1 != b2:
-                    return False
-                
-                if not b1:  # EOF
+        try:
+            with open(file1, 'rb') as f1, open(file2, 'rb') as f2:
+                # Small files are cheaper to read at once than to map
+                if size1 <= COMPARE_SAMPLE_SIZE * 2:
+                    return f1.read() == f2.read()
+                    
+                with mmap.mmap(f1.fileno(), 0, access=mmap.ACCESS_READ) as m1, \
+                     mmap.mmap(f2.fileno(), 0, access=mmap.ACCESS_READ) as m2:
+                    # Different files usually differ at the start (headers) or the end (footers)
+                    if m1[:COMPARE_SAMPLE_SIZE] != m2[:COMPARE_SAMPLE_SIZE] or \
+                       m1[-COMPARE_SAMPLE_SIZE:] != m2[-COMPARE_SAMPLE_SIZE:]:
+                        return False
+                    
+                    # Compare the rest in large blocks
+                    for offset in range(COMPARE_SAMPLE_SIZE, size1 - COMPARE_SAMPLE_SIZE, COMPARE_BLOCK_SIZE):
+                        end = min(offset + COMPARE_BLOCK_SIZE, size1 - COMPARE_SAMPLE_SIZE)
+                        if m1[offset:end] != m2[offset:end]:
+                            return False
                     return True
+        except (OSError, ValueError) as e:
+            print(f"Error comparing {file1} and {file2}: {e}")
+            return False
     
     def load_config(self) -> Dict:
         """
@@ -345,67 +413,9 @@ class MovesetOptimizer:
         Returns:
             Dictionary with the mod configuration or an empty dictionary if it doesn't exist
         """
-        config_path = os.path.join(self.mod_directory, "config.json")
-        backup_path = config_path + ".bak"
-        
-        if not os.path.exists(config_path):
+        if not self.mod_config.exists:
             print(f"config.json file not found in {self.mod_directory}")
-            return {}
-            
-        try:
-            # Try to load the main file
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # Verify it's a dictionary
-            if not isinstance(config, dict):
-                print(f"Warning: config.json does not contain a valid dictionary")
-                return {}
-                
-            return config
-                
-        except json.JSONDecodeError as e:
-            print(f"Error decoding config.json: {e}")
-            # Try to load from backup if it exists
-            if os.path.exists(backup_path):
-                try:
-                    print(f"Trying to load from backup {backup_path}")
-                    with open(backup_path, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                    
-                    if isinstance(config, dict):
-                        print(f"Config loaded successfully from backup")
-                        return config
-                    else:
-                        print(f"Backup does not contain a valid dictionary")
-                except Exception as e2:
-                    print(f"Error loading backup: {e2}")
-            
-            # If everything fails, create a new config.json file with basic structure
-            print(f"Creating a new config.json file with basic structure")
-            new_config = {"share-to-added": {}}
-            return new_config
-            
-        except UnicodeDecodeError as e:
-            print(f"Encoding error reading config.json: {e}")
-            print(f"Trying to read with different encodings...")
-            
-            # Try with different encodings
-            for encoding in ['latin-1', 'cp1252', 'ISO-8859-1']:
-                try:
-                    with open(config_path, 'r', encoding=encoding) as f:
-                        config = json.load(f)
-                    print(f"File loaded successfully using encoding {encoding}")
-                    return config if isinstance(config, dict) else {}
-                except Exception:
-                    continue
-                    
-            print(f"Could not read file with any encoding")
-            return {}
-            
-        except Exception as e:
-            print(f"Error loading config.json: {e}")
-            return {}
+        return self.mod_config.data
     
     def save_config(self, config: Dict) -> bool:
         """
@@ -417,159 +427,137 @@ class MovesetOptimizer:
         Returns:
             True if saved successfully, False otherwise
         """
-        config_path = os.path.join(self.mod_directory, "config.json")
-        backup_path = config_path + ".bak"
-        
         if self.simulation:
-            print(f"Simulation mode: No real file will be saved in {config_path}")
+            print(f"Simulation mode: No real file will be saved in {self.mod_config.path}")
             return True
             
-        print(f"Saving config.json in {config_path}")
-        try:
-            # Ensure config is serializable
-            if not isinstance(config, dict):
-                print(f"Warning: Configuration is not a valid dictionary, empty dictionary will be used")
-                config = {}
-                
-            # Create a backup before modifying the file
-            if os.path.exists(config_path):
-                try:
-                    shutil.copy2(config_path, backup_path)
-                    print(f"Backup created in {backup_path}")
-                except Exception as e:
-                    print(f"Could not create backup: {e}")
-            
-            # Write the new configuration
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4)
-            print(f"Config.json saved successfully in {config_path}")
-            return True
-        except Exception as e:
-            print(f"Error saving config.json: {e}")
-            # Try to restore backup if it exists
-            if os.path.exists(backup_path):
-                try:
-                    shutil.copy2(backup_path, config_path)
-                    print(f"Backup restored from {backup_path}")
-                except Exception as e2:
-                    print(f"Could not restore backup: {e2}")
+        print(f"Saving config.json in {self.mod_config.path}")
+        if not isinstance(config, dict):
+            print(f"Warning: Configuration is not a valid dictionary, empty dictionary will be used")
+        self.mod_config.replace(config)
+        if not self.mod_config.save(backup=True):
             return False
+        print(f"Config.json saved successfully in {self.mod_config.path}")
+        return True
+    
+    def _main_equivalent_path(self, file_path: str, slot: str, main_slot: str) -> str:
+        """
+        Builds the path that a file of a slot has in the main slot
+        
+        Args:
+            file_path: Path of the file in the slot (Unix format)
+            slot: Slot the file belongs to
+            main_slot: Main slot to use as reference
+            
+        Returns:
+            Equivalent path in the main slot
+        """
+        # Special handling for sound files (se_fighter_cXX.nus3audio, etc.)
+        sound_patterns = [
+            f"/se_{self.fighter_name}_{slot}",
+            f"/vc_{self.fighter_name}_{slot}"
+        ]
+        
+        main_file_path = ""
+        is_sound_file = False
+        for pattern in sound_patterns:
+            if pattern in file_path:
+                is_sound_file = True
+                # Replace the slot in the filename
+                main_file_path = file_path.replace(f"_{slot}", f"_{main_slot}")
+                break
+                
+        # Special handling for camera files (camera/fighter/fighter_name/slot)
+        camera_pattern = f"camera/fighter/{self.fighter_name}/{slot}/"
+        if camera_pattern in file_path:
+            # Replace the slot in the camera path
+            return file_path.replace(f"/{slot}/", f"/{main_slot}/")
+        
+        if is_sound_file:
+            return main_file_path
+        
+        # If not a sound or camera file, handle with the standard slot pattern
+        slot_pattern = f"/{slot}/"
+        main_pattern = f"/{main_slot}/"
+        
+        if slot_pattern in file_path:
+            return file_path.replace(slot_pattern, main_pattern)
+        
+        # Try with more general regex format
+        return re.sub(r'/c\d+/', f'/{main_slot}/', file_path)
     
-    def update_share_to_added(self, main_slot: str, duplicate_files_by_slot: Dict[str, List[str]]) -> bool:
+    def update_share_to_added(self, main_slot: str, duplicate_files_by_slot: Dict[str, List[str]],
+                              transaction: Optional[JunkTransaction] = None) -> bool:
         """
         Updates the share-to-added section of config.json
         
         Args:
             main_slot: Main slot to use as reference
             duplicate_files_by_slot: Dictionary with duplicate files by slot
+            transaction: Junk transaction that writes the config when committed (optional)
             
         Returns:
             True if updated successfully, False otherwise
         """
-        try:
-            print(f"Updating share-to-added in config.json...")
-            
-            # Read current config or create a new one
-            config_path = os.path.join(self.mod_directory, "config.json")
-            config = {}
-            
-            # Try to load existing config
-            if os.path.exists(config_path):
-                try:
-                    with open(config_path, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
-                        if content:
-                            config = json.loads(content)
-                except Exception as e:
-                    print(f"Error reading config.json, creating a new one: {e}")
-                    config = {}
-            
-            # Ensure config is a dictionary
-            if not isinstance(config, dict):
-                config = {}
-                
-            # Ensure share-to-added exists
-            if "share-to-added" not in config:
-                config["share-to-added"] = {}
-            
-            # For each slot with duplicate files
-            for slot, files in duplicate_files_by_slot.items():
-                for file_path in files:
-                    # Convert paths to Unix format (with /)
-                    file_path = file_path.replace('\\', '/')
-                    
-                    # Determine how to handle different file types
-                    is_sound_file = False
-                    is_camera_file = False
-                    main_file_path = ""
-                    
-                    # Special handling for sound files (se_fighter_cXX.nus3audio, etc.)
-                    sound_patterns = [
-                        f"/se_{self.fighter_name}_{slot}",
-                        f"/vc_{self.fighter_name}_{slot}"
-                    ]
-                    
-                    for pattern in sound_patterns:
-                        if pattern in file_path:
-                            is_sound_file = True
-                            # Replace the slot in the filename
-                            main_file_path = file_path.replace(f"_{slot}", f"_{main_slot}")
-                            break
-                            
-                    # Special handling for camera files (camera/fighter/fighter_name/slot)
-                    camera_pattern = f"camera/fighter/{self.fighter_name}/{slot}/"
-                    if camera_pattern in file_path:
-                        is_camera_file = True
-                        # Replace the slot in the camera path
-                        main_file_path = file_path.replace(f"/{slot}/", f"/{main_slot}/")
-                    
-                    # If not a sound or camera file, handle with the standard slot pattern
-                    if not is_sound_file and not is_camera_file:
-                        # Construct file path in main slot
-                        slot_pattern = f"/{slot}/"
-                        main_pattern = f"/{main_slot}/"
-                        
-                        if slot_pattern in file_path:
-                            main_file_path = file_path.replace(slot_pattern, main_pattern)
-                        else:
-                            # Try with more general regex format
-                            main_file_path = re.sub(r'/c\d+/', f'/{main_slot}/', file_path)
-                    
-                    print(f"Duplicate file: {file_path}")
-                    print(f"Main file: {main_file_path}")
-                    
-                    # Add to share-to-added
-                    if main_file_path in config["share-to-added"]:
-                        # If it exists, add to existing list
-                        if not isinstance(config["share-to-added"][main_file_path], list):
-                            config["share-to-added"][main_file_path] = []
-                        
-                        if file_path not in config["share-to-added"][main_file_path]:
-                            config["share-to-added"][main_file_path].append(file_path)
-                            print(f"Added {file_path} to existing list")
-                    else:
-                        # Create new entry
-                        config["share-to-added"][main_file_path] = [file_path]
-                        print(f"Created new entry for {main_file_path}")
-            
-            # Save current config
-            if self.simulation:
-                print("Simulation mode: no file will be saved")
-                return True
+        share_map = {}
+        
+        # For each slot with duplicate files
+        for slot, files in duplicate_files_by_slot.items():
+            for original_path in files:
+                # Convert paths to Unix format (with /)
+                file_path = original_path.replace('\\', '/')
+                
+                # Duplicates found under a different name share from the file they are identical to
+                source_path = self.duplicate_sources.get(original_path)
+                if source_path:
+                    main_file_path = source_path.replace('\\', '/')
+                else:
+                    main_file_path = self._main_equivalent_path(file_path, slot, main_slot)
                 
-            # Write config file
-            try:
-                with open(config_path, 'w', encoding='utf-8') as f:
-                    json.dump(config, f, indent=4)
-                print(f"Config.json updated successfully in {config_path}")
-                return True
-            except Exception as e:
-                print(f"Error saving config.json: {e}")
-                return False
+                print(f"Duplicate file: {file_path}")
+                print(f"Main file: {main_file_path}")
                 
+                share_map.setdefault(main_file_path, []).append(file_path)
+        
+        return self.add_share_to_added_entries(share_map, transaction)
+    
+    def add_share_to_added_entries(self, share_map: Dict[str, List[str]],
+                                   transaction: Optional[JunkTransaction] = None) -> bool:
+        """
+        Adds explicit source -> duplicates entries to the share-to-added section of config.json
+        
+        Args:
+            share_map: Dictionary with the source file as key and the files that share it as value
+            transaction: Junk transaction that writes the config when committed, together
+                with the moves (optional, the config is written right away otherwise)
+            
+        Returns:
+            True if updated successfully, False otherwise
+        """
+        print(f"Updating share-to-added in config.json...")
+        if self.simulation:
+            for source_path, files in share_map.items():
+                print(f"Would share {source_path} with {len(files)} files")
+            print("Simulation mode: no file will be saved")
+            return True
+        
+        try:
+            for source_path, files in share_map.items():
+                added = self.mod_config.add_share_to_added(source_path, files)
+                print(f"Added {added} files to the entry of {source_path}")
         except Exception as e:
-            print(f"General error in update_share_to_added: {e}")
+            print(f"General error in add_share_to_added_entries: {e}")
+            self.mod_config.invalidate()
+            return False
+        
+        # The transaction writes the config together with the moves in commit
+        if transaction is not None:
+            return True
+        
+        if not self.mod_config.save():
             return False
+        print(f"Config.json updated successfully in {self.mod_config.path}")
+        return True
     
     def analyze_mod(self) -> Dict[str, List[str]]:
         """
@@ -621,6 +609,192 @@ class MovesetOptimizer:
             
         return result
         
+    def _hash_file(self, file_path: str) -> str:
+        """
+        Calculates the content hash of a file
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            Hexadecimal digest of the file content
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def build_content_index(self, slots: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Builds an index of identical content across all the given slots
+        Files are grouped by size first, so only sizes present in more than one
+        slot are hashed
+        
+        Args:
+            slots: List of slots to index
+            
+        Returns:
+            Dictionary with the content hash as key and a list of (slot, file) as value,
+            containing only hashes shared by at least two slots
+        """
+        files_by_size = {}
+        for slot in slots:
+            for file_path in self.get_all_files_in_slot(self.fighter_name, slot):
+                if file_path.endswith('.marker'):
+                    continue
+                    
+                full_path = os.path.join(self.mod_directory, file_path)
+                try:
+                    file_size = self._file_stat(full_path).st_size
+                except OSError:
+                    continue
+                files_by_size.setdefault(file_size, []).append((slot, file_path))
+        
+        content_index = {}
+        for file_size, entries in files_by_size.items():
+            # A size that only appears in one slot can't be shared between slots
+            if len({slot for slot, _ in entries}) < 2:
+                continue
+                
+            for slot, file_path in entries:
+                try:
+                    content_hash = self._hash_file(os.path.join(self.mod_directory, file_path))
+                except OSError as e:
+                    print(f"Error hashing {file_path}: {e}")
+                    continue
+                content_index.setdefault(content_hash, []).append((slot, file_path))
+        
+        # Keep only clusters spanning more than one slot
+        return {content_hash: entries for content_hash, entries in content_index.items()
+                if len({slot for slot, _ in entries}) > 1}
+    
+    def _choose_cluster_owner(self, entries: List[Tuple[str, str]]) -> Tuple[str, str]:
+        """
+        Chooses the canonical owner of a cluster of identical files
+        The main slot specified by the user wins if present, otherwise the lowest slot
+        
+        Args:
+            entries: List of (slot, file) with identical content
+            
+        Returns:
+            The (slot, file) entry that owns the content
+        """
+        if self.user_main_slot:
+            for entry in sorted(entries, key=lambda e: e[1]):
+                if entry[0] == self.user_main_slot:
+                    return entry
+        return min(entries, key=lambda e: (int(e[0][1:]), e[1]))
+    
+    def analyze_mod_global(self, owner_policy: Optional[Callable[[List[Tuple[str, str]]], Tuple[str, str]]] = None,
+                           near_duplicate_psnr: Optional[float] = None) -> Dict[str, List[str]]:
+        """
+        Analyzes the mod clustering identical files across all slots, not only
+        against the main slot. Files shared by c03 and c05 but absent from the
+        main slot are also found
+        
+        Args:
+            owner_policy: Function that receives the (slot, file) entries of a cluster and
+                returns the owner entry (optional, defaults to the main slot or the lowest slot)
+            near_duplicate_psnr: If set, textures that are not identical but have at least this
+                PSNR in dB are also clustered (optional)
+            
+        Returns:
+            Dictionary with the owner file as key and the duplicate files that can share it as value
+        """
+        slots = self.detect_slots()
+        if len(slots) < 2:
+            print(f"Not enough slots found for fighter {self.fighter_name}")
+            return {}
+        
+        if owner_policy is None:
+            owner_policy = self._choose_cluster_owner
+        
+        print(f"Clustering identical files across {len(slots)} slots...")
+        content_index = self.build_content_index(slots)
+        
+        result = {}
+        for entries in content_index.values():
+            owner_slot, owner_file = owner_policy(entries)
+            
+            # Files in the owner's own slot are kept, they can't share from themselves
+            duplicates = sorted(file_path for slot, file_path in entries if slot != owner_slot)
+            if duplicates:
+                result[owner_file] = duplicates
+                print(f"Cluster owned by {owner_file}: {len(duplicates)} duplicate files")
+        
+        if near_duplicate_psnr is not None:
+            # Owners of exact clusters are excluded too, they must stay in place for their duplicates
+            exact_members = set(result) | {file_path for files in result.values() for file_path in files}
+            near_duplicates = self.analyze_near_duplicate_textures(slots, near_duplicate_psnr, owner_policy, exact_members)
+            for owner_file, duplicates in near_duplicates.items():
+                result.setdefault(owner_file, []).extend(duplicates)
+        
+        total_duplicates = sum(len(files) for files in result.values())
+        if total_duplicates > 0:
+            print(f"\nSummary: {total_duplicates} duplicate files found in {len(result)} clusters")
+        else:
+            print("\nNo duplicate files found across slots")
+            
+        return result
+    
+    def analyze_near_duplicate_textures(self, slots: List[str], min_psnr: float,
+                                        owner_policy: Optional[Callable[[List[Tuple[str, str]]], Tuple[str, str]]] = None,
+                                        exclude: Optional[Set[str]] = None) -> Dict[str, List[str]]:
+        """
+        Finds NUTEXB textures that differ only by compression noise across slots
+        Candidates come from a perceptual hash index, so not every pair of textures
+        is compared, and each duplicate is confirmed against the owner with its PSNR
+        
+        Args:
+            slots: List of slots to analyze
+            min_psnr: Minimum PSNR in dB for two textures to be considered the same
+            owner_policy: Function that chooses the owner of each cluster (optional)
+            exclude: Files that are already handled and must not be clustered (optional)
+            
+        Returns:
+            Dictionary with the owner file as key and the near duplicate files as value
+        """
+        if not DECODER_AVAILABLE:
+            print("NumPy is required to find near duplicate textures")
+            return {}
+        
+        if owner_policy is None:
+            owner_policy = self._choose_cluster_owner
+        exclude = exclude or set()
+        
+        print(f"Indexing textures for near duplicates (PSNR >= {min_psnr} dB)...")
+        index = PerceptualIndex(cache=self.texture_cache)
+        for slot in slots:
+            for file_path in self.get_all_files_in_slot(self.fighter_name, slot):
+                if not file_path.lower().endswith('.nutexb') or file_path in exclude:
+                    continue
+                try:
+                    index.add((slot, file_path), os.path.join(self.mod_directory, file_path))
+                except Exception as e:
+                    print(f"Error indexing {file_path}: {e}")
+        
+        result = {}
+        for group in index.find_groups(min_psnr):
+            entries = [index.entries[i][0] for i in group]
+            if len({slot for slot, _ in entries}) < 2:
+                continue
+            
+            owner_slot, owner_file = owner_policy(entries)
+            owner_index = group[entries.index((owner_slot, owner_file))]
+            
+            # Every duplicate must be close to the owner itself, not only to another member
+            duplicates = sorted(file_path for i, (slot, file_path) in zip(group, entries)
+                                if slot != owner_slot and index.similarity(owner_index, i) >= min_psnr)
+            if duplicates:
+                result[owner_file] = duplicates
+                print(f"Near duplicates of {owner_file}: {len(duplicates)} textures")
+        
+        return result
+    
     def optimize_mod(self) -> Dict[str, List[str]]:
         """
         Optimizes the mod moving duplicate files to the junk folder
@@ -636,10 +810,9 @@ class MovesetOptimizer:
             return {}
             
         result = {}
+        transaction = JunkTransaction(self.mod_directory, self.junk_dir)
         # Track affected directories for later cleanup
         affected_directories = set()
-        # Track affected camera directories
-        affected_camera_directories = set()
         
         for slot, files in duplicates.items():
             # Filter .marker files (additional safety)
@@ -656,78 +829,135 @@ class MovesetOptimizer:
                 # Track the directory for later cleanup
                 affected_directories.add(os.path.dirname(full_path))
                 
-                # Track camera directories separately
-                camera_pattern = f"camera/fighter/{self.fighter_name}/{slot}"
-                if camera_pattern in file_path:
-                    camera_dir = os.path.join(self.mod_directory, f"camera/fighter/{self.fighter_name}/{slot}")
-                    affected_camera_directories.add(camera_dir)
-                
-                # Create path in junk directory
-                junk_path = os.path.join(self.junk_dir, file_path)
-                junk_dir = os.path.dirname(junk_path)
-                
-                if not self.simulation:
-                    # Create destination directory if it doesn't exist
-                    if not os.path.exists(junk_dir):
-                        os.makedirs(junk_dir)
-                    
-                    # Move file
-                    try:
-                        shutil.move(full_path, junk_path)
-                        moved_files.append(file_path)
-                    except Exception as e:
-                        print(f"Error moving {file_path}: {e}")
-                else:
-                    # In simulation mode, we only register
+                # Files are moved together when the transaction is committed
+                if self.simulation or transaction.add(file_path):
                     moved_files.append(file_path)
             
             if moved_files:
                 result[slot] = moved_files
         
-        # Update config.json with moved files
+        # Update config.json with moved files and move them to junk
         if result and not self.simulation:
             print("\nUpdating config.json with shared files...")
-            if self.update_share_to_added(self.main_slot, result):
+            if self.update_share_to_added(self.main_slot, result, transaction) and self.mod_config.commit(transaction):
                 print("config.json updated successfully with shared files")
             else:
-                print("Error updating config.json")
+                print("Error updating config.json, no files were moved")
+                result = {}
                 
-        # Clean up empty directories
+        # Clean up the directories left empty by the moves
         if affected_directories:
             print("\nChecking for empty directories...")
-            fighter_dir = os.path.join(self.mod_directory, "fighter", self.fighter_name)
-            if os.path.exists(fighter_dir):
-                self.remove_empty_directories(fighter_dir)
-        
-        # Clean up empty camera directories
-        if affected_camera_directories:
-            print("\nChecking for empty camera directories...")
-            for camera_dir in affected_camera_directories:
-                if os.path.exists(camera_dir):
-                    self.remove_empty_directories(camera_dir)
-                    
-                    # Also check if the fighter's camera directory is empty
-                    fighter_camera_dir = os.path.dirname(camera_dir)
-                    if os.path.exists(fighter_camera_dir):
-                        self.remove_empty_directories(fighter_camera_dir)
+            self.prune_empty_directories(affected_directories)
                 
         return result
 
-    def compare_specific_slots(self, main_slot: str, compare_slot: str) -> List[str]:
+    def optimize_mod_global(self, owner_policy: Optional[Callable[[List[Tuple[str, str]]], Tuple[str, str]]] = None,
+                            near_duplicate_psnr: Optional[float] = None) -> Dict[str, List[str]]:
         """
-        Specifically compares two slots and finds duplicate files
-        In WinMerge style: compares all files independently of their paths
+        Optimizes the mod using global duplicate clustering, moving duplicates to
+        the junk folder and sharing them from the owner of each cluster
+        
+        Args:
+            owner_policy: Function that chooses the owner of each cluster (optional)
+            near_duplicate_psnr: Minimum PSNR in dB to also share near duplicate textures (optional)
+            
+        Returns:
+            Dictionary with the owner file as key and the moved files as value
+        """
+        clusters = self.analyze_mod_global(owner_policy, near_duplicate_psnr)
+        
+        if not clusters:
+            print("No duplicate files found to optimize")
+            return {}
+        
+        result = {}
+        transaction = JunkTransaction(self.mod_directory, self.junk_dir)
+        affected_directories = set()
+        
+        for owner_file, files in clusters.items():
+            moved_files = []
+            for file_path in files:
+                # An owner of any cluster is shared by other files and is never moved
+                if file_path in clusters:
+                    print(f"Skipping {file_path}, it owns another cluster")
+                    continue
+                
+                full_path = os.path.join(self.mod_directory, file_path)
+                affected_directories.add(os.path.dirname(full_path))
+                
+                # Files are moved together when the transaction is committed
+                if self.simulation or transaction.add(file_path):
+                    moved_files.append(file_path)
+            
+            if moved_files:
+                result[owner_file] = moved_files
+        
+        # Update config.json with the owner of each cluster and move the duplicates to junk
+        if result and not self.simulation:
+            print("\nUpdating config.json with shared files...")
+            if self.add_share_to_added_entries(result, transaction) and self.mod_config.commit(transaction):
+                print("config.json updated successfully with shared files")
+            else:
+                print("Error updating config.json, no files were moved")
+                result = {}
+        
+        # Clean up the directories left empty by the moves
+        if affected_directories:
+            print("\nChecking for empty directories...")
+            self.prune_empty_directories(affected_directories)
+        
+        return result
+
+    def _slot_equivalent_path(self, compare_file: str, compare_slot: str, main_slot: str) -> str:
+        """
+        Builds the path that a file of the compared slot has in the main slot,
+        keeping the path separators of the original path
+        
+        Args:
+            compare_file: Path of the file in the compared slot
+            compare_slot: Slot the file belongs to
+            main_slot: Main slot to use as reference
+            
+        Returns:
+            Equivalent path in the main slot
+        """
+        # Check for sound files first (se_fighter_cXX.nus3audio, etc.)
+        sound_patterns = [
+            (f"se_{self.fighter_name}_{compare_slot}", f"se_{self.fighter_name}_{main_slot}"),
+            (f"vc_{self.fighter_name}_{compare_slot}", f"vc_{self.fighter_name}_{main_slot}")
+        ]
+        
+        for compare_pattern, main_pattern in sound_patterns:
+            if compare_pattern in compare_file:
+                return compare_file.replace(compare_pattern, main_pattern)
+        
+        # If not a sound file, use standard path replacement
+        # Check different path separators
+        if f"/{compare_slot}/" in compare_file:
+            return compare_file.replace(f"/{compare_slot}/", f"/{main_slot}/")
+        if f"\\{compare_slot}\\" in compare_file:
+            return compare_file.replace(f"\\{compare_slot}\\", f"\\{main_slot}\\")
+        
+        # If we don't find exact pattern, use regex for greater flexibility
+        return re.sub(r'[/\\]' + compare_slot + r'[/\\]', f'/{main_slot}/', compare_file)
+    
+    def find_slot_duplicates(self, main_slot: str, compare_slot: str) -> Dict[str, str]:
+        """
+        Finds the files of a slot that are identical to a file of the main slot,
+        independently of their names, together with the main file they duplicate
         
         Args:
             main_slot: Main slot to use as reference
             compare_slot: Slot to compare with the main
             
         Returns:
-            List of duplicate files in the compared slot
+            Dictionary with the duplicate file of the compared slot as key and
+            the identical file of the main slot as value
         """
         if main_slot == compare_slot:
             print(f"Error: No comparison can be made with the same slot ({main_slot})")
-            return []
+            return {}
             
         print(f"Comparing {main_slot} with {compare_slot} (full analysis)...")
         
@@ -738,142 +968,100 @@ class MovesetOptimizer:
         print(f"Files in {main_slot}: {len(main_slot_files)}")
         print(f"Files in {compare_slot}: {len(compare_slot_files)}")
         
-        # Find duplicates
-        duplicates = []
-        
-        # Create dictionary by file size for faster comparisons
-        print("Organizing files by size for optimization...")
+        # Path index of the main slot and size index for faster comparisons
+        print("Indexing main slot files by path and size...")
+        main_files_set = set(main_slot_files)
         main_files_by_size = {}
+        main_size_by_file = {}
         for main_file in main_slot_files:
             full_path = os.path.join(self.mod_directory, main_file)
-            if os.path.exists(full_path):
-                file_size = os.path.getsize(full_path)
-                if file_size not in main_files_by_size:
-                    main_files_by_size[file_size] = []
-                main_files_by_size[file_size].append(main_file)
-        
-        # Count the number of real comparisons that will be made
-        print("Calculating the number of necessary comparisons...")
-        real_comparisons = 0
-        for compare_file in compare_slot_files:
-            compare_full_path = os.path.join(self.mod_directory, compare_file)
-            if not os.path.exists(compare_full_path):
+            try:
+                file_size = self._file_stat(full_path).st_size
+            except OSError:
                 continue
-                
-            file_size = os.path.getsize(compare_full_path)
-            if file_size in main_files_by_size:
-                real_comparisons += len(main_files_by_size[file_size])
+            main_files_by_size.setdefault(file_size, []).append(main_file)
+            main_size_by_file[main_file] = file_size
         
-        print(f"Will perform {real_comparisons} comparisons (optimized by file size)")
-        progress_step = max(1, real_comparisons // 20)  # Show progress every 5%
+        # Content index of the main slot, filled lazily only for the sizes we need
+        main_files_by_hash = {}
+        hashed_sizes = set()
         
-        # Now compare only files of the same size
-        comparison_count = 0
-        for compare_file in compare_slot_files:
+        duplicates = {}
+        total = len(compare_slot_files)
+        progress_step = max(1, total // 20)  # Show progress every 5%
+        
+        for index, compare_file in enumerate(compare_slot_files, 1):
+            if index % progress_step == 0:
+                print(f"Progress: {index / total * 100:.1f}% ({index}/{total})")
+                
             # Ignore .marker files as they should be in all slots
             if compare_file.endswith('.marker'):
-                print(f"Ignoring .marker file: {compare_file}")
                 continue
                 
             compare_full_path = os.path.join(self.mod_directory, compare_file)
-            
-            if not os.path.exists(compare_full_path):
+            try:
+                file_size = self._file_stat(compare_full_path).st_size
+            except OSError:
                 continue
                 
-            file_size = os.path.getsize(compare_full_path)
-            if file_size not in main_files_by_size:
+            candidates = main_files_by_size.get(file_size)
+            if not candidates:
                 continue
-                
-            # Compare only with files of the same size
-            for main_file in main_files_by_size[file_size]:
-                comparison_count += 1
-                if comparison_count % progress_step == 0:
-                    progress_percent = (comparison_count / real_comparisons) * 100
-                    print(f"Progress: {progress_percent:.1f}% ({comparison_count}/{real_comparisons})")
-                
-                main_full_path = os.path.join(self.mod_directory, main_file)
-                
-                # Construct equivalent path for comparison
-                equivalent_path = False
-                
-                # Check different path separators
-                if f"/{compare_slot}/" in compare_file and f"/{main_slot}/" in main_file:
-                    equivalent_path = compare_file.replace(f"/{compare_slot}/", f"/{main_slot}/") == main_file
-                elif f"\\{compare_slot}\\" in compare_file and f"\\{main_slot}\\" in main_file:
-                    equivalent_path = compare_file.replace(f"\\{compare_slot}\\", f"\\{main_slot}\\") == main_file
-                
-                # Also check for sound files (se_fighter_cXX.nus3audio, etc.)
-                sound_patterns = [
-                    (f"se_{self.fighter_name}_{compare_slot}", f"se_{self.fighter_name}_{main_slot}"),
-                    (f"vc_{self.fighter_name}_{compare_slot}", f"vc_{self.fighter_name}_{main_slot}")
-                ]
-                
-                for compare_pattern, main_pattern in sound_patterns:
-                    if compare_pattern in compare_file and main_pattern in main_file:
-                        equivalent_path = compare_file.replace(compare_pattern, main_pattern) == main_file
-                        if equivalent_path:
-                            break
-                
-                # Consider duplicates only if not the same path (equivalent)
-                if not equivalent_path and self.are_files_identical(main_full_path, compare_full_path):
-                    duplicates.append(compare_file)
+            
+            # Prefer the equivalent path in the main slot, it's the natural source to share from
+            main_equivalent = self._slot_equivalent_path(compare_file, compare_slot, main_slot)
+            if main_equivalent in main_files_set and main_size_by_file.get(main_equivalent) == file_size:
+                if self.are_files_identical(os.path.join(self.mod_directory, main_equivalent), compare_full_path):
+                    duplicates[compare_file] = main_equivalent
+                    print(f"Found equivalent duplicate: {compare_file} (equivalent to {main_equivalent})")
+                    continue
+            
+            # Otherwise look for a file with the same content under any name
+            if len(candidates) == 1:
+                main_file = candidates[0]
+                if main_file != main_equivalent and self.are_files_identical(
+                        os.path.join(self.mod_directory, main_file), compare_full_path):
+                    duplicates[compare_file] = main_file
                     print(f"Duplicate found: {compare_file} (identical to {main_file})")
-                    break  # Once we find that it's duplicate, we don't need to compare further
-        
-        # Also make traditional file equivalent comparison
-        print("Performing traditional file equivalent comparison...")
-        for compare_file in compare_slot_files:
-            # Ignore .marker files as they should be in all slots
-            if compare_file.endswith('.marker'):
-                continue
-                
-            # Skip files that are already identified as duplicates
-            if compare_file in duplicates:
                 continue
-                
-            # Construct equivalent path in main slot
-            main_equivalent = None
-            
-            # Check for sound files first (se_fighter_cXX.nus3audio, etc.)
-            sound_patterns = [
-                (f"se_{self.fighter_name}_{compare_slot}", f"se_{self.fighter_name}_{main_slot}"),
-                (f"vc_{self.fighter_name}_{compare_slot}", f"vc_{self.fighter_name}_{main_slot}")
-            ]
-            
-            for compare_pattern, main_pattern in sound_patterns:
-                if compare_pattern in compare_file:
-                    main_equivalent = compare_file.replace(compare_pattern, main_pattern)
-                    break
             
-            # If not a sound file, use standard path replacement
-            if main_equivalent is None:
-                # Check different path separators
-                if f"/{compare_slot}/" in compare_file:
-                    main_equivalent = compare_file.replace(f"/{compare_slot}/", f"/{main_slot}/")
-                elif f"\\{compare_slot}\\" in compare_file:
-                    main_equivalent = compare_file.replace(f"\\{compare_slot}\\", f"\\{main_slot}\\")
-                else:
-                    # If we don't find exact pattern, use regex for greater flexibility
-                    main_equivalent = re.sub(r'[/\\]' + compare_slot + r'[/\\]', f'/{main_slot}/', compare_file)
-            
-            # Check if equivalent file exists in main slot files
-            found = False
-            for main_file in main_slot_files:
-                if main_file == main_equivalent:
-                    found = True
-                    break
+            if file_size not in hashed_sizes:
+                hashed_sizes.add(file_size)
+                for main_file in candidates:
+                    try:
+                        content_hash = self._hash_file(os.path.join(self.mod_directory, main_file))
+                    except OSError:
+                        continue
+                    main_files_by_hash.setdefault(content_hash, main_file)
             
-            # If equivalent file exists and not already in duplicates list
-            if found and compare_file not in duplicates:
-                compare_full_path = os.path.join(self.mod_directory, compare_file)
-                main_full_path = os.path.join(self.mod_directory, main_equivalent)
-                
-                if self.are_files_identical(main_full_path, compare_full_path):
-                    duplicates.append(compare_file)
-                    print(f"Found equivalent duplicate: {compare_file} (equivalent to {main_equivalent})")
+            try:
+                content_hash = self._hash_file(compare_full_path)
+            except OSError:
+                continue
+            main_file = main_files_by_hash.get(content_hash)
+            if main_file:
+                duplicates[compare_file] = main_file
+                print(f"Duplicate found: {compare_file} (identical to {main_file})")
         
         print(f"Comparison finished. {len(duplicates)} duplicate files found in {compare_slot}")
         return duplicates
+    
+    def compare_specific_slots(self, main_slot: str, compare_slot: str) -> List[str]:
+        """
+        Specifically compares two slots and finds duplicate files
+        In WinMerge style: compares all files independently of their paths
+        The main file each duplicate is identical to is kept in self.duplicate_sources
+        
+        Args:
+            main_slot: Main slot to use as reference
+            compare_slot: Slot to compare with the main
+            
+        Returns:
+            List of duplicate files in the compared slot
+        """
+        duplicate_sources = self.find_slot_duplicates(main_slot, compare_slot)
+        self.duplicate_sources.update(duplicate_sources)
+        return list(duplicate_sources)
         
     def optimize_specific_slot(self, main_slot: str, compare_slot: str) -> List[str]:
         """
@@ -910,69 +1098,34 @@ class MovesetOptimizer:
         
         # Track affected directories for later cleanup
         affected_directories = set()
-        # Track affected camera directories
-        affected_camera_directories = set()
         
         # Move duplicates to junk
         moved_files = []
+        transaction = JunkTransaction(self.mod_directory, self.junk_dir)
         for file_path in duplicates:
             full_path = os.path.join(self.mod_directory, file_path)
             
             # Track the directory for later cleanup
             affected_directories.add(os.path.dirname(full_path))
             
-            # Track camera directories separately
-            camera_pattern = f"camera/fighter/{self.fighter_name}/{compare_slot}"
-            if camera_pattern in file_path:
-                camera_dir = os.path.join(self.mod_directory, f"camera/fighter/{self.fighter_name}/{compare_slot}")
-                affected_camera_directories.add(camera_dir)
-            
-            # Create path in junk directory
-            junk_path = os.path.join(self.junk_dir, file_path)
-            junk_dir = os.path.dirname(junk_path)
-            
-            if not self.simulation:
-                # Create destination directory if it doesn't exist
-                if not os.path.exists(junk_dir):
-                    os.makedirs(junk_dir)
-                
-                # Move file
-                try:
-                    shutil.move(full_path, junk_path)
-                    moved_files.append(file_path)
-                except Exception as e:
-                    print(f"Error moving {file_path}: {e}")
-            else:
-                # In simulation mode, we only register
+            # Files are moved together when the transaction is committed
+            if self.simulation or transaction.add(file_path):
                 moved_files.append(file_path)
         
-        # Update config.json with moved files
+        # Update config.json with moved files and move them to junk
         if moved_files and not self.simulation:
             print("\nUpdating config.json with shared files...")
             duplicate_files_by_slot = {compare_slot: moved_files}
-            if self.update_share_to_added(main_slot, duplicate_files_by_slot):
+            if self.update_share_to_added(main_slot, duplicate_files_by_slot, transaction) and self.mod_config.commit(transaction):
                 print("config.json updated successfully with shared files")
             else:
-                print("Error updating config.json")
+                print("Error updating config.json, no files were moved")
+                moved_files = []
         
-        # Clean up empty directories
+        # Clean up the directories left empty by the moves
         if affected_directories:
             print("\nChecking for empty directories...")
-            fighter_dir = os.path.join(self.mod_directory, "fighter", self.fighter_name)
-            if os.path.exists(fighter_dir):
-                self.remove_empty_directories(fighter_dir)
-        
-        # Clean up empty camera directories
-        if affected_camera_directories:
-            print("\nChecking for empty camera directories...")
-            for camera_dir in affected_camera_directories:
-                if os.path.exists(camera_dir):
-                    self.remove_empty_directories(camera_dir)
-                    
-                    # Also check if the fighter's camera directory is empty
-                    fighter_camera_dir = os.path.dirname(camera_dir)
-                    if os.path.exists(fighter_camera_dir):
-                        self.remove_empty_directories(fighter_camera_dir)
+            self.prune_empty_directories(affected_directories)
                 
         return moved_files
 
@@ -993,306 +1146,59 @@ class MovesetOptimizer:
                     nutexb_files.append(os.path.join(root, file))
         return nutexb_files
 
-    def nutexb_to_png(self, nutexb_path, output_dir=None):
-        """Converts NUTEXB to PNG directly for visualization"""
-        try:
-            # If there is no output directory, use a temporary one
-            if output_dir is None:
-                output_dir = tempfile.mkdtemp()
-            
-            # Output filename with unique identifier to avoid collisions
-            uid = str(uuid.uuid4())[:8]
-            timestamp = int(time.time())
-            base_name = f"{os.path.basename(nutexb_path).split('.')[0]}_{uid}_{timestamp}.png"
-            output_path = os.path.join(output_dir, base_name)
-            
-            print(f"Processing {nutexb_path} -> {output_path}")
-            
-            # Method 1: Use the Ultimate Tex CLI tool if available
-            try:
-                # Check if ultimate_tex_cli is available
-                result = subprocess.run(["ultimate_tex_cli", "--version"], 
-                                      stdout=subprocess.PIPE, 
-                                      stderr=subprocess.PIPE,
-                                      text=True, shell=True)
-                
-                if "ultimate_tex_cli" in str(result.stdout) or "ultimate_tex_cli" in str(result.stderr):
-                    print(f"Converting with Ultimate Tex CLI: {nutexb_path}")
-                    cmd = f"ultimate_tex_cli \"{nutexb_path}\" \"{output_path}\""
-                    result = subprocess.run(cmd, shell=True, 
-                                          stdout=subprocess.PIPE, 
-                                          stderr=subprocess.PIPE,
-                                          text=True)
-                    
-                    print(f"Result: {result.stdout}")
-                    print(f"Errors: {result.stderr}")
-                    
-                    if os.path.exists(output_path):
-                        print(f"Texture successfully converted: {output_path}")
-                        return output_path
-            except Exception as tex_error:
-                print(f"Ultimate Tex CLI not found or error using it: {tex_error}")
-                print("Please download ultimate_tex_cli from: https://github.com/ScanMountGoat/ultimate-tex-cli/releases")
-                print("Place ultimate_tex_cli.exe in the same folder as this program.")
-            
-            # Method 2: Direct reading of binary data
-            try:
-                # Open and read the NUTEXB file directly
-                with open(nutexb_path, 'rb') as f:
-                    data = f.read()
-                
-                # Verify if it's really a NUTEXB file
-                if data[:4] not in [b'NUTX', b'nutx', b'NUTB', b'nutb']:
-                    raise ValueError(f"The file {nutexb_path} does not appear to be a valid NUTEXB")
-                
-                # Try to extract texture dimensions (approximate location)
-                width = height = 256  # Default values
-                
-                # Look in known positions for dimensions (offset 0x10-0x1C)
-                # Values are little-endian
-                for offset in range(0x10, 0x20, 4):
-                    if offset + 8 < len(data):
-                        possible_width = int.from_bytes(data[offset:offset+4], byteorder='little')
-                        possible_height = int.from_bytes(data[offset+4:offset+8], byteorder='little')
-                        
-                        # Check if they are reasonable dimensions
-                        if (16 <= possible_width <= 4096 and 
-                            16 <= possible_height <= 4096):
-                            # Dimensions are usually powers of 2
-                            width = possible_width
-                            height = possible_height
-                            print(f"Dimensions detected in {nutexb_path}: {width}x{height}")
-                            break
-                
-                # Look for the start of image data
-                # Image data is usually after the header
-                image_data_offset = None
-                for offset in [0x80, 0x100, 0x180, 0x200, 0x280, 0x300]:
-                    if offset + (width * height * 4) <= len(data):
-                        # We try to verify if it seems to contain image data
-                        # by looking for variance in color patterns
-                        sample = data[offset:offset+width*height*4:16]  # Sampling the data
-                        if len(set(sample)) > 32:  # If there is enough value variance
-                            image_data_offset = offset
-                            break
-                
-                if image_data_offset is not None:
-                    print(f"Image data found in {nutexb_path} at offset: 0x{image_data_offset:X}")
-                    
-                    # Try different common formats in NUTEXB
-                    try:
-                        # Try RGBA (most common)
-                        image_data = data[image_data_offset:image_data_offset + width * height * 4]
-                        img = Image.frombuffer('RGBA', (width, height), image_data, 'raw', 'RGBA', 0, 1)
-                        img.save(output_path)
-                        print(f"Texture converted as RGBA: {output_path}")
-                        return output_path
-                    except Exception as e1:
-                        print(f"Error converting as RGBA: {e1}")
-                        
-                        try:
-                            # Try BGRA (also common)
-                            image_data = data[image_data_offset:image_data_offset + width * height * 4]
-                            # Convert BGRA to RGBA
-                            array = np.frombuffer(image_data, dtype=np.uint8).reshape(height, width, 4)
-                            array = array[:, :, [2, 1, 0, 3]]  # BGRA -> RGBA
-                            img = Image.fromarray(array, 'RGBA')
-                            img.save(output_path)
-                            print(f"Texture converted as BGRA: {output_path}")
-                            return output_path
-                        except Exception as e2:
-                            print(f"Error converting as BGRA: {e2}")
-                
-                # If we can't extract image data, create a pattern visualization
-                print(f"Creating pattern visualization based on binary data for {nutexb_path}")
-                pattern_img = Image.new('RGB', (width, height), color=(40, 40, 40))
-                draw = ImageDraw.Draw(pattern_img)
-                
-                # Create a visual pattern from the binary data
-                for y in range(0, height, 8):
-                    for x in range(0, width, 8):
-                        idx = (y * width + x) % len(data)
-                        r = data[idx % len(data)]
-                        g = data[(idx + 1) % len(data)]
-                        b = data[(idx + 2) % len(data)]
-                        draw.rectangle([(x, y), (x+7, y+7)], fill=(r, g, b))
-                
-                # Add information
-                draw.text((10, 10), f"VISUALIZATION {nutexb_path}", fill=(255, 255, 255))
-                draw.text((10, 30), f"File: {os.path.basename(nutexb_path)}", fill=(200, 200, 255))
-                draw.text((10, 50), f"Dimensions: {width}x{height}", fill=(200, 255, 200))
-                draw.text((10, 70), f"Header: {data[:4]}", fill=(255, 255, 155))
-                
-                pattern_img.save(output_path)
-                print(f"Pattern visualization created: {output_path}")
-                return output_path
-                
-            except Exception as binary_error:
-                print(f"Error processing binary data: {binary_error}")
-            
-            # Fallback method: Create informative image
-            info_img = Image.new('RGB', (512, 384), color=(40, 40, 40))
-            draw = ImageDraw.Draw(info_img)
-            
-            # Title
-            draw.text((20, 20), "NUTEXB TEXTURE VISUALIZATION", fill=(255, 255, 100))
-            draw.text((20, 50), os.path.basename(nutexb_path), fill=(200, 200, 255))
-            
-            # Informative message
-            draw.text((20, 90), "Could not interpret the texture", fill=(255, 100, 100))
-            draw.text((20, 120), "Recommendations:", fill=(200, 255, 200))
-            draw.text((20, 150), "1. Install ultimate_tex_cli for better visualization", fill=(255, 255, 255))
-            draw.text((20, 170), "   (https://github.com/ScanMountGoat/ultimate_tex)", fill=(200, 200, 255))
-            draw.text((20, 190), "2. Use Switch Toolbox for NUTEXB files", fill=(255, 255, 255))
-            
-            # File information
-            try:
-                file_size = os.path.getsize(nutexb_path)
-                draw.text((20, 230), f"File size: {file_size} bytes", fill=(255, 255, 255))
-                
-                # Show the first bytes as diagnostics
-                with open(nutexb_path, 'rb') as f:
-                    header = f.read(32)
-                header_bytes = " ".join([f"{b:02X}" for b in header[:16]])
-                draw.text((20, 250), f"Header: {header_bytes}", fill=(200, 255, 200))
-                
-                # Attempt to show the format
-                format_hint = "Unknown"
-                if header[8:12] == b'\x01\x00\x00\x00':
-                    format_hint = "Possible BC7"
-                elif header[8:12] == b'\x16\x00\x00\x00':
-                    format_hint = "Possible BC1"
-                draw.text((20, 270), f"Suggested format: {format_hint}", fill=(255, 200, 100))
-                
-            except Exception as e:
-                draw.text((20, 230), f"Error reading file: {str(e)}", fill=(255, 100, 100))
-            
-            info_img.save(output_path)
-            print(f"Informative image created: {output_path}")
-            return output_path
-            
-        except Exception as e:
-            print(f"General error: {str(e)}")
-            
-            # Last resort: create error image
-            try:
-                # Re-import PIL in case the exception occurred before
-                from PIL import Image, ImageDraw
-                
-                error_img = Image.new('RGB', (512, 200), color=(60, 0, 0))
-                draw = ImageDraw.Draw(error_img)
-                
-                # Error message
-                draw.text((20, 20), "CONVERSION ERROR", fill=(255, 50, 50))
-                draw.text((20, 50), os.path.basename(nutexb_path), fill=(200, 200, 255))
-                draw.text((20, 80), f"Error: {str(e)}", fill=(255, 255, 255))
-                
-                # Output
-                if output_dir is None:
-                    output_dir = tempfile.mkdtemp()
-                    
-                base_name = f"error_{os.path.basename(nutexb_path).split('.')[0]}_{str(uuid.uuid4())[:6]}.png"
-                output_path = os.path.join(output_dir, base_name)
-                
-                error_img.save(output_path)
-                return output_path
-            except Exception as inner_e:
-                print(f"Critical error creating error image: {inner_e}")
-                return None
-
     def are_nutexb_files_identical(self, file1: str, file2: str) -> bool:
         """
         Compares two NUTEXB files to check if they are identical
-        Uses image comparison since binary comparison may fail for NUTEXB files
+        Reads the NUTEXB footer and compares the image data in memory, without
+        converting the textures to PNG
         
         Args:
             file1: Path to the first NUTEXB file
             file2: Path to the second NUTEXB file
             
         Returns:
-            True if the files are visually identical, False otherwise
+            True if the files contain the same image, False otherwise
         """
-        if not NUTEXB_COMPARISON_AVAILABLE:
-            print("NUTEXB comparison not available: PIL and/or numpy not installed")
-            return False
-        
         try:
-            # Create temporary directories for conversion
-            temp_dir1 = tempfile.mkdtemp()
-            temp_dir2 = tempfile.mkdtemp()
-            
-            try:
-                # Convert NUTEXB to PNG for comparison
-                png1_path = self.nutexb_to_png(file1, temp_dir1)
-                png2_path = self.nutexb_to_png(file2, temp_dir2)
-                
-                if not png1_path or not png2_path:
-                    return False
-                
-                # Load images for comparison
-                img1 = Image.open(png1_path)
-                img2 = Image.open(png2_path)
-                
-                # Ensure both images have the same size for comparison
-                if img1.size != img2.size:
-                    # Resize the smaller one to the size of the larger
-                    width = max(img1.width, img2.width)
-                    height = max(img1.height, img2.height)
-                    
-                    if img1.width < width or img1.height < height:
-                        img1 = img1.resize((width, height), Image.LANCZOS)
-                    
-                    if img2.width < width or img2.height < height:
-                        img2 = img2.resize((width, height), Image.LANCZOS)
-                
-                # Ensure both images are in the same mode
-                if img1.mode != img2.mode:
-                    if "A" in img1.mode or "A" in img2.mode:
-                        if img1.mode != "RGBA":
-                            img1 = img1.convert("RGBA")
-                        if img2.mode != "RGBA":
-                            img2 = img2.convert("RGBA")
-                    else:
-                        img1 = img1.convert("RGB")
-                        img2 = img2.convert("RGB")
-                
-                # Calculate difference
-                diff_img = ImageChops.difference(img1, img2)
-                diff_array = np.array(diff_img)
-                
-                # Use extremely aggressive comparison
-                # Any pixel with any difference at all is considered different
-                if len(diff_array.shape) > 1 and diff_array.shape[2] > 1:
-                    # For images with multiple channels
-                    mask = np.sum(diff_array, axis=2) > 15  # Reduced from 30 to 1 - extremely sensitive to any difference
-                else:
-                    # For grayscale images
-                    mask = diff_array > 15  # Reduced from 30 to 1
-                
-                # Calculate similarity percentage
-                total_pixels = mask.size
-                diff_pixels = np.sum(mask)
-                
-                # If any pixels are different, return False
-                if diff_pixels > 0:
-                    print(f"Files differ by {diff_pixels} pixels out of {total_pixels}")
-                    return False
-                
-                # Only return True if the images are 100% identical
-                return True
-                
-            finally:
-                # Clean up temporary directories
-                shutil.rmtree(temp_dir1, ignore_errors=True)
-                shutil.rmtree(temp_dir2, ignore_errors=True)
-                
+            return nutexb_files_identical(file1, file2, self.texture_cache)
         except Exception as e:
             print(f"Error comparing NUTEXB files: {e}")
             return False
 
+    def build_nutexb_index(self, slot: str) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """
+        Indexes the NUTEXB files of a slot in every model folder
+        (model/body, model/weapon and any custom model folder)
+        
+        Args:
+            slot: Slot to index
+            
+        Returns:
+            Tuple with a dictionary from the path inside the model folder
+            (e.g. "weapon/def_sword_col.nutexb") to the full path, and a dictionary
+            from the file name to the full paths having it
+        """
+        by_path = {}
+        by_name = {}
+        model_dir = os.path.join(self.mod_directory, "fighter", self.fighter_name, "model")
+        if not os.path.isdir(model_dir):
+            return by_path, by_name
+        
+        for model_name in sorted(os.listdir(model_dir)):
+            slot_dir = os.path.join(model_dir, model_name, slot)
+            if not os.path.isdir(slot_dir):
+                continue
+            for file_path in self.find_nutexb_files(slot_dir):
+                model_path = "/".join([model_name] + os.path.relpath(file_path, slot_dir).split(os.sep))
+                by_path[model_path] = file_path
+                by_name.setdefault(os.path.basename(file_path), []).append(file_path)
+        
+        return by_path, by_name
+
     def compare_nutexb_files(self, main_slot: str, compare_slot: str) -> List[str]:
         """
         Compares NUTEXB files between two slots and finds identical textures
+        The main file each duplicate is identical to is kept in self.duplicate_sources
         
         Args:
             main_slot: Main slot to use as reference
@@ -1307,39 +1213,31 @@ class MovesetOptimizer:
         
         print(f"Comparing NUTEXB files between {main_slot} and {compare_slot}...")
         
-        # Find all NUTEXB files
-        main_dir = os.path.join(self.mod_directory, "fighter", self.fighter_name, "model", "body", main_slot)
-        compare_dir = os.path.join(self.mod_directory, "fighter", self.fighter_name, "model", "body", compare_slot)
+        # Index the NUTEXB files of every model folder (body, weapon, custom models...)
+        main_by_path, main_by_name = self.build_nutexb_index(main_slot)
+        compare_by_path, _ = self.build_nutexb_index(compare_slot)
         
-        if not os.path.exists(main_dir):
-            print(f"Main slot directory does not exist: {main_dir}")
+        if not main_by_path:
+            print(f"No NUTEXB files found for main slot {main_slot}")
             return []
         
-        if not os.path.exists(compare_dir):
-            print(f"Compare slot directory does not exist: {compare_dir}")
+        if not compare_by_path:
+            print(f"No NUTEXB files found for compare slot {compare_slot}")
             return []
         
-        # Get all NUTEXB files
-        main_files = self.find_nutexb_files(main_dir)
-        compare_files = self.find_nutexb_files(compare_dir)
-        
-        print(f"Found {len(main_files)} NUTEXB files in {main_slot}")
-        print(f"Found {len(compare_files)} NUTEXB files in {compare_slot}")
+        print(f"Found {len(main_by_path)} NUTEXB files in {main_slot}")
+        print(f"Found {len(compare_by_path)} NUTEXB files in {compare_slot}")
         
         # Find identical files
         duplicates = []
         
         # For each file in the secondary slot
-        for compare_file in compare_files:
-            # Try to find a matching file in the main slot
-            compare_basename = os.path.basename(compare_file)
-            
-            # First check for file with the same name
-            matching_file = None
-            for main_file in main_files:
-                if os.path.basename(main_file) == compare_basename:
-                    matching_file = main_file
-                    break
+        for model_path, compare_file in sorted(compare_by_path.items()):
+            # Same model folder and path first, then the same file name in any model folder
+            matching_file = main_by_path.get(model_path)
+            if not matching_file:
+                candidates = main_by_name.get(os.path.basename(compare_file))
+                matching_file = candidates[0] if candidates else None
             
             # If no match by name, continue
             if not matching_file:
@@ -1348,6 +1246,9 @@ class MovesetOptimizer:
             # Compare the files
             if self.are_nutexb_files_identical(matching_file, compare_file):
                 duplicates.append(compare_file)
+                # The match may come from another model folder, so share from the file that matched
+                self.duplicate_sources[os.path.relpath(compare_file, self.mod_directory)] = \
+                    os.path.relpath(matching_file, self.mod_directory)
                 print(f"Duplicate found: {compare_file}")
         
         print(f"Found {len(duplicates)} duplicate NUTEXB files")
@@ -1380,39 +1281,30 @@ class MovesetOptimizer:
         
         # Move duplicates to junk
         moved_files = []
+        transaction = JunkTransaction(self.mod_directory, self.junk_dir)
         for file_path in duplicates:
             # Track the directory for later cleanup
             affected_directories.add(os.path.dirname(file_path))
             
-            # Create path in junk directory
             rel_path = os.path.relpath(file_path, self.mod_directory)
-            junk_path = os.path.join(self.junk_dir, rel_path)
-            junk_dir = os.path.dirname(junk_path)
-            
-            # Create destination directory if it doesn't exist
-            if not os.path.exists(junk_dir):
-                os.makedirs(junk_dir)
-            
-            # Move file
-            try:
-                shutil.move(file_path, junk_path)
+            if transaction.add(rel_path):
                 moved_files.append(rel_path)
-                print(f"Moved: {rel_path}")
-            except Exception as e:
-                print(f"Error moving {file_path}: {e}")
         
-        # Update config.json
+        # Update config.json and move the files to junk
         if moved_files:
             # Create mapping for update_share_to_added
             duplicate_files_by_slot = {compare_slot: moved_files}
-            self.update_share_to_added(main_slot, duplicate_files_by_slot)
+            if self.update_share_to_added(main_slot, duplicate_files_by_slot, transaction) and self.mod_config.commit(transaction):
+                for rel_path in moved_files:
+                    print(f"Moved: {rel_path}")
+            else:
+                print("Error updating config.json, no files were moved")
+                moved_files = []
         
-        # Clean up empty directories
+        # Clean up the directories left empty by the moves
         if affected_directories:
             print("\nChecking for empty directories...")
-            fighter_dir = os.path.join(self.mod_directory, "fighter", self.fighter_name)
-            if os.path.exists(fighter_dir):
-                self.remove_empty_directories(fighter_dir)
+            self.prune_empty_directories(affected_directories)
         
         return moved_files
 
@@ -1496,49 +1388,92 @@ class MovesetOptimizer:
         
         # Otherwise, move files and update config
         result = {}
+        transaction = JunkTransaction(self.mod_directory, self.junk_dir)
         for slot, files in duplicates.items():
             moved_files = []
             for file_path in files:
                 # Track the directory for later cleanup
                 affected_directories.add(os.path.dirname(file_path))
                 
-                # Create path in junk directory
                 rel_path = os.path.relpath(file_path, self.mod_directory)
-                junk_path = os.path.join(self.junk_dir, rel_path)
-                junk_dir = os.path.dirname(junk_path)
-                
-                # Create destination directory if it doesn't exist
-                if not os.path.exists(junk_dir):
-                    os.makedirs(junk_dir)
-                
-                # Move file
-                try:
-                    shutil.move(file_path, junk_path)
+                if transaction.add(rel_path):
                     moved_files.append(rel_path)
-                    print(f"Moved: {rel_path}")
-                except Exception as e:
-                    print(f"Error moving {file_path}: {e}")
             
             if moved_files:
                 result[slot] = moved_files
         
-        # Update config.json with all moved files
+        # Update config.json with all moved files and move them to junk
         if result:
             print("\nUpdating config.json with shared NUTEXB files...")
-            if self.update_share_to_added(main_slot, result):
+            if self.update_share_to_added(main_slot, result, transaction) and self.mod_config.commit(transaction):
                 print("config.json updated successfully with shared NUTEXB files")
             else:
-                print("Error updating config.json")
+                print("Error updating config.json, no files were moved")
+                result = {}
         
-        # Clean up empty directories
+        # Clean up the directories left empty by the moves
         if affected_directories:
             print("\nChecking for empty directories...")
-            fighter_dir = os.path.join(self.mod_directory, "fighter", self.fighter_name)
-            if os.path.exists(fighter_dir):
-                self.remove_empty_directories(fighter_dir)
+            self.prune_empty_directories(affected_directories)
         
         return result
 
+    def prune_empty_directories(self, directories: Set[str]) -> int:
+        """
+        Removes the given directories if they are empty and walks upward removing
+        the parents left empty, without scanning the rest of the tree
+        Only directories inside fighter/[fighter] and camera/fighter/[fighter]
+        (both included) are removed
+        
+        Args:
+            directories: Directories that had files moved out of them
+            
+        Returns:
+            Number of removed directories
+        """
+        roots = [os.path.normcase(os.path.abspath(os.path.join(self.mod_directory, "fighter", self.fighter_name))),
+                 os.path.normcase(os.path.abspath(os.path.join(self.mod_directory, "camera", "fighter", self.fighter_name)))]
+        
+        def inside_roots(directory):
+            key = os.path.normcase(directory)
+            return any(key == root or key.startswith(root + os.sep) for root in roots)
+        
+        removed = set()
+        checked = set()
+        
+        def is_empty(directory):
+            # Directories removed in simulation mode still exist, they count as gone
+            try:
+                with os.scandir(directory) as entries:
+                    return all(entry.path in removed for entry in entries)
+            except FileNotFoundError:
+                return True
+        
+        # Deepest directories first, so parents are checked after their children
+        for directory in sorted({os.path.abspath(d) for d in directories}, key=len, reverse=True):
+            current = directory
+            while current not in checked and inside_roots(current):
+                checked.add(current)
+                if not is_empty(current):
+                    break
+                
+                if self.simulation:
+                    print(f"Simulation: Would remove empty directory: {current}")
+                elif os.path.exists(current):
+                    try:
+                        print(f"Removing empty directory: {current}")
+                        os.rmdir(current)
+                    except OSError as e:
+                        print(f"Error removing directory {current}: {e}")
+                        break
+                removed.add(current)
+                
+                # The parent may have been found non-empty before this child was removed
+                current = os.path.dirname(current)
+                checked.discard(current)
+        
+        return len(removed)
+    
     def remove_empty_directories(self, path: str):
         """
         Recursively remove empty directories starting from the given path
@@ -1594,10 +1529,22 @@ def main():
     parser.add_argument("--simulate", action="store_true", help="Simulate optimization without making real changes")
     parser.add_argument("--debug", action="store_true", help="Activate debug messages")
     parser.add_argument("--list-slots", action="store_true", help="Show the slots available in the mod")
+    parser.add_argument("--global-dedup", action="store_true", help="Cluster identical files across all slots, not only against the main slot")
+    parser.add_argument("--texture-cache", help="Directory to keep decoded textures between runs (optional)")
+    parser.add_argument("--near-duplicate-psnr", type=float, help="With --global-dedup, also share textures with at least this PSNR in dB (e.g. 45)")
+    
+    parser.add_argument("--resume-junk", action="store_true", help="Finish an interrupted move to junk and exit")
+    parser.add_argument("--rollback-junk", action="store_true", help="Undo an interrupted move to junk and exit")
     
     args = parser.parse_args()
     print(f"Received arguments: {args}")
     
+    # Recover an interrupted junk operation before anything else touches the mod
+    if args.resume_junk or args.rollback_junk:
+        if not recover_pending_transaction(args.mod_directory, rollback=args.rollback_junk):
+            print("No interrupted junk operation found")
+        return 0
+    
     try:
         print(f"Initializing optimizer with directory: {args.mod_directory}")
         optimizer = MovesetOptimizer(
@@ -1606,6 +1553,8 @@ def main():
             main_slot=args.main_slot,
             simulation=args.simulate
         )
+        if args.texture_cache:
+            optimizer.texture_cache.cache_dir = args.texture_cache
         
         # Show available slots
         if args.list_slots:
@@ -1650,6 +1599,26 @@ def main():
             
             return
         
+        # Global clustering across all slots
+        if args.global_dedup:
+            if args.simulate:
+                print(f"Simulating global optimization for {args.mod_directory}...")
+                clusters = optimizer.analyze_mod_global(near_duplicate_psnr=args.near_duplicate_psnr)
+            else:
+                print(f"Optimizing mod globally in {args.mod_directory}...")
+                clusters = optimizer.optimize_mod_global(near_duplicate_psnr=args.near_duplicate_psnr)
+            
+            total_files = 0
+            for owner_file, files in clusters.items():
+                print(f"  {owner_file}: {len(files)} duplicate files")
+                if args.debug:
+                    for file in files:
+                        print(f"    - {file}")
+                total_files += len(files)
+                
+            print(f"Total: {total_files} duplicate files found")
+            return
+        
         # Analysis/optimization general
         if args.simulate:
             print(f"Simulating optimization for {args.mod_directory}...")
@@ -336,8 +336,9 @@ class MovesetOptimizerGUI:
                 simulation=self.simulate_var.get()
             )
             
-            # Execute task
-            task_func()
+            # Execute task, config.json is compacted once when it finishes
+            with self.optimizer.mod_config.batch():
+                task_func()
             
             # Update status
             self.root.after(0, lambda: self.set_status("Ready"))
@@ -580,14 +581,11 @@ class MovesetOptimizerGUI:
             messagebox.showerror("Error", "Select a valid mod directory")
             return
             
-        # Get main slot (if selected)
-        main_slot = self.main_slot.get()
-        
         self.log(f"Analyzing complete mod: {mod_path}")
         
-        # Create optimizer
         try:
-            optimizer = MovesetOptimizer(mod_path, main_slot=main_slot, simulation=True)
+            # Optimizer of the task, whose config.json writes are batched by _run_task_thread
+            optimizer = self.optimizer
             
             # Complete analysis
             self.log("Starting full analysis of all slots...")
@@ -633,18 +631,15 @@ class MovesetOptimizerGUI:
             messagebox.showerror("Error", "Select a valid mod directory")
             return
             
-        # Get main slot (if selected)
-        main_slot = self.main_slot.get()
-        
         # Check if we're in simulation mode
         simulate = self.simulate_var.get()
         simulator_text = "SIMULATING" if simulate else "OPTIMIZING"
         
         self.log(f"{simulator_text} complete mod: {mod_path}")
         
-        # Create optimizer
         try:
-            optimizer = MovesetOptimizer(mod_path, main_slot=main_slot, simulation=simulate)
+            # Optimizer of the task, whose config.json writes are batched by _run_task_thread
+            optimizer = self.optimizer
             
             # Optimize everything
             self.log("Starting complete optimization...")
@@ -0,0 +1,653 @@
+import os
+import mmap
+import struct
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+try:
+    import numpy as np
+    from bcn import decode_blocks
+    DECODER_AVAILABLE = True
+except ImportError:
+    DECODER_AVAILABLE = False
+
+# Size of the footer at the end of every NUTEXB file
+FOOTER_SIZE = 0x70
+# Size of the mipmap size table stored for each layer before the footer
+LAYER_MIPMAPS_SIZE = 0x40
+
+# Switch block linear layout constants (a GOB is 64 bytes wide and 8 rows high)
+GOB_WIDTH_IN_BYTES = 64
+GOB_HEIGHT_IN_BYTES = 8
+GOB_SIZE_IN_BYTES = GOB_WIDTH_IN_BYTES * GOB_HEIGHT_IN_BYTES
+
+# NUTEXB image formats: code -> (name, block width, block height, bytes per block)
+NUTEXB_FORMATS = {
+    0x00: ("R8Unorm", 1, 1, 1),
+    0x0e: ("R8G8B8A8Unorm", 1, 1, 4),
+    0x0f: ("R8G8B8A8Srgb", 1, 1, 4),
+    0x34: ("R32G32B32A32Float", 1, 1, 16),
+    0x50: ("B8G8R8A8Unorm", 1, 1, 4),
+    0x51: ("B8G8R8A8Srgb", 1, 1, 4),
+    0x80: ("BC1Unorm", 4, 4, 8),
+    0x81: ("BC1Srgb", 4, 4, 8),
+    0x90: ("BC2Unorm", 4, 4, 16),
+    0x91: ("BC2Srgb", 4, 4, 16),
+    0xa0: ("BC3Unorm", 4, 4, 16),
+    0xa1: ("BC3Srgb", 4, 4, 16),
+    0xb0: ("BC4Unorm", 4, 4, 8),
+    0xb1: ("BC4Snorm", 4, 4, 8),
+    0xc0: ("BC5Unorm", 4, 4, 16),
+    0xc1: ("BC5Snorm", 4, 4, 16),
+    0xd7: ("BC6Ufloat", 4, 4, 16),
+    0xd8: ("BC6Sfloat", 4, 4, 16),
+    0xe0: ("BC7Unorm", 4, 4, 16),
+    0xe1: ("BC7Srgb", 4, 4, 16),
+}
+
+
+class NutexbFooter:
+    """Footer of a NUTEXB file with the dimensions and layout of the image data"""
+
+    def __init__(self):
+        self.name = ""            # Texture name, usually the file name without extension
+        self.width = 0
+        self.height = 0
+        self.depth = 0
+        self.image_format = 0     # Code of the image format (see NUTEXB_FORMATS)
+        self.mipmap_count = 0
+        self.alignment = 0
+        self.layer_count = 0      # 6 for cube maps, 1 otherwise
+        self.data_size = 0        # Size of the image data at the start of the file
+
+    @classmethod
+    def from_binary(cls, data) -> Optional['NutexbFooter']:
+        """
+        Creates a NutexbFooter from the content of a NUTEXB file
+
+        Args:
+            data: Content of the whole file
+
+        Returns:
+            The footer or None if the data is not a valid NUTEXB file
+        """
+        if len(data) < FOOTER_SIZE:
+            return None
+
+        base = len(data) - FOOTER_SIZE
+        if bytes(data[base:base + 4]) != b" XNT" or bytes(data[base + 0x68:base + 0x6C]) != b" XET":
+            return None
+
+        footer = cls()
+        footer.name = bytes(data[base + 4:base + 0x44]).split(b"\0", 1)[0].decode("utf-8", errors="ignore")
+        footer.width, footer.height, footer.depth = struct.unpack_from("<3I", data, base + 0x44)
+        footer.image_format = data[base + 0x50]
+        (_, footer.mipmap_count, footer.alignment,
+         footer.layer_count, footer.data_size) = struct.unpack_from("<5I", data, base + 0x54)
+
+        if footer.data_size > base:
+            return None
+        return footer
+
+    @property
+    def format_info(self) -> Optional[Tuple[str, int, int, int]]:
+        """(name, block width, block height, bytes per block) of the image format, if known"""
+        return NUTEXB_FORMATS.get(self.image_format)
+
+
+def div_round_up(value: int, divisor: int) -> int:
+    return (value + divisor - 1) // divisor
+
+
+def block_height_mip0(height_in_blocks: int) -> int:
+    """Block height in GOBs used by the base mip level of a surface"""
+    height_and_half = height_in_blocks + height_in_blocks // 2
+    for block_height, limit in ((16, 128), (8, 64), (4, 32), (2, 16)):
+        if height_and_half >= limit:
+            return block_height
+    return 1
+
+
+def mip_block_height(mip_height_in_blocks: int, block_height: int) -> int:
+    """Block height in GOBs used by a mip level, which shrinks with the mip height"""
+    while mip_height_in_blocks <= (block_height // 2) * GOB_HEIGHT_IN_BYTES and block_height > 1:
+        block_height //= 2
+    return block_height
+
+
+def swizzled_mip_size(width_in_blocks: int, height_in_blocks: int, block_height: int, bytes_per_block: int) -> int:
+    """Size in bytes of a block linear mip level"""
+    width_in_gobs = div_round_up(width_in_blocks * bytes_per_block, GOB_WIDTH_IN_BYTES)
+    height_in_block_rows = div_round_up(height_in_blocks, block_height * GOB_HEIGHT_IN_BYTES)
+    return width_in_gobs * height_in_block_rows * block_height * GOB_SIZE_IN_BYTES
+
+
+def align_layer_size(layer_size: int, height_in_blocks: int, block_height: int) -> int:
+    """Aligns the size of an array layer as the Switch does for cube maps and arrays"""
+    block_height = mip_block_height(height_in_blocks, block_height)
+    alignment = block_height * GOB_SIZE_IN_BYTES
+    return div_round_up(layer_size, alignment) * alignment
+
+
+def mip_layout(footer: NutexbFooter) -> List[List[Tuple[int, int, int, int, int]]]:
+    """
+    Calculates where each mip level of each layer is stored in the image data
+
+    Args:
+        footer: Footer of the NUTEXB file
+
+    Returns:
+        List of layers, each one a list of (offset, size, width, height, block height)
+        for every mip level, with width and height in blocks
+    """
+    _, block_width, block_height, bytes_per_block = footer.format_info
+    height_in_blocks = div_round_up(footer.height, block_height)
+    gob_block_height = block_height_mip0(height_in_blocks)
+
+    layers = []
+    offset = 0
+    for _ in range(max(footer.layer_count, 1)):
+        layer_start = offset
+        mips = []
+        for mip in range(max(footer.mipmap_count, 1)):
+            mip_width = max(div_round_up(max(footer.width >> mip, 1), block_width), 1)
+            mip_height = max(div_round_up(max(footer.height >> mip, 1), block_height), 1)
+            mip_gob_height = mip_block_height(mip_height, gob_block_height)
+            size = swizzled_mip_size(mip_width, mip_height, mip_gob_height, bytes_per_block)
+            mips.append((offset, size, mip_width, mip_height, mip_gob_height))
+            offset += size
+        layers.append(mips)
+
+        if footer.layer_count > 1:
+            offset = layer_start + align_layer_size(offset - layer_start, height_in_blocks, gob_block_height)
+
+    return layers
+
+
+def deswizzle(data, width_in_blocks: int, height_in_blocks: int, block_height: int, bytes_per_block: int) -> 'np.ndarray':
+    """
+    Converts a block linear mip level to rows of blocks
+
+    The padded surface is made of block rows of block_height GOBs, each GOB being
+    64 bytes x 8 rows stored in a fixed order, so the whole conversion is a reshape
+    and a transpose of the data
+
+    Returns:
+        (height in blocks, width in blocks * bytes per block) uint8 array
+    """
+    width_in_gobs = div_round_up(width_in_blocks * bytes_per_block, GOB_WIDTH_IN_BYTES)
+    block_rows = div_round_up(height_in_blocks, block_height * GOB_HEIGHT_IN_BYTES)
+    size = swizzled_mip_size(width_in_blocks, height_in_blocks, block_height, bytes_per_block)
+
+    # Axes: block row, GOB column, GOB in block, then inside the GOB:
+    # x / 32, (y % 8) / 2, (x % 32) / 16, y % 2, x % 16
+    surface = np.frombuffer(data, dtype=np.uint8, count=size)
+    surface = surface.reshape(block_rows, width_in_gobs, block_height, 2, 4, 2, 2, 16)
+    surface = surface.transpose(0, 2, 4, 6, 1, 3, 5, 7)
+    surface = surface.reshape(block_rows * block_height * GOB_HEIGHT_IN_BYTES, width_in_gobs * GOB_WIDTH_IN_BYTES)
+    return surface[:height_in_blocks, :width_in_blocks * bytes_per_block]
+
+
+class NutexbFile:
+    """
+    Reader for NUTEXB files backed by a memory map
+    Mip levels and layers are exposed as memoryviews, so nothing is copied
+    until the caller needs it
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.footer = None
+        self.layout = []
+        self._file = open(file_path, "rb")
+        self._map = None
+        self._views = []
+
+        try:
+            if os.fstat(self._file.fileno()).st_size > 0:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.footer = NutexbFooter.from_binary(self._map)
+            if self.footer is not None and self.footer.format_info is not None:
+                self.layout = mip_layout(self.footer)
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self) -> 'NutexbFile':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Releases the memory map and the file"""
+        for view in self._views:
+            try:
+                view.release()
+            except BufferError:
+                pass
+        self._views = []
+
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A view is still referenced by the caller, the map is freed with it
+                pass
+            self._map = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def is_valid(self) -> bool:
+        """True if the file has a NUTEXB footer"""
+        return self.footer is not None
+
+    @property
+    def is_decodable(self) -> bool:
+        """True if the image format and the mip layout are known"""
+        return bool(self.layout) and self.layout[-1][-1][0] + self.layout[-1][-1][1] <= self.footer.data_size
+
+    def _view(self, start: int, end: int) -> memoryview:
+        view = memoryview(self._map)[start:end]
+        self._views.append(view)
+        return view
+
+    def raw(self) -> memoryview:
+        """Whole content of the file"""
+        if self._map is None:
+            return memoryview(b"")
+        return self._view(0, len(self._map))
+
+    def data(self) -> memoryview:
+        """Image data of all the layers and mip levels, without the footer"""
+        return self._view(0, self.footer.data_size)
+
+    def mipmap_sizes(self) -> List[int]:
+        """Sizes of the mip levels stored in the table before the footer"""
+        file_size = len(self._map)
+        table = self.footer.data_size
+        if table + self.footer.layer_count * LAYER_MIPMAPS_SIZE + FOOTER_SIZE != file_size:
+            table = file_size - FOOTER_SIZE - LAYER_MIPMAPS_SIZE
+        count = min(self.footer.mipmap_count, LAYER_MIPMAPS_SIZE // 4)
+        return list(struct.unpack_from(f"<{count}I", self._map, table))
+
+    def layer(self, layer: int = 0) -> memoryview:
+        """Block linear data of every mip level of a layer"""
+        mips = self.layout[layer]
+        return self._view(mips[0][0], mips[-1][0] + mips[-1][1])
+
+    def mip(self, layer: int = 0, level: int = 0) -> memoryview:
+        """Block linear data of a mip level of a layer"""
+        offset, size = self.layout[layer][level][:2]
+        return self._view(offset, offset + size)
+
+    def mip_size(self, level: int = 0) -> Tuple[int, int]:
+        """Width and height in pixels of a mip level"""
+        return max(self.footer.width >> level, 1), max(self.footer.height >> level, 1)
+
+    def decode(self, layer: int = 0, level: int = 0) -> Optional['np.ndarray']:
+        """
+        Decodes a mip level of a layer to RGBA pixels
+
+        Returns:
+            (height, width, 4) uint8 array or None if the format cannot be decoded
+        """
+        if not DECODER_AVAILABLE or not self.is_decodable:
+            return None
+
+        format_name, _, _, bytes_per_block = self.footer.format_info
+        _, _, width_in_blocks, height_in_blocks, block_height = self.layout[layer][level]
+        blocks = deswizzle(self.mip(layer, level), width_in_blocks, height_in_blocks, block_height, bytes_per_block)
+        width, height = self.mip_size(level)
+        return decode_blocks(format_name, np.ascontiguousarray(blocks), width, height)
+
+
+def mip0_digest(nutexb: NutexbFile) -> Optional[str]:
+    """
+    Calculates a hash of the base mip level of every layer of a texture, ignoring
+    the name, the smaller mip levels and the padding of the file
+
+    Args:
+        nutexb: Opened NUTEXB file
+
+    Returns:
+        Hexadecimal digest or None if the image format or layout is unknown
+    """
+    if not nutexb.is_decodable:
+        return None
+
+    footer = nutexb.footer
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(struct.pack("<4I", footer.image_format, footer.width, footer.height, footer.layer_count))
+    for layer in range(len(nutexb.layout)):
+        digest.update(nutexb.mip(layer, 0))
+    return digest.hexdigest()
+
+
+class TextureCache:
+    """
+    Cache of what comparisons need from NUTEXB files, so a texture compared
+    against many others (e.g. the main slot against every slot) is read and
+    decoded only once
+
+    Small signatures (sizes, format and digests) are kept for every file. Decoded
+    pixels are kept in an LRU bounded by bytes and, if a directory is given, saved
+    on disk by content hash to be reused between runs
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, cache_dir: str = None):
+        """
+        Args:
+            max_bytes: Maximum size of the decoded pixels kept in memory
+            cache_dir: Directory for the on-disk cache of decoded pixels (optional)
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.used_bytes = 0
+        self._signatures = {}
+        self._pixels = OrderedDict()
+
+    @staticmethod
+    def _file_key(file_path: str) -> Tuple[str, int, int]:
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    def signature(self, file_path: str) -> Tuple:
+        """
+        Returns (is_valid, (width, height, layers), format, data digest, mip0 digest)
+        of a NUTEXB file, where the digests identify the image data and the base
+        mip levels. Files that are not NUTEXB use the digest of the whole file
+        """
+        key = self._file_key(file_path)
+        if key not in self._signatures:
+            with NutexbFile(file_path) as nutexb:
+                if not nutexb.is_valid:
+                    digest = hashlib.blake2b(nutexb.raw(), digest_size=16).hexdigest()
+                    self._signatures[key] = (False, None, None, digest, None)
+                else:
+                    footer = nutexb.footer
+                    self._signatures[key] = (
+                        True,
+                        (footer.width, footer.height, footer.layer_count),
+                        footer.image_format,
+                        hashlib.blake2b(nutexb.data(), digest_size=16).hexdigest(),
+                        mip0_digest(nutexb),
+                    )
+        return self._signatures[key]
+
+    def pixels(self, file_path: str, layer: int = 0, level: int = 0) -> Optional['np.ndarray']:
+        """Decoded RGBA pixels of a mip level, or None if the format can't be decoded"""
+        if not DECODER_AVAILABLE:
+            return None
+
+        data_digest = self.signature(file_path)[3]
+        key = (data_digest, layer, level)
+        if key in self._pixels:
+            self._pixels.move_to_end(key)
+            return self._pixels[key]
+
+        disk_path = None
+        pixels = None
+        if self.cache_dir:
+            disk_path = os.path.join(self.cache_dir, f"{data_digest}_{layer}_{level}.npy")
+            if os.path.exists(disk_path):
+                try:
+                    pixels = np.load(disk_path)
+                except (OSError, ValueError):
+                    pixels = None
+
+        if pixels is None:
+            with NutexbFile(file_path) as nutexb:
+                pixels = nutexb.decode(layer, level)
+            if pixels is not None and disk_path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.save(disk_path, pixels)
+
+        self._store(key, pixels)
+        return pixels
+
+    def _store(self, key, pixels):
+        size = pixels.nbytes if pixels is not None else 0
+        if size > self.max_bytes:
+            return
+        self._pixels[key] = pixels
+        self.used_bytes += size
+        while self.used_bytes > self.max_bytes:
+            _, evicted = self._pixels.popitem(last=False)
+            self.used_bytes -= evicted.nbytes if evicted is not None else 0
+
+    def files_identical(self, file1: str, file2: str) -> bool:
+        """Same result as nutexb_files_identical, using the cached signatures and pixels"""
+        valid1, shape1, format1, data1, mip1 = self.signature(file1)
+        valid2, shape2, format2, data2, mip2 = self.signature(file2)
+        if not valid1 or not valid2:
+            return valid1 == valid2 and data1 == data2
+
+        if data1 == data2:
+            return True
+        if shape1 != shape2:
+            return False
+
+        if format1 != format2:
+            for layer in range(max(shape1[2], 1)):
+                pixels1 = self.pixels(file1, layer)
+                pixels2 = self.pixels(file2, layer)
+                if pixels1 is None or pixels2 is None or not np.array_equal(pixels1, pixels2):
+                    return False
+            return True
+
+        return mip1 is not None and mip1 == mip2
+
+
+def nutexb_files_identical(file1: str, file2: str, cache: TextureCache = None) -> bool:
+    """
+    Compares two NUTEXB files by content without converting them to images
+    Identical image data is accepted right away, otherwise the base mip levels are compared,
+    decoding them to pixels when the formats differ
+
+    Args:
+        file1: Path to the first NUTEXB file
+        file2: Path to the second NUTEXB file
+
+        cache: Cache to reuse what was read from files compared before (optional)
+
+    Returns:
+        True if both files contain the same image, False otherwise
+    """
+    if cache is not None:
+        return cache.files_identical(file1, file2)
+
+    with NutexbFile(file1) as nutexb1, NutexbFile(file2) as nutexb2:
+        if not nutexb1.is_valid or not nutexb2.is_valid:
+            # Not a NUTEXB we can parse, only a byte comparison is reliable
+            return nutexb1.raw() == nutexb2.raw()
+
+        # Same image data, only the name or the padding may differ
+        if nutexb1.data() == nutexb2.data():
+            return True
+
+        footer1, footer2 = nutexb1.footer, nutexb2.footer
+        if (footer1.width, footer1.height, footer1.layer_count) != \
+           (footer2.width, footer2.height, footer2.layer_count):
+            return False
+
+        if footer1.image_format != footer2.image_format:
+            # Different encodings can still hold the same pixels (e.g. BC7 and RGBA8)
+            for layer in range(max(footer1.layer_count, 1)):
+                pixels1 = nutexb1.decode(layer)
+                pixels2 = nutexb2.decode(layer)
+                if pixels1 is None or pixels2 is None or not np.array_equal(pixels1, pixels2):
+                    return False
+            return True
+
+        digest1 = mip0_digest(nutexb1)
+        return digest1 is not None and digest1 == mip0_digest(nutexb2)
+
+
+# Perceptual comparison: textures are hashed on a small mip level to find candidates
+# and confirmed with the PSNR of a larger mip level
+HASH_MIP_SIZE = 64
+CONFIRM_MIP_SIZE = 256
+HASH_BANDS = 8
+
+
+def select_mip_level(nutexb: NutexbFile, max_size: int) -> int:
+    """Largest mip level whose sides fit in max_size, or the smallest one stored"""
+    for level in range(len(nutexb.layout[0])):
+        if max(nutexb.mip_size(level)) <= max_size:
+            return level
+    return len(nutexb.layout[0]) - 1
+
+
+def resize_gray(pixels: 'np.ndarray', size: int) -> 'np.ndarray':
+    """
+    Averages an RGBA image into a size x size grayscale image using an integral image,
+    so any source size works without resampling libraries
+    """
+    gray = pixels.astype(np.float64).mean(axis=2)
+    height, width = gray.shape
+    integral = np.zeros((height + 1, width + 1))
+    integral[1:, 1:] = gray.cumsum(axis=0).cumsum(axis=1)
+
+    def edges(length):
+        start = np.arange(size) * length // size
+        end = np.maximum((np.arange(size) + 1) * length // size, start + 1)
+        return start, end
+
+    y0, y1 = edges(height)
+    x0, x1 = edges(width)
+    sums = (integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0])
+    return sums / ((y1 - y0)[:, None] * (x1 - x0)[None, :])
+
+
+def _dct_matrix(size: int) -> 'np.ndarray':
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    return np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+
+
+def perceptual_hash(pixels: 'np.ndarray') -> int:
+    """
+    Calculates a 64 bit pHash: the signs against the median of the lowest 8x8
+    DCT frequencies of a 32x32 grayscale version of the image
+    """
+    dct = _dct_matrix(32)
+    frequencies = (dct @ resize_gray(pixels, 32) @ dct.T)[:8, :8].flatten()
+    bits = frequencies > np.median(frequencies[1:])
+    return int(np.packbits(bits.astype(np.uint8)).view(">u8")[0])
+
+
+def psnr(pixels1: 'np.ndarray', pixels2: 'np.ndarray') -> float:
+    """Peak signal to noise ratio in dB between two RGBA images of the same size"""
+    difference = pixels1.astype(np.float32) - pixels2.astype(np.float32)
+    mse = float(np.mean(difference * difference))
+    if mse == 0:
+        return float("inf")
+    return float(10 * np.log10(255.0 * 255.0 / mse))
+
+
+class PerceptualIndex:
+    """
+    Index of perceptual hashes for near duplicate NUTEXB textures
+
+    Hashes are split in bands and stored in buckets by texture size, so only
+    textures sharing a band are compared, instead of every pair of textures
+    """
+
+    def __init__(self, max_distance: int = 6, cache: TextureCache = None):
+        """
+        Args:
+            max_distance: Maximum number of different hash bits for two textures to be candidates
+                (up to HASH_BANDS - 1 is guaranteed to be found)
+            cache: Cache for the decoded mip levels (optional)
+        """
+        self.max_distance = max_distance
+        self.cache = cache if cache is not None else TextureCache()
+        self.entries = []          # (key, file path, shape, hash)
+        self.buckets = {}
+
+    def add(self, key, file_path: str) -> bool:
+        """
+        Hashes a texture and adds it to the index
+
+        Args:
+            key: Value returned for the texture in the results
+            file_path: Path to the NUTEXB file
+
+        Returns:
+            True if the texture could be decoded and was added
+        """
+        if not DECODER_AVAILABLE:
+            return False
+
+        with NutexbFile(file_path) as nutexb:
+            if not nutexb.is_decodable:
+                return False
+            level = select_mip_level(nutexb, HASH_MIP_SIZE)
+            footer = nutexb.footer
+            shape = (footer.width, footer.height, footer.layer_count)
+
+        pixels = self.cache.pixels(file_path, 0, level)
+        if pixels is None:
+            return False
+
+        texture_hash = perceptual_hash(pixels)
+        index = len(self.entries)
+        self.entries.append((key, file_path, shape, texture_hash))
+        for band in range(HASH_BANDS):
+            band_value = (texture_hash >> (band * 64 // HASH_BANDS)) & ((1 << (64 // HASH_BANDS)) - 1)
+            self.buckets.setdefault((shape, band, band_value), []).append(index)
+        return True
+
+    def candidate_pairs(self) -> List[Tuple[int, int]]:
+        """Pairs of entries with the same size and close hashes"""
+        pairs = set()
+        for indices in self.buckets.values():
+            for position, first in enumerate(indices):
+                for second in indices[position + 1:]:
+                    if (first, second) in pairs:
+                        continue
+                    distance = bin(self.entries[first][3] ^ self.entries[second][3]).count("1")
+                    if distance <= self.max_distance:
+                        pairs.add((first, second))
+        return sorted(pairs)
+
+    def _pixels(self, index: int) -> Optional['np.ndarray']:
+        file_path = self.entries[index][1]
+        with NutexbFile(file_path) as nutexb:
+            level = select_mip_level(nutexb, CONFIRM_MIP_SIZE)
+        return self.cache.pixels(file_path, 0, level)
+
+    def similarity(self, first: int, second: int) -> float:
+        """PSNR in dB between two entries, 0 if they can't be compared"""
+        pixels1, pixels2 = self._pixels(first), self._pixels(second)
+        if pixels1 is None or pixels2 is None or pixels1.shape != pixels2.shape:
+            return 0.0
+        return psnr(pixels1, pixels2)
+
+    def find_groups(self, min_psnr: float) -> List[List[int]]:
+        """
+        Groups entries connected by candidate pairs with a PSNR of at least min_psnr
+
+        Returns:
+            Lists of entry indices with more than one entry
+        """
+        parent = list(range(len(self.entries)))
+
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        for first, second in self.candidate_pairs():
+            if find(first) != find(second) and self.similarity(first, second) >= min_psnr:
+                parent[find(first)] = find(second)
+
+        groups = {}
+        for index in range(len(self.entries)):
+            groups.setdefault(find(index), []).append(index)
+        return [group for group in groups.values() if len(group) > 1]
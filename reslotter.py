@@ -6,6 +6,8 @@ import sys
 import json
 import re
 
+from mod_config import ModConfig
+
 def usage():
     print("usage: python reslotter.py <mod_directory> <hashes_file> <fighter_name> <current_alt> <target_alt> <share_slot> <out_directory>")
     sys.exit(2)
@@ -415,27 +417,11 @@ def init(hashes_file, mod_directory, newConfig):
     
     # If there's an existing configuration, load it but maintain the desired order
     if (not newConfig):
-        existing_config_file = mod_directory + "/config.json"
-        if (os.path.isfile(existing_config_file)):
-            try:
-                with open(existing_config_file, "r", encoding='utf-8') as f:
-                    config = json.load(f)
-                    # Maintain the correct order of sections
-                    if "new-dir-infos" in config:
-                        existing_config["new-dir-infos"] = config["new-dir-infos"]
-                    if "new-dir-infos-base" in config:
-                        existing_config["new-dir-infos-base"] = config["new-dir-infos-base"]
-                    if "share-to-vanilla" in config:
-                        existing_config["share-to-vanilla"] = config["share-to-vanilla"]
-                    if "new-dir-files" in config:
-                        existing_config["new-dir-files"] = config["new-dir-files"]
-                    if "share-to-added" in config:
-                        existing_config["share-to-added"] = config["share-to-added"]
-                    f.close()
-            except Exception as e:
-                print(f"Error loading config.json: {e}")
-                # If there's an error, use the default configuration
-                pass
+        config = ModConfig(mod_directory).data
+        # Maintain the correct order of sections
+        for section in existing_config:
+            if section in config:
+                existing_config[section] = config[section]
 
     resulting_config = existing_config
     
@@ -7,11 +7,11 @@ from tkinter import messagebox
 import sys
 import shutil
 import webbrowser
-import json
 import re
 import xml.etree.ElementTree as ET
 
 import reslotter
+from mod_config import ModConfig
 
 root = Tk()
 root.programName="Reslotter GUI"
@@ -802,9 +802,10 @@ def SubCall(fighters, onlyConfig, sources, targets, shares, exclude, clone):
 				RenameUI(root.targetDir,fighter,newName)
 
 		# Guardar el config ordenado correctamente
-		newConfigLocation = root.targetDir + '/config.json'
-		with open(newConfigLocation, 'w+', encoding='utf-8') as f:
-			json.dump(ordered_config if ordered_config else reslotter.resulting_config, f, ensure_ascii=False, indent=4)
+		modConfig = ModConfig(root.targetDir)
+		modConfig.replace(ordered_config if ordered_config else reslotter.resulting_config)
+		if not modConfig.save():
+			print("Error writing "+modConfig.path)
 
 		UpdateHeader("¡Completed!", "green")
 		messagebox.showinfo(root.title(),"¡Process completed successfully!")
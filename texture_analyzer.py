@@ -6,17 +6,26 @@ import re
 import json
 import struct
 import shutil
+import mmap
+import hashlib
 import binascii
 import importlib.util
 import subprocess
 import sys
 import time
 import tempfile
+import threading
 import glob
-from typing import Dict, List, Set, Tuple, Optional, Any
+from typing import Dict, List, NamedTuple, Set, Tuple, Optional, Any
 from pathlib import Path
 import logging
 import argparse
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from junk_transaction import JunkTransaction, write_json_atomic
+from mod_config import ModConfig
 
 # Global para indicar si ssbh_data_py está disponible
 SSBH_DATA_PY_AVAILABLE = None
@@ -62,8 +71,8 @@ def try_read_matl_with_ssbh(file_path: str) -> List[TextureReference]:
             material_label = entry.material_label
             
             for texture in entry.textures:
-                # Convertir ParamId a string para mejor legibilidad
-                param_id = str(texture.param_id)
+                # Convertir ParamId a string para mejor legibilidad (ej: "Texture0")
+                param_id = getattr(texture.param_id, "name", None) or str(texture.param_id)
                 texture_path = texture.data
                 
                 ref = TextureReference(
@@ -217,6 +226,157 @@ def try_read_anim_with_ssbh(file_path: str) -> Dict[str, Any]:
             print(f"Error también en método alternativo: {fallback_error}")
             return {}
 
+# Versión del formato de las tablas guardadas en disco por MaterialCache
+MATERIAL_CACHE_VERSION = 1
+
+class MaterialCache:
+    """
+    Caché de las tablas ya leídas de materiales (.numatb) y modelos (.numdlb), por hash del contenido
+    
+    Los alts suelen incluir archivos idénticos, que así se parsean una sola vez. Las tablas
+    se guardan en memoria en un LRU y, si se indica un directorio, también en disco para
+    reutilizarlas entre ejecuciones y entre los procesos de analyze_many. Se puede usar
+    desde varios hilos a la vez: el estado interno se protege con un lock y solo el
+    parseo y la lectura de los archivos se hacen fuera de él.
+    """
+    
+    def __init__(self, max_entries: int = 4096, cache_dir: str = None):
+        """
+        Args:
+            max_entries: Número máximo de tablas en memoria
+            cache_dir: Directorio de la caché en disco (opcional)
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._digests = {}          # (ruta, tamaño, mtime) -> hash del contenido
+        self._tables = OrderedDict()
+        self._saved = set()         # Tablas ya escritas en cache_dir
+        self._lock = threading.Lock()
+    
+    def table(self, kind: str, file_path: str, parse) -> Optional[List[Tuple]]:
+        """
+        Devuelve la tabla de un archivo, parseándolo solo si su contenido no se ha visto antes
+        
+        Args:
+            kind: Tipo de tabla ("matl" o "modl")
+            file_path: Ruta al archivo
+            parse: Función que recibe (ruta, contenido) y devuelve la tabla como lista de tuplas
+            
+        Returns:
+            Lista de tuplas o None si no se pudo leer el archivo
+        """
+        data = None
+        try:
+            stat = os.stat(file_path)
+            file_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+            with self._lock:
+                digest = self._digests.get(file_key)
+            if digest is None:
+                data = self._read(file_path)
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                with self._lock:
+                    self._digests[file_key] = digest
+        except OSError as e:
+            print(f"Error al leer {file_path}: {e}")
+            return None
+        
+        key = (kind, digest)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+        if table is None:
+            table = self._load(kind, digest)
+        
+        if table is None:
+            try:
+                if data is None:
+                    data = self._read(file_path)
+            except OSError as e:
+                print(f"Error al leer {file_path}: {e}")
+                return None
+            table = parse(file_path, data)
+        
+        self._save(kind, digest, table)
+        self._store(key, table)
+        return table
+    
+    @staticmethod
+    def _read(file_path: str) -> bytes:
+        with open(file_path, 'rb') as f:
+            return f.read()
+    
+    def _disk_path(self, kind: str, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.{kind}.json")
+    
+    def _load(self, kind: str, digest: str) -> Optional[List[Tuple]]:
+        if not self.cache_dir:
+            return None
+        disk_path = self._disk_path(kind, digest)
+        if not os.path.exists(disk_path):
+            return None
+        try:
+            with open(disk_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") != MATERIAL_CACHE_VERSION:
+                return None
+            table = [tuple(row) for row in cached["table"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        with self._lock:
+            self._saved.add((self.cache_dir, kind, digest))
+        return table
+    
+    def _save(self, kind: str, digest: str, table: List[Tuple]):
+        # Las tablas vacías suelen ser errores de lectura, que no se guardan para no repetirlos
+        saved_key = (self.cache_dir, kind, digest)
+        with self._lock:
+            if not self.cache_dir or not table or saved_key in self._saved:
+                return
+            self._saved.add(saved_key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_json_atomic(self._disk_path(kind, digest), {"version": MATERIAL_CACHE_VERSION, "table": table})
+        except OSError as e:
+            print(f"No se pudo guardar la caché de {kind} {digest}: {e}")
+            with self._lock:
+                self._saved.discard(saved_key)
+    
+    def _store(self, key: Tuple[str, str], table: List[Tuple]):
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+
+# Caché compartida por read_material_references y read_modl_material_map
+MATERIAL_CACHE = MaterialCache()
+
+def _parse_material_table(file_path: str, data: bytes) -> List[Tuple[str, str, str]]:
+    """Tabla (textura, parámetro, material) de un .numatb, para MaterialCache"""
+    return [(reference.texture_path, reference.parameter_name, reference.material_label)
+            for reference in MatlParser(file_path).parse(data)]
+
+def read_material_references(file_path: str, cache: MaterialCache = None) -> List[TextureReference]:
+    """
+    Lee las referencias a texturas de un archivo .numatb directamente en memoria,
+    sin pasar por JSON ni leer vectores, floats, booleanos o samplers.
+    Los materiales con el mismo contenido (habitual entre alts) se parsean una sola vez.
+    
+    Args:
+        file_path: Ruta al archivo .numatb
+        cache: Caché de tablas a usar (opcional, por defecto MATERIAL_CACHE)
+        
+    Returns:
+        Lista de TextureReference (vacía si no se pudo leer el archivo)
+    """
+    table = (cache if cache is not None else MATERIAL_CACHE).table("matl", file_path, _parse_material_table)
+    if table is None:
+        return []
+    
+    # La tabla guardada puede venir de otro archivo con el mismo contenido
+    return [TextureReference(texture_path, parameter_name, material_label, file_path)
+            for texture_path, parameter_name, material_label in table]
+
 def convert_numatb_to_json(file_path: str, output_dir: str) -> Optional[str]:
     """
     Convierte un archivo .numatb a JSON usando ssbh_data_py.
@@ -650,34 +810,73 @@ def convert_numdlb_to_text(file_path: str, output_dir: str) -> Optional[str]:
         print(f"Error al convertir {file_path} a texto: {e}")
         return None
 
-class TextureReference:
-    """Representa una referencia a una textura en un archivo de material"""
+class TextureReference(NamedTuple):
+    """Representa una referencia a una textura en un archivo de material (tupla compacta e inmutable)"""
     
-    def __init__(self, texture_path: str, parameter_name: str, material_label: str = "", file_path: str = ""):
-        self.texture_path = texture_path         # Ruta del archivo de textura
-        self.parameter_name = parameter_name     # Nombre del parámetro (ej: "Texture0")
-        self.material_label = material_label     # Etiqueta del material al que pertenece
-        self.file_path = file_path               # Ruta del archivo de material
+    texture_path: str           # Ruta del archivo de textura
+    parameter_name: str         # Nombre del parámetro (ej: "Texture0")
+    material_label: str = ""    # Etiqueta del material al que pertenece
+    file_path: str = ""         # Ruta del archivo de material
     
     def __str__(self) -> str:
         return f"{self.material_label} -> {self.parameter_name}: {self.texture_path}"
 
+# Estructura de los archivos SSBH (HBSS) que contienen un MATL
+SSBH_MAGIC = b'HBSS'
+MATL_MAGIC = b'LTAM'
+MATL_DATA_OFFSET = 0x10       # El MATL empieza después del encabezado HBSS
+MATL_ENTRY_SIZE = 0x20        # material_label, attributes (puntero + cantidad), shader_label
+MATL_ATTRIBUTE_SIZE = 0x18    # param_id, puntero a los datos, tipo de dato
+MATL_PARAM_TEXTURE = 0x0B     # Tipo de dato de los parámetros de textura (una cadena)
+
+# Nombres de los ParamId de textura (Texture0-15 y Texture16-19)
+TEXTURE_PARAM_NAMES = {92 + i: f"Texture{i}" for i in range(16)}
+TEXTURE_PARAM_NAMES.update({307 + i: f"Texture{16 + i}" for i in range(4)})
+
+def read_ssbh_pointer(data, position: int) -> Optional[int]:
+    """Lee un puntero relativo de 64 bits de SSBH y devuelve la posición absoluta (None si es nulo)"""
+    offset = struct.unpack_from('<Q', data, position)[0]
+    if offset == 0:
+        return None
+    target = position + offset
+    if target >= len(data):
+        raise ValueError(f"Puntero fuera del archivo en 0x{position:x}")
+    return target
+
+def read_ssbh_string(data, position: int) -> str:
+    """Lee una cadena SSBH (puntero relativo a texto terminado en cero)"""
+    target = read_ssbh_pointer(data, position)
+    if target is None:
+        return ""
+    end = data.find(b'\0', target)
+    if end < 0:
+        raise ValueError(f"Cadena sin terminar en 0x{target:x}")
+    return data[target:end].decode('utf-8', errors='replace')
+
 class MatlHeader:
     """Encabezado de un archivo MATL de Smash Ultimate"""
     
     def __init__(self):
         self.magic = b''           # Marca de identificación del archivo (debe ser 'LTAM')
-        self.version = 0           # Versión del formato
+        self.major_version = 0     # Versión del formato (1.5 o 1.6)
+        self.minor_version = 0
+        self.entries_offset = 0    # Posición absoluta de la primera entrada de material
         self.entry_count = 0       # Número de entradas de materiales
         
     @classmethod
-    def from_binary(cls, data: bytes) -> 'MatlHeader':
-        """Crea un MatlHeader desde datos binarios"""
+    def from_binary(cls, data) -> 'MatlHeader':
+        """Crea un MatlHeader desde datos binarios (el archivo completo, incluido el encabezado HBSS)"""
         header = cls()
-        if len(data) >= 12:
-            header.magic = data[0:4]
-            header.version = int.from_bytes(data[4:8], byteorder='little')
-            header.entry_count = int.from_bytes(data[8:12], byteorder='little')
+        if data[0:4] != SSBH_MAGIC:
+            raise ValueError("No es un archivo SSBH")
+        header.magic = data[MATL_DATA_OFFSET:MATL_DATA_OFFSET + 4]
+        if header.magic != MATL_MAGIC:
+            raise ValueError(f"No es un archivo MATL ({header.magic!r})")
+        header.major_version, header.minor_version = struct.unpack_from('<HH', data, MATL_DATA_OFFSET + 4)
+        header.entries_offset = read_ssbh_pointer(data, MATL_DATA_OFFSET + 8) or 0
+        header.entry_count = struct.unpack_from('<Q', data, MATL_DATA_OFFSET + 16)[0]
+        if header.entry_count and header.entries_offset + header.entry_count * MATL_ENTRY_SIZE > len(data):
+            raise ValueError(f"Número de materiales no válido: {header.entry_count}")
         return header
 
 class MatlEntryInfo:
@@ -686,77 +885,219 @@ class MatlEntryInfo:
     def __init__(self):
         self.material_label = ""    # Etiqueta del material
         self.shader_label = ""      # Etiqueta del shader utilizado
+        self.textures = []          # Pares (parámetro, textura)
+
+    @classmethod
+    def from_binary(cls, data, position: int) -> 'MatlEntryInfo':
+        """Lee la entrada de material que empieza en position, guardando solo sus texturas"""
+        entry = cls()
+        entry.material_label = read_ssbh_string(data, position)
+        attributes_offset = read_ssbh_pointer(data, position + 8)
+        attribute_count = struct.unpack_from('<Q', data, position + 16)[0]
+        entry.shader_label = read_ssbh_string(data, position + 24)
+        
+        if attributes_offset is None or attribute_count == 0:
+            return entry
+        if attributes_offset + attribute_count * MATL_ATTRIBUTE_SIZE > len(data):
+            raise ValueError(f"Número de parámetros no válido en {entry.material_label}: {attribute_count}")
+        
+        for i in range(attribute_count):
+            attribute = attributes_offset + i * MATL_ATTRIBUTE_SIZE
+            param_id, _, data_type = struct.unpack_from('<QQQ', data, attribute)
+            if data_type != MATL_PARAM_TEXTURE:
+                continue
+            # Los datos de una textura son a su vez una cadena SSBH
+            value = read_ssbh_pointer(data, attribute + 8)
+            texture_path = read_ssbh_string(data, value) if value is not None else ""
+            entry.textures.append((TEXTURE_PARAM_NAMES.get(param_id, f"Param{param_id}"), texture_path))
+        return entry
 
 class MatlParser:
-    """Parser simple para archivos NUMATB."""
+    """Parser de archivos NUMATB que lee directamente la estructura binaria del MATL."""
     
     def __init__(self, filepath: str):
         self.filepath = filepath
     
-    def parse(self) -> List[TextureReference]:
+    def parse(self, data=None) -> List[TextureReference]:
         """
         Parsea un archivo .numatb y devuelve una lista de referencias a texturas.
-        Este es un analizador de respaldo en caso de que ssbh_data_py no esté disponible.
-        """
-        references = []
+        Usa el lector binario propio (sin dependencias) y solo recurre a ssbh_data_py
+        si el archivo no se puede leer.
         
+        Args:
+            data: Contenido del archivo si ya se ha leído (opcional)
+        """
         try:
-            # Primero intentar con ssbh_data_py
-            if check_ssbh_data_py_available():
-                refs = try_read_matl_with_ssbh(self.filepath)
-                if refs:
-                    return refs
-            
-            # Si falla, intentar con análisis binario básico
-            with open(self.filepath, 'rb') as f:
-                data = f.read()
-            
-            # Buscar cadenas que parezcan nombres de materiales o texturas
-            material_pattern = re.compile(b'(def|mat)_[a-zA-Z0-9_]+')
-            texture_pattern = re.compile(b'[a-zA-Z0-9_/]+\.(bntx|nutexb)')
-            
-            materials = material_pattern.findall(data)
-            textures = texture_pattern.findall(data)
-            
-            # Convertir a strings
-            material_strs = [m.decode('utf-8', errors='ignore') for m in materials]
-            texture_strs = [t.decode('utf-8', errors='ignore') for t in textures]
-            
-            # Filtrar duplicados
-            material_strs = list(set(material_strs))
-            texture_strs = list(set(texture_strs))
-            
-            # Si no se encontraron materiales explícitos, usar "default"
-            if not material_strs:
-                material_strs = ["default_material"]
-            
-            # Crear referencias para cada combinación material-textura
-            for material in material_strs:
-                for i, texture in enumerate(texture_strs):
-                    ref = TextureReference(
-                        texture_path=texture,
-                        parameter_name=f"Texture{i}",
-                        material_label=material,
-                        file_path=self.filepath
-                    )
-                    references.append(ref)
-        
-        except Exception as e:
+            return self.parse_native(data)
+        except (OSError, ValueError, struct.error) as e:
             print(f"Error al parsear {self.filepath}: {e}")
         
+        if check_ssbh_data_py_available():
+            return try_read_matl_with_ssbh(self.filepath)
+        return []
+    
+    def parse_native(self, data=None) -> List[TextureReference]:
+        """
+        Lee las referencias a texturas siguiendo los punteros relativos de SSBH sobre el
+        contenido ya leído o, si no se indica, sobre el archivo mapeado en memoria.
+        Devuelve exactamente los pares material -> (parámetro, textura).
+        """
+        if data is not None:
+            if len(data) < MATL_DATA_OFFSET + 24:
+                raise ValueError("Archivo demasiado pequeño para ser un MATL")
+            return self._read_references(data)
+        
+        with open(self.filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < MATL_DATA_OFFSET + 24:
+                raise ValueError("Archivo demasiado pequeño para ser un MATL")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self._read_references(data)
+    
+    def _read_references(self, data) -> List[TextureReference]:
+        references = []
+        header = MatlHeader.from_binary(data)
+        for i in range(header.entry_count):
+            entry = MatlEntryInfo.from_binary(data, header.entries_offset + i * MATL_ENTRY_SIZE)
+            for parameter_name, texture_path in entry.textures:
+                references.append(TextureReference(
+                    texture_path=texture_path,
+                    parameter_name=parameter_name,
+                    material_label=entry.material_label,
+                    file_path=self.filepath
+                ))
         return references
 
+# Estructura de los archivos MODL (.numdlb)
+MODL_MAGIC = b'LDOM'
+MODL_ENTRIES_OFFSET = MATL_DATA_OFFSET + 0x38    # Puntero y cantidad de las entradas de mallas
+MODL_ENTRY_SIZE = 0x18                           # mesh_object_name, subíndice, material_label
+
+def parse_modl_material_map(data) -> Dict[Tuple[str, int], str]:
+    """
+    Lee solo las entradas de mallas de un MODL (sin huesos ni atributos)
+    
+    Args:
+        data: Contenido completo del archivo .numdlb
+        
+    Returns:
+        Diccionario (nombre de malla, subíndice) -> etiqueta de material
+    """
+    if data[0:4] != SSBH_MAGIC or data[MATL_DATA_OFFSET:MATL_DATA_OFFSET + 4] != MODL_MAGIC:
+        raise ValueError("No es un archivo MODL")
+    entries_offset = read_ssbh_pointer(data, MODL_ENTRIES_OFFSET)
+    entry_count = struct.unpack_from('<Q', data, MODL_ENTRIES_OFFSET + 8)[0]
+    if entries_offset is None or entry_count == 0:
+        return {}
+    if entries_offset + entry_count * MODL_ENTRY_SIZE > len(data):
+        raise ValueError(f"Número de mallas no válido: {entry_count}")
+    
+    material_map = {}
+    for i in range(entry_count):
+        entry = entries_offset + i * MODL_ENTRY_SIZE
+        mesh_name = read_ssbh_string(data, entry)
+        sub_index = struct.unpack_from('<Q', data, entry + 8)[0]
+        material_map[(mesh_name, sub_index)] = read_ssbh_string(data, entry + 16)
+    return material_map
+
+def _parse_modl_table(file_path: str, data: bytes) -> List[Tuple[str, int, str]]:
+    """Tabla (malla, subíndice, material) de un .numdlb, para MaterialCache"""
+    try:
+        material_map = parse_modl_material_map(data)
+    except (ValueError, struct.error) as e:
+        print(f"Error al parsear {file_path}: {e}")
+        material_map = {}
+        if check_ssbh_data_py_available():
+            try:
+                import ssbh_data_py
+                modl = ssbh_data_py.modl_data.read_modl(file_path)
+                material_map = {(entry.mesh_object_name, entry.mesh_object_subindex): entry.material_label
+                                for entry in modl.entries}
+            except Exception as e2:
+                print(f"Error al leer {file_path} con ssbh_data_py: {e2}")
+    return [(mesh_name, sub_index, material_label) for (mesh_name, sub_index), material_label in material_map.items()]
+
+def read_modl_material_map(file_path: str, cache: MaterialCache = None) -> Dict[Tuple[str, int], str]:
+    """
+    Devuelve el mapa malla -> material de un .numdlb, leyendo cada contenido distinto una sola vez
+    
+    Args:
+        file_path: Ruta al archivo .numdlb
+        cache: Caché de tablas a usar (opcional, por defecto MATERIAL_CACHE)
+        
+    Returns:
+        Diccionario (nombre de malla, subíndice) -> etiqueta de material (vacío si no se pudo leer)
+    """
+    table = (cache if cache is not None else MATERIAL_CACHE).table("modl", file_path, _parse_modl_table)
+    if table is None:
+        return {}
+    return {(mesh_name, sub_index): material_label for mesh_name, sub_index, material_label in table}
+
+# Sufijos de las variantes de una misma textura (color, normales, PRM...)
+KNOWN_TEXTURE_SUFFIXES = ['_col', '_nor', '_prm', '_emi', '_gao', '_inca', '_mask']
+
+class TextureIndex:
+    """
+    Índice de las texturas de un alt para resolver referencias de materiales sin recorrer la lista
+
+    Guarda el conjunto de rutas y las rutas por nombre sin extensión. Cada ruta conserva
+    su posición en la lista original para devolver siempre la primera coincidencia.
+    """
+    
+    def __init__(self, textures: List[str]):
+        self.textures = list(textures)
+        self.paths = set(self.textures)
+        self.by_stem = {}          # nombre sin extensión -> [(posición, ruta)]
+        
+        for position, texture in enumerate(self.textures):
+            stem = os.path.splitext(os.path.basename(texture))[0]
+            self.by_stem.setdefault(stem, []).append((position, texture))
+    
+    def __contains__(self, texture: str) -> bool:
+        return texture in self.paths
+    
+    def __iter__(self):
+        return iter(self.textures)
+    
+    def __len__(self) -> int:
+        return len(self.textures)
+    
+    def first_with_stem(self, stems, path_filter=None) -> Optional[str]:
+        """
+        Devuelve la primera textura (en el orden original) cuyo nombre sin extensión esté en stems
+        
+        Args:
+            stems: Nombres sin extensión aceptados
+            path_filter: Función que recibe la ruta y decide si se acepta (opcional)
+        """
+        best = None
+        for stem in stems:
+            for position, texture in self.by_stem.get(stem, ()):
+                if path_filter is not None and not path_filter(texture):
+                    continue
+                if best is None or position < best[0]:
+                    best = (position, texture)
+                break
+        return best[1] if best else None
+
 class TextureAnalyzer:
     """Analizador de archivos de texturas para Smash Ultimate"""
     
-    def __init__(self, mod_directory: str, debug: bool = False):
+    def __init__(self, mod_directory: str, debug: bool = False, install_missing: bool = True):
         self.mod_directory = mod_directory
         self.junk_dir = os.path.join(mod_directory, "junk")
+        self.mod_config = ModConfig(mod_directory)
         self.temp_dir = None
         self.use_ssbh = check_ssbh_data_py_available()
         self.debug = debug
+        # Caché de las tablas de materiales y modelos (los procesos de analyze_many usan la suya)
+        self.material_cache = MATERIAL_CACHE
+        
+        # Salidas opcionales de optimize_textures_for_alt
+        self.convert_to_text = False
+        self.text_output_dir = None
+        self.analyze_nuanmb = False
         
-        if not self.use_ssbh:
+        if not self.use_ssbh and install_missing:
             print("La biblioteca ssbh_data_py no está instalada.")
             print("Esta biblioteca permite una detección mucho más precisa de texturas.")
             self.use_ssbh = install_ssbh_data_py()
@@ -784,7 +1125,7 @@ class TextureAnalyzer:
     def analyze_alt(self, fighter_name, model_paths, etc_paths, 
                 analyze_numatb=True, analyze_nuanmb=False, analyze_numdlb=True,
                 convert_to_json=None, convert_to_txt=None, 
-                aggressive_mode=False, ultra_aggressive_mode=False):
+                aggressive_mode=False, ultra_aggressive_mode=False, alt=None, textures=None):
         """
         Analiza archivos de un alt específico para encontrar referencias a texturas
         
@@ -795,10 +1136,13 @@ class TextureAnalyzer:
             analyze_numatb: Si es True, analiza archivos de material (.numatb)
             analyze_nuanmb: Si es True, analiza archivos de animación (.nuanmb) - NO USADO
             analyze_numdlb: Si es True, analiza archivos de modelo (.numdlb)
-            convert_to_json: Si se proporciona una ruta, convierte los resultados a JSON
+            convert_to_json: Si se proporciona una ruta, exporta también los materiales a JSON (opcional,
+                el análisis se hace en memoria)
             convert_to_txt: Si se proporciona una ruta, convierte los resultados a texto plano
             aggressive_mode: Si es True, usa reglas más agresivas para marcar texturas como no utilizadas
             ultra_aggressive_mode: Si es True, usa reglas extremadamente agresivas
+            alt: Si se indica (ej: "c00"), solo se consideran las texturas de las carpetas de ese alt
+            textures: Texturas del alt ya encontradas, relativas al mod (opcional, ver scan_fighter_alts)
             
         Returns:
             Tuple con dos listas: (referencias_texturas, archivos_textura_encontrados)
@@ -809,9 +1153,9 @@ class TextureAnalyzer:
         if ultra_aggressive_mode:
             aggressive_mode = True
         
-        # Crear directorio temporal para los archivos procesados si es necesario
+        # Crear directorio temporal solo si se pide texto sin una carpeta de salida
         temp_dir = None
-        if convert_to_json or convert_to_txt:
+        if convert_to_txt and not convert_to_json:
             temp_dir = self.create_temp_dir()
         
         # Nombres de archivos de material principales a priorizar
@@ -898,16 +1242,19 @@ class TextureAnalyzer:
             material_files_by_name[base_name] = material_file
         
         # Encontrar todas las texturas disponibles
-        all_textures = []
+        all_textures = list(textures) if textures is not None else []
         fighter_dir = os.path.join(self.mod_directory, f"fighter/{fighter_name}")
         
         # Buscar en directorios de modelo para texturas
-        for root, _, files in os.walk(os.path.join(fighter_dir, "model")):
-            for file in files:
-                if file.endswith(".nutexb"):
-                    # Guardar la ruta relativa al mod_directory
-                    rel_path = os.path.relpath(os.path.join(root, file), self.mod_directory)
-                    all_textures.append(rel_path)
+        if textures is None:
+            for root, _, files in os.walk(os.path.join(fighter_dir, "model")):
+                if alt and os.path.basename(root) != alt:
+                    continue
+                for file in files:
+                    if file.endswith(".nutexb"):
+                        # Guardar la ruta relativa al mod_directory
+                        rel_path = os.path.relpath(os.path.join(root, file), self.mod_directory)
+                        all_textures.append(rel_path)
         
         print(f"Encontradas {len(all_textures)} texturas en total")
         
@@ -915,24 +1262,9 @@ class TextureAnalyzer:
         used_textures = set()
         all_texture_refs = []
         
-        # Diccionario para rastrear texturas por nombre base (sin sufijos ni extensiones)
-        base_name_to_textures = {}
-        
-        # Organizar las texturas por nombre base para facilitar la búsqueda de variantes
-        for texture in all_textures:
-            file_name = os.path.basename(texture)
-            file_base, _ = os.path.splitext(file_name)
-            
-            # Eliminar sufijos comunes para obtener el nombre base más puro
-            base_name = file_base
-            for suffix in ['_col', '_nor', '_prm', '_emi', '_gao', '_inca', '_mask']:
-                if base_name.lower().endswith(suffix):
-                    base_name = base_name[:-len(suffix)]
-                    break
-            
-            if base_name not in base_name_to_textures:
-                base_name_to_textures[base_name] = []
-            base_name_to_textures[base_name].append(texture)
+        # Índice de rutas, nombres y variantes por nombre base (sin sufijos ni extensiones),
+        # construido una sola vez para resolver todas las referencias del alt
+        texture_index = TextureIndex(all_textures)
         
         # Llevar conteo de las referencias encontradas por cada archivo principal
         core_file_refs = {file: 0 for file in core_material_files}
@@ -951,115 +1283,63 @@ class TextureAnalyzer:
             if material_file not in prioritized_material_files:
                 prioritized_material_files.append(material_file)
         
-        # Primero, convertir todos los archivos .numatb a JSON para un análisis más preciso
-        json_files = []
-        output_dir = convert_to_json if convert_to_json else temp_dir
-        
-        for material_file in prioritized_material_files:
-            if output_dir:
-                json_path = convert_numatb_to_json(material_file, output_dir)
-                if json_path:
-                    json_files.append((material_file, json_path))
-        
         # Conteo de referencias a cada textura para detectar las que son realmente críticas
         texture_reference_count = {}
         
         # Conjunto para almacenar texturas directamente utilizadas por model.numatb
         model_direct_textures = set()
         
-        # Ahora, analizar los archivos JSON para encontrar referencias a texturas
-        for original_file, json_file in json_files:
-            file_name = os.path.basename(original_file)
+        # Texturas ya resueltas de cada material, para unirlas con los materiales de los modelos
+        material_textures = {}
+        
+        # Carpeta donde se guardan los resultados convertidos (JSON y texto) si se solicitan
+        output_dir = convert_to_json if convert_to_json else temp_dir
+        
+        # Leer los materiales en memoria para encontrar referencias a texturas
+        for material_file in prioritized_material_files:
+            file_name = os.path.basename(material_file)
             print(f"Analizando archivo de material: {file_name}")
             
+            # La exportación a JSON es solo una salida adicional, el análisis no la necesita
+            if convert_to_json:
+                os.makedirs(convert_to_json, exist_ok=True)
+                convert_numatb_to_json(material_file, convert_to_json)
+            
             is_core_file = file_name in core_material_files
             is_model_file = file_name == "model.numatb"  # Marcar específicamente model.numatb
             file_refs_count = 0
             
             try:
-                with open(json_file, 'r') as f:
-                    materials = json.load(f)
+                texture_refs = read_material_references(material_file, self.material_cache)
+                print(f"  - Encontrados {len(texture_refs)} parámetros de textura")
+                all_texture_refs.extend(texture_refs)
                 
-                print(f"  - Usando conversión JSON para análisis de precisión")
-                for material in materials:
-                    material_label = material["material_label"]
-                    for texture in material["textures"]:
-                        param_id = texture["param_id"]
-                        texture_path = texture["texture_path"]
+                for texture_ref in texture_refs:
+                    # Convertir la ruta de textura en una ruta relativa completa
+                    resolved_path = self._resolve_texture_path(texture_ref.texture_path, os.path.dirname(material_file), 
+                                                             fighter_dir, texture_index)
+                    if resolved_path:
+                        print(f"  - Textura en uso: {resolved_path} ({texture_ref.parameter_name})")
+                        file_refs_count += 1
                         
-                        # Crear objeto TextureReference
-                        texture_ref = TextureReference(
-                            texture_path=texture_path,
-                            parameter_name=param_id,
-                            material_label=material_label,
-                            file_path=original_file
-                        )
-                        all_texture_refs.append(texture_ref)
+                        # Incrementar contador de referencias
+                        texture_reference_count[resolved_path] = texture_reference_count.get(resolved_path, 0) + 1
+                        material_textures.setdefault(texture_ref.material_label, []).append(resolved_path)
                         
-                        # Convertir la ruta de textura en una ruta relativa completa
-                        resolved_path = self._resolve_texture_path(texture_path, os.path.dirname(original_file), 
-                                                                 os.path.join(self.mod_directory, f"fighter/{fighter_name}"), 
-                                                                 all_textures)
-                        if resolved_path:
-                            print(f"  - Textura en uso: {resolved_path} (ParamId.{param_id})")
-                            file_refs_count += 1
-                            
-                            # Incrementar contador de referencias
-                            if resolved_path not in texture_reference_count:
-                                texture_reference_count[resolved_path] = 0
-                            texture_reference_count[resolved_path] += 1
-                            
-                            # Si la textura es referenciada por model.numatb, la agregamos al conjunto especial
-                            if is_model_file:
-                                model_direct_textures.add(resolved_path)
-                                print(f"  - Textura referenciada directamente por model.numatb: {resolved_path}")
-                            
-                            # Añadir a texturas usadas
-                            used_textures.add(resolved_path)
+                        # Si la textura es referenciada por model.numatb, la agregamos al conjunto especial
+                        if is_model_file:
+                            model_direct_textures.add(resolved_path)
+                            print(f"  - Textura referenciada directamente por model.numatb: {resolved_path}")
+                        
+                        # Añadir a texturas usadas
+                        used_textures.add(resolved_path)
                 
                 # Actualizar conteo para archivos core
                 if is_core_file:
                     core_file_refs[file_name] = file_refs_count
-                
-            except Exception as e:
-                print(f"Error al analizar JSON {json_file}: {e}")
-                
-                # Método alternativo usando análisis binario básico
-                try:
-                    parser = MatlParser(original_file)
-                    texture_refs = parser.parse()
-                    
-                    print(f"  - Encontrados {len(texture_refs)} parámetros de textura")
-                    file_refs_count = len(texture_refs)
-                    
-                    # Guardar todas las referencias
-                    all_texture_refs.extend(texture_refs)
                     
-                    for texture_ref in texture_refs:
-                        # Convertir la ruta de textura en una ruta relativa completa
-                        texture_path = self._resolve_texture_path(texture_ref.texture_path, os.path.dirname(original_file), None, all_textures)
-                        if texture_path:
-                            print(f"  - Textura en uso: {texture_path} ({texture_ref.parameter_name})")
-                            
-                            # Incrementar contador de referencias
-                            if texture_path not in texture_reference_count:
-                                texture_reference_count[texture_path] = 0
-                            texture_reference_count[texture_path] += 1
-                            
-                            # Si la textura es referenciada por model.numatb, la agregamos al conjunto especial
-                            if is_model_file:
-                                model_direct_textures.add(texture_path)
-                                print(f"  - Textura referenciada directamente por model.numatb: {texture_path}")
-                            
-                            # Añadir a texturas usadas
-                            used_textures.add(texture_path)
-                    
-                    # Actualizar conteo para archivos core
-                    if is_core_file:
-                        core_file_refs[file_name] = file_refs_count
-                        
-                except Exception as e:
-                    print(f"Error al analizar {original_file}: {e}")
+            except Exception as e:
+                print(f"Error al analizar {material_file}: {e}")
         
         # Si se ha solicitado analizar archivos de modelo, hacerlo para extraer referencias a materiales
         if analyze_numdlb and model_files:
@@ -1074,27 +1354,20 @@ class TextureAnalyzer:
                     if model_txt_path:
                         print(f"  - Modelo convertido a texto: {os.path.basename(model_txt_path)}")
                 
-                # Extraer información del modelo
-                model_info = try_read_modl_with_ssbh(model_file)
+                # Extraer solo las etiquetas de material de las mallas del modelo
+                model_materials = sorted(set(read_modl_material_map(model_file, self.material_cache).values()))
                 
-                if model_info and "material_references" in model_info:
-                    model_materials = model_info["material_references"]
+                if model_materials:
                     print(f"  - Encontrados {len(model_materials)} materiales referenciados en el modelo")
                     
                     # Buscar texturas asociadas a estos materiales
                     for material_label in model_materials:
                         print(f"  - Material del modelo: {material_label}")
                         
-                        # Buscar este material en las referencias de textura
-                        for ref in all_texture_refs:
-                            if ref.material_label == material_label:
-                                # Resolver ruta completa
-                                resolved_path = self._resolve_texture_path(ref.texture_path, os.path.dirname(ref.file_path), 
-                                                                         os.path.join(self.mod_directory, f"fighter/{fighter_name}"), 
-                                                                         all_textures)
-                                if resolved_path:
-                                    print(f"    - Textura usada por el material del modelo: {resolved_path}")
-                                    used_textures.add(resolved_path)
+                        # Texturas ya resueltas de este material en la fase de materiales
+                        for resolved_path in material_textures.get(material_label, ()):
+                            print(f"    - Textura usada por el material del modelo: {resolved_path}")
+                            used_textures.add(resolved_path)
         
         # Mostrar resumen de referencias encontradas en archivos principales
         print("\nResumen de referencias en archivos principales:")
@@ -1116,7 +1389,19 @@ class TextureAnalyzer:
         """
         Intenta encontrar la ruta completa de una textura basándose en el nombre base.
         Si no se encuentra una coincidencia exacta, busca patrones comunes (de manera estricta).
+        
+        all_textures puede ser un TextureIndex (recomendado, se construye una vez por alt)
+        o una lista de rutas, que se indexa en cada llamada.
         """
+        if not isinstance(all_textures, TextureIndex):
+            all_textures = TextureIndex(all_textures)
+        
+        # Las texturas del índice son relativas al mod, igual que deben serlo los directorios
+        if material_dir and os.path.isabs(material_dir):
+            material_dir = os.path.relpath(material_dir, self.mod_directory)
+        if fighter_dir and os.path.isabs(fighter_dir):
+            fighter_dir = os.path.relpath(fighter_dir, self.mod_directory)
+        
         # Primero, normalizar separadores en la ruta
         base_texture_path = base_texture_path.replace("\\", "/")
         
@@ -1124,9 +1409,6 @@ class TextureAnalyzer:
         texture_name = os.path.basename(base_texture_path)
         texture_name_with_ext = texture_name + ".nutexb" if not texture_name.endswith(".nutexb") else texture_name
         
-        # Lista de sufijos conocidos para variantes relacionadas
-        known_suffixes = ['_col', '_nor', '_prm', '_emi', '_gao', '_inca', '_mask']
-        
         # Verificar coincidencia exacta en el directorio del material
         if material_dir:
             exact_path = os.path.join(material_dir, texture_name_with_ext).replace("\\", "/")
@@ -1142,86 +1424,62 @@ class TextureAnalyzer:
         # Si no hay coincidencia exacta, buscar variantes por sufijo
         base_name, ext = os.path.splitext(texture_name)
         
-        # Verificar si la textura tiene un sufijo conocido o buscar variantes con sufijos conocidos
-        for texture in all_textures:
-            texture_basename = os.path.basename(texture)
-            texture_base, texture_ext = os.path.splitext(texture_basename)
-            
-            # Verificar si es una variante directa (mismo nombre base + sufijo conocido)
-            for suffix in known_suffixes:
-                # Caso 1: La referencia no tiene sufijo, pero la textura real sí
-                if texture_base == base_name + suffix:
-                    return texture
-                
-                # Caso 2: La referencia tiene sufijo, pero estamos buscando otra variante
-                for ref_suffix in known_suffixes:
-                    if base_name.endswith(ref_suffix):
-                        base_without_suffix = base_name[:-len(ref_suffix)]
-                        if texture_base == base_without_suffix + suffix:
-                            return texture
+        # Caso 1: la referencia no tiene sufijo, pero la textura real sí
+        # Caso 2: la referencia tiene sufijo, pero existe otra variante de la misma textura
+        variant_stems = [base_name + suffix for suffix in KNOWN_TEXTURE_SUFFIXES]
+        for ref_suffix in KNOWN_TEXTURE_SUFFIXES:
+            if base_name.endswith(ref_suffix):
+                base_without_suffix = base_name[:-len(ref_suffix)]
+                variant_stems.extend(base_without_suffix + suffix for suffix in KNOWN_TEXTURE_SUFFIXES)
+        
+        texture = all_textures.first_with_stem(variant_stems)
+        if texture:
+            return texture
         
         # Si llegamos aquí y el directorio del material tiene subcarpetas "textures" o "tex", intentar allí
         if material_dir:
             for subdir in ["textures", "tex"]:
                 subdir_path = os.path.join(material_dir, subdir)
-                if os.path.exists(subdir_path):
-                    for texture in all_textures:
-                        if subdir_path.replace("\\", "/") in texture.replace("\\", "/"):
-                            texture_basename = os.path.basename(texture)
-                            texture_base, texture_ext = os.path.splitext(texture_basename)
-                            
-                            # Verificar coincidencia exacta o por sufijo conocido
-                            if texture_base == base_name:
-                                return texture
-                            
-                            for suffix in known_suffixes:
-                                if texture_base == base_name + suffix:
-                                    return texture
+                if os.path.exists(os.path.join(self.mod_directory, subdir_path)):
+                    subdir_path = subdir_path.replace("\\", "/")
+                    texture = all_textures.first_with_stem(
+                        [base_name] + [base_name + suffix for suffix in KNOWN_TEXTURE_SUFFIXES],
+                        lambda path: subdir_path in path.replace("\\", "/"))
+                    if texture:
+                        return texture
         
         # Como último recurso, buscar en todo el conjunto de texturas por el nombre base
-        for texture in all_textures:
-            texture_basename = os.path.basename(texture)
-            texture_base, texture_ext = os.path.splitext(texture_basename)
-            
-            # Solo considerar coincidencias exactas o con sufijos conocidos
-            if texture_base == base_name:
-                return texture
-        
-        # No se pudo resolver la textura
-        return None
+        return all_textures.first_with_stem([base_name])
     
-    def move_unused_textures_to_junk(self, textures: List[str]) -> int:
+    def move_unused_textures_to_junk(self, textures: List[str], transaction: JunkTransaction = None) -> int:
         """
         Mueve las texturas no utilizadas a la carpeta junk
         
         Args:
             textures: Lista de rutas de texturas no utilizadas (relativas a mod_directory)
+            transaction: Transacción en la que añadir los movimientos (opcional). Si se indica,
+                los archivos se mueven al confirmarla; si no, se mueven ahora en una transacción propia
             
         Returns:
-            Número de archivos movidos
+            Número de archivos movidos (o añadidos a la transacción)
         """
-        moved_count = 0
+        own_transaction = transaction is None
+        if own_transaction:
+            transaction = JunkTransaction(self.mod_directory, self.junk_dir)
         
+        moved_count = 0
         for texture_path in textures:
-            src_path = os.path.join(self.mod_directory, texture_path)
-            dst_path = os.path.join(self.junk_dir, texture_path)
-            
-            # Crear la estructura de directorios en junk
-            dst_dir = os.path.dirname(dst_path)
-            if not os.path.exists(dst_dir):
-                os.makedirs(dst_dir)
-                
-            # Mover la textura a junk
-            try:
-                if os.path.exists(src_path):
-                    shutil.move(src_path, dst_path)
-                    moved_count += 1
-            except Exception as e:
-                print(f"Error al mover {src_path}: {e}")
+            if transaction.add(texture_path):
+                moved_count += 1
+        
+        # Todos los archivos se mueven juntos y se deshace todo si alguno falla
+        if own_transaction and not transaction.commit():
+            print("Error al mover las texturas a junk, no se movió ningún archivo")
+            return 0
                 
         return moved_count
     
-    def update_config(self, fighter_name: str, alt: str, unused_textures: List[str]) -> bool:
+    def update_config(self, fighter_name: str, alt: str, unused_textures: List[str], transaction: JunkTransaction = None) -> bool:
         """
         Actualiza el archivo config.json para eliminar las referencias a las texturas no utilizadas
         
@@ -1229,39 +1487,154 @@ class TextureAnalyzer:
             fighter_name: Nombre del luchador
             alt: Slot a actualizar
             unused_textures: Lista de texturas no utilizadas
+            transaction: Transacción con la que se escribirá config.json mediante mod_config.commit (opcional)
             
         Returns:
             True si se actualizó correctamente, False en caso contrario
         """
-        config_path = os.path.join(self.mod_directory, "config.json")
-        if not os.path.exists(config_path):
+        if not self.mod_config.exists:
             print(f"No se encontró el archivo config.json en {self.mod_directory}")
             return False
             
         try:
-            with open(config_path, 'r') as f:
-                config = json.load(f)
-                
             # Actualizar new-dir-files para eliminar referencias a texturas no utilizadas
-            if "new-dir-files" in config:
-                for dir_info, files_list in config["new-dir-files"].items():
-                    if f"fighter/{fighter_name}/model" in dir_info and alt in dir_info:
-                        # Filtrar archivos que estén en la lista de no utilizados
-                        config["new-dir-files"][dir_info] = [
-                            f for f in files_list 
-                            if f not in unused_textures
-                        ]
-            
-            # Guardar configuración actualizada
-            with open(config_path, 'w') as f:
-                json.dump(config, f, indent=4)
-                
-            return True
+            self.mod_config.remove_new_dir_files(
+                unused_textures,
+                lambda dir_info: f"fighter/{fighter_name}/model" in dir_info and alt in dir_info)
+            
+            # La transacción escribe config.json junto con los movimientos al confirmarse
+            if transaction is not None:
+                return True
+            return self.mod_config.save()
         except Exception as e:
             print(f"Error al actualizar config.json: {e}")
+            self.mod_config.invalidate()
             return False
     
-    def optimize_textures_for_alt(self, fighter_name: str, alt: str, aggressive_mode: bool = False, ultra_aggressive_mode: bool = False, protected_patterns: List[str] = None) -> Tuple[int, int]:
+    def get_alt_model_files(self, fighter_name: str, alt: str) -> List[str]:
+        """
+        Devuelve los archivos de material y modelo (.numatb y .numdlb) de las carpetas de un alt
+        
+        Args:
+            fighter_name: Nombre del luchador
+            alt: Slot (ej: "c00")
+        """
+        model_files = []
+        for root, _, files in os.walk(os.path.join(self.mod_directory, "fighter", fighter_name, "model")):
+            if os.path.basename(root) != alt:
+                continue
+            for file in files:
+                if file.endswith((".numatb", ".numdlb")):
+                    model_files.append(os.path.join(root, file))
+        return model_files
+    
+    def analyze_many(self, jobs: List[Tuple[str, str]], aggressive_mode: bool = False, ultra_aggressive_mode: bool = False,
+                     max_workers: int = None, progress_callback=None,
+                     alt_files: Dict[Tuple[str, str], Tuple[List[str], List[str]]] = None, analyze_numdlb: bool = True):
+        """
+        Analiza varios alts en paralelo con un pool de procesos y devuelve cada resultado en cuanto termina
+        
+        Args:
+            jobs: Lista de pares (luchador, alt)
+            aggressive_mode: Si es True, usa reglas más agresivas para marcar texturas como no utilizadas
+            ultra_aggressive_mode: Si es True, usa reglas extremadamente agresivas
+            max_workers: Número máximo de procesos (opcional, uno por núcleo)
+            progress_callback: Función que recibe (completados, total) tras cada alt (opcional)
+            alt_files: Archivos de cada (luchador, alt) ya encontrados por scan_fighter_alts (opcional,
+                si no se indica cada alt recorre sus carpetas)
+            analyze_numdlb: Si es True, analiza también los archivos de modelo (.numdlb)
+            
+        Yields:
+            Tuplas (luchador, alt, texturas_usadas, texturas_no_usadas) en orden de finalización
+        """
+        jobs = list(jobs)
+        total = len(jobs)
+        max_workers = max_workers or os.cpu_count() or 1
+        alt_files = alt_files or {}
+        
+        # Con un solo alt o un solo proceso no merece la pena arrancar el pool
+        if total <= 1 or max_workers == 1:
+            for done, (fighter_name, alt) in enumerate(jobs, 1):
+                model_files, textures = alt_files.get((fighter_name, alt), (None, None))
+                if model_files is None:
+                    model_files = self.get_alt_model_files(fighter_name, alt)
+                used, unused = self.analyze_alt(fighter_name, model_files, [], analyze_numdlb=analyze_numdlb,
+                                                aggressive_mode=aggressive_mode,
+                                                ultra_aggressive_mode=ultra_aggressive_mode, alt=alt, textures=textures)
+                if progress_callback:
+                    progress_callback(done, total)
+                yield fighter_name, alt, used, unused
+            return
+        
+        # Los procesos del pool parsean los materiales y comparten las tablas a través de la caché
+        # en disco (una temporal si no se ha configurado), así un contenido ya leído por otro
+        # proceso no se vuelve a parsear. El directorio se pasa a cada proceso sin tocar la
+        # caché de este, que pueden estar usando otros hilos
+        cache_dir = self.material_cache.cache_dir
+        temp_cache_dir = None
+        if not cache_dir:
+            cache_dir = temp_cache_dir = tempfile.mkdtemp(prefix="texture_analyzer_cache_")
+        try:
+            with ProcessPoolExecutor(max_workers=min(max_workers, total)) as executor:
+                futures = {
+                    executor.submit(_analyze_alt_job, self.mod_directory, fighter_name, alt,
+                                    aggressive_mode, ultra_aggressive_mode, self.debug, cache_dir, analyze_numdlb,
+                                    *alt_files.get((fighter_name, alt), (None, None))): (fighter_name, alt)
+                    for fighter_name, alt in jobs
+                }
+                try:
+                    for done, future in enumerate(as_completed(futures), 1):
+                        fighter_name, alt = futures[future]
+                        try:
+                            used, unused = future.result()
+                        except Exception as e:
+                            print(f"Error al analizar {fighter_name}/{alt}: {e}")
+                            used, unused = [], []
+                        if progress_callback:
+                            progress_callback(done, total)
+                        yield fighter_name, alt, used, unused
+                finally:
+                    # Si se deja de consumir el generador (cancelación), no se empiezan los alts pendientes
+                    for future in futures:
+                        future.cancel()
+        finally:
+            if temp_cache_dir:
+                shutil.rmtree(temp_cache_dir, ignore_errors=True)
+    
+    def analyze_mod(self, aggressive_mode: bool = False, ultra_aggressive_mode: bool = False,
+                    max_workers: int = None, progress_callback=None) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+        """
+        Analiza todos los luchadores y alts del mod en una sola pasada
+        
+        Las carpetas se recorren una vez para todo el mod y cada material con el mismo
+        contenido se parsea una sola vez, aunque lo compartan varios alts.
+        
+        Args:
+            aggressive_mode: Si es True, usa reglas más agresivas para marcar texturas como no utilizadas
+            ultra_aggressive_mode: Si es True, usa reglas extremadamente agresivas
+            max_workers: Número máximo de procesos (opcional, ver analyze_many)
+            progress_callback: Función que recibe (completados, total) tras cada alt (opcional)
+            
+        Returns:
+            Diccionario luchador -> alt -> {"used_textures": [...], "unused_textures": [...]}
+        """
+        fighters_alts = scan_fighter_alts(self.mod_directory)
+        alt_files = {(fighter_name, alt): files
+                     for fighter_name, alts in fighters_alts.items()
+                     for alt, files in alts.items()}
+        print(f"Analizando {len(alt_files)} alts de {len(fighters_alts)} luchadores...")
+        
+        results = {fighter_name: {} for fighter_name in fighters_alts}
+        for fighter_name, alt, used, unused in self.analyze_many(list(alt_files), aggressive_mode, ultra_aggressive_mode,
+                                                                 max_workers, progress_callback, alt_files):
+            results[fighter_name][alt] = {"used_textures": used, "unused_textures": unused}
+        
+        # Los resultados llegan en orden de finalización, se devuelven en el orden de los alts
+        return {fighter_name: {alt: results[fighter_name][alt] for alt in alts if alt in results[fighter_name]}
+                for fighter_name, alts in fighters_alts.items()}
+    
+    def optimize_textures_for_alt(self, fighter_name: str, alt: str, aggressive_mode: bool = False, ultra_aggressive_mode: bool = False, protected_patterns: List[str] = None,
+                                  analysis: Tuple[List[str], List[str]] = None) -> Tuple[int, int]:
         """
         Optimiza las texturas para un alt específico:
         1. Analiza qué texturas se están utilizando
@@ -1274,6 +1647,7 @@ class TextureAnalyzer:
             aggressive_mode: Si es True, usa reglas más agresivas para marcar texturas como no utilizadas
             ultra_aggressive_mode: Si es True, usa reglas extremadamente agresivas para marcar texturas como no utilizadas
             protected_patterns: Lista de patrones de nombres de archivo que nunca deben ser eliminados
+            analysis: Resultado (usadas, no usadas) ya calculado, por ejemplo con analyze_many (opcional)
             
         Returns:
             Tuple con (total_texturas, texturas_eliminadas)
@@ -1315,7 +1689,12 @@ class TextureAnalyzer:
                         print(f"Animación convertida a texto: {os.path.basename(txt_path)}")
         
         # Analizar alt para encontrar texturas utilizadas y no utilizadas
-        used_textures, unused_textures = self.analyze_alt(fighter_name, alt, aggressive_mode=aggressive_mode, ultra_aggressive_mode=ultra_aggressive_mode)
+        if analysis is not None:
+            used_textures, unused_textures = list(analysis[0]), list(analysis[1])
+        else:
+            used_textures, unused_textures = self.analyze_alt(fighter_name, self.get_alt_model_files(fighter_name, alt), [],
+                                                              aggressive_mode=aggressive_mode,
+                                                              ultra_aggressive_mode=ultra_aggressive_mode, alt=alt)
         
         # Filtrar texturas protegidas
         if protected_patterns:
@@ -1344,11 +1723,13 @@ class TextureAnalyzer:
             
             unused_textures = filtered_unused
         
-        # Mover texturas no utilizadas a junk
-        moved_count = self.move_unused_textures_to_junk(unused_textures)
-        
-        # Actualizar config.json
-        self.update_config(fighter_name, alt, unused_textures)
+        # Mover texturas no utilizadas a junk y actualizar config.json en una sola transacción
+        transaction = JunkTransaction(self.mod_directory, self.junk_dir)
+        moved_count = self.move_unused_textures_to_junk(unused_textures, transaction)
+        self.update_config(fighter_name, alt, unused_textures, transaction)
+        if not self.mod_config.commit(transaction):
+            print("Error al mover las texturas a junk, no se realizó ningún cambio")
+            moved_count = 0
         
         total = len(used_textures) + len(unused_textures)
         
@@ -1358,15 +1739,37 @@ class TextureAnalyzer:
         
         return total, moved_count
 
-def detect_fighters_and_alts(mod_directory: str) -> Dict[str, List[str]]:
+# Analizador de cada proceso del pool de analyze_many, creado una vez por proceso
+_WORKER_ANALYZER = None
+
+def _analyze_alt_job(mod_directory: str, fighter_name: str, alt: str,
+                     aggressive_mode: bool, ultra_aggressive_mode: bool, debug: bool, cache_dir: str = None,
+                     analyze_numdlb: bool = True, model_files: List[str] = None, textures: List[str] = None) -> Tuple[List[str], List[str]]:
+    """Analiza un alt dentro de un proceso del pool (ver TextureAnalyzer.analyze_many)"""
+    global _WORKER_ANALYZER
+    if _WORKER_ANALYZER is None or _WORKER_ANALYZER.mod_directory != mod_directory:
+        _WORKER_ANALYZER = TextureAnalyzer(mod_directory, debug, install_missing=False)
+    if _WORKER_ANALYZER.material_cache.cache_dir != cache_dir:
+        _WORKER_ANALYZER.material_cache = MaterialCache(cache_dir=cache_dir)
+    
+    # La salida detallada de cada alt solo se muestra en modo debug para no mezclar procesos
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if debug else devnull):
+        if model_files is None:
+            model_files = _WORKER_ANALYZER.get_alt_model_files(fighter_name, alt)
+        return _WORKER_ANALYZER.analyze_alt(fighter_name, model_files, [], analyze_numdlb=analyze_numdlb,
+                                            aggressive_mode=aggressive_mode,
+                                            ultra_aggressive_mode=ultra_aggressive_mode, alt=alt, textures=textures)
+
+def scan_fighter_alts(mod_directory: str) -> Dict[str, Dict[str, Tuple[List[str], List[str]]]]:
     """
-    Detecta automáticamente los luchadores y alts disponibles en el mod
+    Recorre una sola vez las carpetas de modelo de todos los luchadores y agrupa sus archivos por alt
     
     Args:
         mod_directory: Directorio raíz del mod
         
     Returns:
-        Diccionario con luchadores como claves y listas de alts como valores
+        Diccionario luchador -> alt -> (archivos .numatb y .numdlb, texturas relativas al mod),
+        con los alts ordenados por número
     """
     fighters_alts = {}
     fighter_path = os.path.join(mod_directory, "fighter")
@@ -1375,25 +1778,44 @@ def detect_fighters_and_alts(mod_directory: str) -> Dict[str, List[str]]:
         print(f"No se encontró el directorio fighter en {mod_directory}")
         return {}
     
-    # Recorrer todos los luchadores
     for fighter in os.listdir(fighter_path):
         fighter_model_path = os.path.join(fighter_path, fighter, "model")
         if not os.path.exists(fighter_model_path):
             continue
-            
-        alts = set()
         
-        # Buscar alts en directorios de modelos
-        for root, dirs, _ in os.walk(fighter_model_path):
+        alts = {}
+        for root, dirs, files in os.walk(fighter_model_path):
+            # Las carpetas de un alt se registran antes de visitarlas (recorrido descendente)
             for dir_name in dirs:
                 if re.match(r'^c\d+$', dir_name):
-                    alts.add(dir_name)
+                    alts.setdefault(dir_name, ([], []))
+            
+            alt_files = alts.get(os.path.basename(root))
+            if alt_files is None:
+                continue
+            for file in files:
+                if file.endswith((".numatb", ".numdlb")):
+                    alt_files[0].append(os.path.join(root, file))
+                elif file.endswith(".nutexb"):
+                    alt_files[1].append(os.path.relpath(os.path.join(root, file), mod_directory))
         
         if alts:
-            fighters_alts[fighter] = sorted(list(alts), key=lambda x: int(x.strip('c')))
+            fighters_alts[fighter] = {alt: alts[alt] for alt in sorted(alts, key=lambda x: int(x.strip('c')))}
     
     return fighters_alts
 
+def detect_fighters_and_alts(mod_directory: str) -> Dict[str, List[str]]:
+    """
+    Detecta automáticamente los luchadores y alts disponibles en el mod
+    
+    Args:
+        mod_directory: Directorio raíz del mod
+        
+    Returns:
+        Diccionario con luchadores como claves y listas de alts como valores
+    """
+    return {fighter: list(alts) for fighter, alts in scan_fighter_alts(mod_directory).items()}
+
 def optimize_mod_textures(mod_dir, aggressive_mode=False, ultra_aggressive_mode=False, debug=False, 
                           simulate=False, protected_patterns=None, restore_from_junk=False):
     """
@@ -1497,20 +1919,16 @@ def optimize_mod_textures(mod_dir, aggressive_mode=False, ultra_aggressive_mode=
             
             if len(filtered_unused) > 0:
                 print(f"Se moverían {len(filtered_unused)} texturas no utilizadas en {fighter_id}/{slot_id}:")
+                transaction = JunkTransaction(mod_dir, junk_folder)
                 for tex in filtered_unused:
                     print(f"  - {tex}")
                     
                     if not simulate:
-                        # Create target directory
-                        tex_path = os.path.join(mod_dir, tex)
-                        target_dir = os.path.join(junk_folder, os.path.dirname(tex))
-                        os.makedirs(target_dir, exist_ok=True)
-                        
-                        # Move file to junk folder
-                        try:
-                            shutil.move(tex_path, os.path.join(junk_folder, tex))
-                        except Exception as e:
-                            print(f"Error moving {tex}: {e}")
+                        transaction.add(tex)
+                
+                # Move all the files of the slot to the junk folder at once
+                if not simulate and not transaction.commit():
+                    print(f"Error moving textures of {fighter_id}/{slot_id}, no files were moved")
             else:
                 print(f"No hay texturas no utilizadas en {fighter_id}/{slot_id} (después de filtrar texturas protegidas).")
     
@@ -1534,6 +1952,7 @@ if __name__ == "__main__":
     parser.add_argument("--generate-config", action="store_true", help="Generate a sample config file")
     parser.add_argument("--protect", nargs="+", help="List of textures to protect (e.g. --protect belt bust pants)")
     parser.add_argument("--restore", action="store_true", help="Restore textures from junk folder")
+    parser.add_argument("--material-cache", help="Directory to keep parsed material and model tables between runs (optional)")
     
     args = parser.parse_args()
     
@@ -1555,6 +1974,8 @@ if __name__ == "__main__":
         sys.exit(0)
     
     protected_patterns = args.protect if args.protect else []
+    if args.material_cache:
+        MATERIAL_CACHE.cache_dir = args.material_cache
     
     optimize_mod_textures(
         args.mod_directory, 
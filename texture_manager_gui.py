@@ -3,16 +3,17 @@ import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
 import threading
+import multiprocessing
 import traceback
 import time
 import platform
 import subprocess
-import json
 import shutil
-import glob
 import webbrowser
-from texture_analyzer import TextureAnalyzer, convert_numatb_to_json, convert_numdlb_to_text
-import re
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple
+from texture_analyzer import TextureAnalyzer, convert_numatb_to_json, convert_numdlb_to_text, read_material_references
 
 def check_ultimate_tex_cli():
     """Check if ultimate_tex_cli.exe exists in the same directory"""
@@ -28,6 +29,55 @@ def check_ultimate_tex_cli():
         webbrowser.open("https://github.com/ScanMountGoat/ultimate-tex-cli/releases")
         sys.exit(1)
 
+class TextureEntry(NamedTuple):
+    """A texture of the optimizer table, stat'd once"""
+    path: str
+    size: int
+    used: bool
+
+class UsedTextureMatcher:
+    """
+    Decides whether a texture file is in use from the referenced texture names
+
+    A texture is in use when its name is referenced, when a referenced name is a prefix
+    of it, or when its name without extension is a prefix of a referenced name. Names are
+    kept in a set, with their distinct lengths, and in a sorted list, so a lookup does not
+    depend on how many names are referenced.
+    """
+
+    def __init__(self, used_textures):
+        self.names = set(used_textures)
+        self.lengths = sorted({len(name) for name in self.names})
+        self.sorted_names = sorted(self.names)
+
+    def is_used(self, texture_name):
+        if texture_name in self.names:
+            return True
+
+        # A referenced name is a prefix of the texture name
+        for length in self.lengths:
+            if length >= len(texture_name):
+                break
+            if texture_name[:length] in self.names:
+                return True
+
+        # The texture name without extension is a prefix of a referenced name
+        stem = os.path.splitext(texture_name)[0]
+        index = bisect.bisect_left(self.sorted_names, stem)
+        return index < len(self.sorted_names) and self.sorted_names[index].startswith(stem)
+
+def build_texture_table(textures, used_textures) -> List[TextureEntry]:
+    """Stats every texture once and flags the ones in use (see UsedTextureMatcher)"""
+    matcher = UsedTextureMatcher(used_textures)
+    table = []
+    for texture in textures:
+        try:
+            size = os.stat(texture).st_size
+        except OSError:
+            continue
+        table.append(TextureEntry(texture, size, matcher.is_used(os.path.basename(texture))))
+    return table
+
 class TextureManagerApp:
     def __init__(self, root):
         """Initialize the Texture Manager application"""
@@ -81,6 +131,11 @@ class TextureManagerApp:
         self.mod_directory = None
         self.cancel_requested = False
         
+        # Optimizer tab operations run one at a time on this executor, see run_optimizer_job()
+        self.optimizer_executor = ThreadPoolExecutor(max_workers=1)
+        self.optimizer_future = None
+        self.optimizer_cancel = threading.Event()
+        
         # Create menubar
         self.menubar = tk.Menu(self.root)
         self.filemenu = tk.Menu(self.menubar, tearoff=0)
@@ -349,6 +404,9 @@ class TextureManagerApp:
             # Analysis results
             analysis_results = []
             
+            # Alts whose texture references are analyzed in parallel after the conversions
+            detail_jobs = []
+            
             # Count total paths for progress
             total_paths = sum(len(alts) for alts in fighters_to_analyze.values())
             current_path = 0
@@ -411,35 +469,24 @@ class TextureManagerApp:
                     
                     # Analyze to find texture references (optional)
                     if self.show_details_var.get():
-                        self.update_console("  Analyzing texture references...")
-                        refs, texture_files = analyzer.analyze_alt(
-                            fighter, 
-                            model_paths, 
-                            etc_paths,
-                            analyze_numatb=True,
-                            analyze_nuanmb=False,
-                            analyze_numdlb=self.analyze_numdlb_var.get(),
-                            convert_to_json=self.analyze_json_var.get() and alt_output_dir,
-                            convert_to_txt=self.analyze_txt_var.get() and alt_output_dir
-                        )
-                        
-                        self.update_console(f"  - Texture references found: {len(refs)}")
-                        
-                        # Show file types found
-                        if texture_files:
-                            file_types = {}
-                            for file_path in texture_files:
-                                ext = os.path.splitext(file_path)[1].lower()
-                                file_types[ext] = file_types.get(ext, 0) + 1
-                            
-                            self.update_console("  - File types found:")
-                            for ext, count in sorted(file_types.items()):
-                                self.update_console(f"    {ext}: {count}")
+                        detail_jobs.append((fighter, alt))
                     
                     # Update progress
                     current_path += 1
                     self.update_progress(current_path, total_paths)
             
+            # Analyze texture references of every alt in parallel, as results arrive
+            if detail_jobs:
+                self.update_console(f"\nAnalyzing texture references of {len(detail_jobs)} alts...")
+                self.update_status("Analyzing texture references...")
+                for fighter, alt, used, unused in analyzer.analyze_many(detail_jobs, progress_callback=self.update_progress,
+                                                                          analyze_numdlb=self.analyze_numdlb_var.get()):
+                    if self.cancel_requested:
+                        self.update_console("Analysis cancelled by user.")
+                        self.update_status("Analysis cancelled")
+                        return
+                    self.update_console(f"  {fighter}/{alt}: {len(used)} textures in use, {len(unused)} unused")
+            
             # Calculate elapsed time
             elapsed_time = time.time() - start_time
             
@@ -821,6 +868,7 @@ class TextureManagerApp:
         ttk.Button(actions_frame, text="Optimize", command=self.optimize_selected).pack(fill=tk.X, pady=2)
         ttk.Button(actions_frame, text="Optimize All Alts", command=self.optimize_all_alts).pack(fill=tk.X, pady=2)
         ttk.Button(actions_frame, text="Restore", command=self.restore_junk).pack(fill=tk.X, pady=2)
+        ttk.Button(actions_frame, text="Cancel", command=self.cancel_optimizer_job).pack(fill=tk.X, pady=2)
         ttk.Button(actions_frame, text="Delete Files for Analysis", command=self.clean_analysis_files).pack(fill=tk.X, pady=2)
         
         # Panel de resultados (derecha)
@@ -905,6 +953,10 @@ class TextureManagerApp:
             messagebox.showwarning("Selection Required", "Please select a fighter and alt first.")
             return
         
+        if self.optimizer_busy():
+            messagebox.showinfo("Information", "An optimizer operation is already in progress.")
+            return
+        
         # Clear previous results
         self.texture_tree.delete(*self.texture_tree.get_children())
         self.optimizer_console.config(state=tk.NORMAL)
@@ -914,30 +966,15 @@ class TextureManagerApp:
         # Clear statistics
         self.stats_text.config(text="No data available")
         
-        self.log_to_optimizer(f"Analyzing textures for {self.selected_optimizer_fighter} (alt {self.selected_optimizer_alt})...")
-        
-        # Check if texture analysis data exists
-        output_dir = self.output_dir_var.get()
-        if not os.path.isabs(output_dir):
-            output_dir = os.path.join(self.mod_dir, output_dir)
-        
-        fighter = self.selected_optimizer_fighter
-        alt = f"c{self.selected_optimizer_alt}"
-        analysis_dir = os.path.join(output_dir, fighter, alt)
-        
-        if not os.path.exists(analysis_dir) or not glob.glob(os.path.join(analysis_dir, "*.json")):
-            self.log_to_optimizer(f"No texture analysis data found for {fighter}/{alt}")
-            self.log_to_optimizer("--------------------------------------------")
-            self.log_to_optimizer("Please run the NUMATB Analyzer first:")
-            self.log_to_optimizer("1. Switch to the NUMATB Analyzer tab")
-            self.log_to_optimizer(f"2. Select {fighter} and alt {self.selected_optimizer_alt}")
-            self.log_to_optimizer("3. Click 'Analyze Files'")
-            self.log_to_optimizer("4. Come back to this tab and try again")
-            self.log_to_optimizer("--------------------------------------------")
-            return
+        self.run_optimizer_job("Analyzing textures", self.analyze_optimizer_job,
+                               self.selected_optimizer_fighter, self.selected_optimizer_alt)
+    
+    def analyze_optimizer_job(self, fighter, alt):
+        """Background part of analyze_optimizer_selected, the table is shown on the main thread"""
+        self.log_to_optimizer(f"Analyzing textures for {fighter} (alt {alt})...")
         
         # Path to model/body for this alt
-        body_dir = os.path.join(self.mod_dir, "fighter", self.selected_optimizer_fighter, "model", "body", f"c{self.selected_optimizer_alt}")
+        body_dir = os.path.join(self.mod_dir, "fighter", fighter, "model", "body", f"c{alt}")
         
         # Check if the directory exists
         if not os.path.exists(body_dir):
@@ -945,20 +982,20 @@ class TextureManagerApp:
             self.log_to_optimizer("This alt might not have specific textures. Trying other locations...")
             
             # Look for textures in other locations like model/
-            model_dir = os.path.join(self.mod_dir, "fighter", self.selected_optimizer_fighter, "model")
+            model_dir = os.path.join(self.mod_dir, "fighter", fighter, "model")
             if os.path.exists(model_dir):
                 self.log_to_optimizer(f"Searching in {model_dir}...")
                 textures = []
                 for root, dirs, files in os.walk(model_dir):
                     for file in files:
-                        if file.endswith(".nutexb") and f"c{self.selected_optimizer_alt}" in root:
+                        if file.endswith(".nutexb") and f"c{alt}" in root:
                             textures.append(os.path.join(root, file))
                 
                 if not textures:
                     # If still no textures found, check if filenames contain the alt number
                     for root, dirs, files in os.walk(model_dir):
                         for file in files:
-                            if file.endswith(".nutexb") and f"c{self.selected_optimizer_alt}" in file:
+                            if file.endswith(".nutexb") and f"c{alt}" in file:
                                 textures.append(os.path.join(root, file))
                 
                 if textures:
@@ -979,41 +1016,32 @@ class TextureManagerApp:
             return
         
         # Get NUMATB files to identify actually used textures
-        model_files = self.get_model_files(self.selected_optimizer_fighter, self.selected_optimizer_alt)
+        model_files = self.get_model_files(fighter, alt)
         used_textures = self.get_used_textures(model_files)
+        if used_textures is None:
+            self.log_to_optimizer("Texture usage could not be determined for this alt.")
+            return
         
-        # Update the treeview
-        total_size = 0
-        used_size = 0
-        unused_size = 0
-        
-        for texture in textures:
-            texture_name = os.path.basename(texture)
-            texture_size = os.path.getsize(texture)
-            total_size += texture_size
-            
-            # Check if this texture is used by any material
-            is_used = any(used_name == texture_name for used_name in used_textures)
-            if not is_used:
-                # Try partial matching with texture base name (without extension)
-                texture_basename = os.path.splitext(texture_name)[0]
-                is_used = any(used_name.startswith(texture_basename) for used_name in used_textures)
-            
-            status = "In Use" if is_used else "Unused"
-            size_str = f"{texture_size/1024:.1f} KB"
-            
-            self.texture_tree.insert("", tk.END, values=(texture_name, status, size_str))
-            
-            if is_used:
-                used_size += texture_size
-            else:
-                unused_size += texture_size
+        # Stat every texture once, the treeview and the statistics come from this table
+        table = build_texture_table(textures, used_textures)
+        self.root.after(0, self.show_texture_table, table)
+    
+    def show_texture_table(self, table):
+        """Fill the optimizer treeview and statistics from a table from build_texture_table"""
+        self.texture_tree.delete(*self.texture_tree.get_children())
+        for entry in table:
+            status = "In Use" if entry.used else "Unused"
+            size_str = f"{entry.size/1024:.1f} KB"
+            self.texture_tree.insert("", tk.END, values=(os.path.basename(entry.path), status, size_str))
         
         # Update statistics
-        used_count = sum(1 for item in self.texture_tree.get_children() if self.texture_tree.item(item)["values"][1] == "Used")
-        unused_count = sum(1 for item in self.texture_tree.get_children() if self.texture_tree.item(item)["values"][1] == "Unused")
+        total_size = self.calculate_total_size(table)
+        used_size = self.calculate_used_size(table)
+        unused_size = total_size - used_size
+        used_count = sum(1 for entry in table if entry.used)
+        unused_count = len(table) - used_count
         
-        stats_text = (f"Total textures: {len(textures)} ({self.format_size(total_size)})\n"
+        stats_text = (f"Total textures: {len(table)} ({self.format_size(total_size)})\n"
                       f"In Use: {used_count} ({self.format_size(used_size)})\n"
                       f"Unused: {unused_count} ({self.format_size(unused_size)})\n"
                       f"Potential savings: {(unused_size/total_size*100 if total_size > 0 else 0):.1f}% of space")
@@ -1021,8 +1049,54 @@ class TextureManagerApp:
         self.stats_text.config(text=stats_text)
         self.log_to_optimizer("Analysis complete!")
     
+    def optimizer_busy(self):
+        """True while an optimizer tab operation is running or queued"""
+        return self.optimizer_future is not None and not self.optimizer_future.done()
+    
+    def run_optimizer_job(self, description, job, *args):
+        """
+        Run an optimizer tab operation on the shared background executor
+        
+        Only one operation runs at a time. Jobs report through log_to_optimizer and
+        report_optimizer_progress, and stop early once optimizer_cancel is set.
+        """
+        if self.optimizer_busy():
+            messagebox.showinfo("Information", "An optimizer operation is already in progress.")
+            return False
+        
+        self.optimizer_cancel.clear()
+        self.update_status(f"{description}...")
+        self.update_progress(0, 0)
+        self.optimizer_future = self.optimizer_executor.submit(self._run_optimizer_job, description, job, *args)
+        return True
+    
+    def _run_optimizer_job(self, description, job, *args):
+        try:
+            job(*args)
+            status = f"{description} cancelled" if self.optimizer_cancel.is_set() else "Ready"
+        except Exception as e:
+            self.log_to_optimizer(f"Error: {str(e)}")
+            self.log_to_optimizer(traceback.format_exc())
+            status = "Error"
+        self.root.after(0, self.update_status, status)
+    
+    def report_optimizer_progress(self, current, total):
+        """Update the progress bar from an optimizer job"""
+        self.root.after(0, self.update_progress, current, total)
+    
+    def cancel_optimizer_job(self):
+        """Cancel the running optimizer tab operation"""
+        if self.optimizer_busy():
+            self.optimizer_cancel.set()
+            self.log_to_optimizer("Requesting cancellation...")
+        else:
+            messagebox.showinfo("Information", "No optimizer operation in progress.")
+    
     def log_to_optimizer(self, message):
-        """Log message to the optimizer console"""
+        """Log message to the optimizer console, from any thread"""
+        if threading.current_thread() is not threading.main_thread():
+            self.root.after(0, self.log_to_optimizer, message)
+            return
         self.optimizer_console.config(state=tk.NORMAL)
         self.optimizer_console.insert(tk.END, message + "\n")
         self.optimizer_console.see(tk.END)
@@ -1058,87 +1132,44 @@ class TextureManagerApp:
         
         return model_files
     
-    def get_used_textures(self, model_files):
-        """Extract texture names used in model files"""
+    def get_used_textures(self, model_files, log=None):
+        """
+        Extract texture names used in model files, reading the materials in memory
+        
+        Messages go to log (the optimizer console by default). Returns None if a material
+        could not be read, so no texture in use is taken as unused
+        """
+        log = log or self.log_to_optimizer
         used_textures = set()
-        texture_references = {}  # Path -> count dictionary
-        
-        # First check for JSON files in the analysis directory
-        output_dir = self.output_dir_var.get()
-        if not os.path.isabs(output_dir):
-            output_dir = os.path.join(self.mod_dir, output_dir)
+        texture_references = {}  # Name -> count dictionary
         
-        fighter = self.selected_optimizer_fighter
-        alt = f"c{self.selected_optimizer_alt}"
-        analysis_dir = os.path.join(output_dir, fighter, alt)
+        material_files = [model_file for model_file in model_files if model_file.endswith(".numatb")]
+        if not material_files:
+            log("No material files (.numatb) found for this alt")
+            return None
         
-        self.log_to_optimizer(f"Looking for texture analysis in: {analysis_dir}")
-        
-        # If analysis directory exists, read JSON files
-        if os.path.exists(analysis_dir):
-            json_files = glob.glob(os.path.join(analysis_dir, "*.json"))
-            self.log_to_optimizer(f"Found {len(json_files)} analysis JSON files")
+        for material_file in material_files:
+            log(f"Parsing {os.path.basename(material_file)}...")
             
-            for json_file in json_files:
-                try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        material_data = json.load(f)
-                    
-                    self.log_to_optimizer(f"Parsing {os.path.basename(json_file)}...")
-                    
-                    # Extract texture references from the material data
-                    if isinstance(material_data, list):
-                        for material in material_data:
-                            if "textures" in material and isinstance(material["textures"], list):
-                                for texture in material["textures"]:
-                                    if "texture_path" in texture:
-                                        texture_path = texture["texture_path"]
-                                        
-                                        # Extract just the filename from the path
-                                        if "/" in texture_path or "\\" in texture_path:
-                                            texture_name = os.path.basename(texture_path)
-                                        else:
-                                            texture_name = texture_path
-                                            
-                                        # Add .nutexb extension if missing
-                                        if not texture_name.endswith(".nutexb"):
-                                            texture_name += ".nutexb"
-                                        
-                                        used_textures.add(texture_name)
-                                        texture_references[texture_name] = texture_references.get(texture_name, 0) + 1
-                except Exception as e:
-                    self.log_to_optimizer(f"Error reading JSON file {json_file}: {str(e)}")
+            # Parsed materials are cached by content, so the same material is not read twice
+            references = read_material_references(material_file)
+            if not references:
+                log(f"Could not read texture references from {material_file}")
+                return None
             
-            # Show texture reference details
-            if texture_references:
-                self.log_to_optimizer(f"Found {len(texture_references)} unique texture references in JSON files:")
-                for texture, count in sorted(texture_references.items(), key=lambda x: x[1], reverse=True):
-                    self.log_to_optimizer(f"  - {texture}: referenced {count} time(s)")
-        else:
-            self.log_to_optimizer(f"No texture analysis directory found for {fighter}/{alt}")
-            self.log_to_optimizer("Please run the NUMATB Analyzer first for this fighter/alt")
-        
-        # Fallback: If no textures found from JSON, try binary search in NUMATB files
-        if not used_textures:
-            self.log_to_optimizer("No texture references found in JSON files, using fallback method")
-            for model_file in model_files:
-                # For NUMATB files, parse to get texture references
-                if model_file.endswith(".numatb"):
-                    try:
-                        with open(model_file, 'rb') as f:
-                            data = f.read()
-                            
-                            # Simple search for texture name patterns in binary
-                            # This is a simplified approach - a proper parser would be more robust
-                            pattern = re.compile(rb'tex\w+\.nutexb', re.IGNORECASE)
-                            matches = pattern.findall(data)
-                            
-                            for match in matches:
-                                texture_name = match.decode('utf-8', errors='ignore')
-                                used_textures.add(texture_name)
-                                self.log_to_optimizer(f"Found texture reference (binary): {texture_name}")
-                    except Exception as e:
-                        self.log_to_optimizer(f"Error parsing {model_file}: {str(e)}")
+            for reference in references:
+                # Extract just the filename from the path and add the .nutexb extension if missing
+                texture_name = os.path.basename(reference.texture_path.replace("\\", "/"))
+                if not texture_name.endswith(".nutexb"):
+                    texture_name += ".nutexb"
+                
+                used_textures.add(texture_name)
+                texture_references[texture_name] = texture_references.get(texture_name, 0) + 1
+        
+        # Show texture reference details
+        log(f"Found {len(texture_references)} unique texture references:")
+        for texture, count in sorted(texture_references.items(), key=lambda x: x[1], reverse=True):
+            log(f"  - {texture}: referenced {count} time(s)")
         
         return used_textures
     
@@ -1146,14 +1177,13 @@ class TextureManagerApp:
         """Get file size in bytes"""
         return os.path.getsize(file_path)
     
-    def calculate_total_size(self, textures):
-        """Calculate total size of all textures"""
-        return sum(os.path.getsize(texture) for texture in textures)
+    def calculate_total_size(self, table):
+        """Calculate total size of all textures of a table from build_texture_table"""
+        return sum(entry.size for entry in table)
     
-    def calculate_used_size(self, textures, used_textures):
-        """Calculate size of used textures"""
-        return sum(os.path.getsize(texture) for texture in textures 
-                  if any(os.path.basename(texture).startswith(used_name) for used_name in used_textures))
+    def calculate_used_size(self, table):
+        """Calculate size of used textures of a table from build_texture_table"""
+        return sum(entry.size for entry in table if entry.used)
     
     def format_size(self, size_in_bytes):
         """Format size in bytes to human-readable format"""
@@ -1169,36 +1199,70 @@ class TextureManagerApp:
             messagebox.showwarning("Selection Required", "Please select a fighter and alt first.")
             return
         
-        self.log_to_optimizer(f"Optimizing textures for {self.selected_optimizer_fighter} (alt {self.selected_optimizer_alt})...")
+        self.run_optimizer_job("Optimizing textures", self.optimize_selected_job,
+                               self.selected_optimizer_fighter, self.selected_optimizer_alt)
+    
+    def optimize_selected_job(self, fighter, alt):
+        """Background part of optimize_selected"""
+        self.log_to_optimizer(f"Optimizing textures for {fighter} (alt {alt})...")
+        
+        moved_count = self.move_unused_alt_textures(fighter, alt)
+        if moved_count is not None:
+            self.log_to_optimizer(f"Optimization complete! Moved {moved_count} unused textures to junk directory.")
         
+        # Refresh the analysis
+        self.analyze_optimizer_job(fighter, alt)
+    
+    def find_unused_alt_textures(self, fighter, alt, log=None):
+        """
+        Find the model/body textures of an alt that no material of the alt uses
+        
+        Only reads files, so several alts can be checked at the same time. Returns the
+        unused entries of build_texture_table, or None if texture usage could not be determined
+        """
         # Get textures
-        path = os.path.join(self.mod_dir, "fighter", self.selected_optimizer_fighter, "model", "body", f"c{self.selected_optimizer_alt}")
+        path = os.path.join(self.mod_dir, "fighter", fighter, "model", "body", f"c{alt}")
         textures = self.get_textures_in_directory(path)
         
         # Get used textures
-        model_files = self.get_model_files(self.selected_optimizer_fighter, self.selected_optimizer_alt)
-        used_textures = self.get_used_textures(model_files)
+        model_files = self.get_model_files(fighter, alt)
+        used_textures = self.get_used_textures(model_files, log)
+        if used_textures is None:
+            return None
+        return [entry for entry in build_texture_table(textures, used_textures) if not entry.used]
+    
+    def move_unused_alt_textures(self, fighter, alt, report_progress=True, unused=None):
+        """
+        Move the model/body textures of an alt that no material of the alt uses to junk
+        
+        unused can be a result of find_unused_alt_textures that was computed beforehand.
+        Returns the number of moved textures, or None if texture usage could not be determined
+        """
+        if unused is None:
+            unused = self.find_unused_alt_textures(fighter, alt)
+        if unused is None:
+            self.log_to_optimizer("Texture usage could not be determined, no textures were moved.")
+            return None
         
         # Create junk directory if it doesn't exist
-        junk_dir = os.path.join(self.mod_dir, "junk", "fighter", self.selected_optimizer_fighter, "model", "body", f"c{self.selected_optimizer_alt}")
+        junk_dir = os.path.join(self.mod_dir, "junk", "fighter", fighter, "model", "body", f"c{alt}")
         os.makedirs(junk_dir, exist_ok=True)
         
         # Move unused textures to junk
         moved_count = 0
-        for texture in textures:
-            texture_name = os.path.basename(texture)
-            is_used = any(texture_name.startswith(used_name) for used_name in used_textures)
-            
-            if not is_used:
-                junk_path = os.path.join(junk_dir, texture_name)
-                shutil.move(texture, junk_path)
-                self.log_to_optimizer(f"Moved {texture_name} to junk")
-                moved_count += 1
-        
-        self.log_to_optimizer(f"Optimization complete! Moved {moved_count} unused textures to junk directory.")
-        
-        # Refresh the analysis
-        self.analyze_optimizer_selected()
+        for index, entry in enumerate(unused, 1):
+            if self.optimizer_cancel.is_set():
+                self.log_to_optimizer("Optimization cancelled by user.")
+                break
+            texture_name = os.path.basename(entry.path)
+            junk_path = os.path.join(junk_dir, texture_name)
+            shutil.move(entry.path, junk_path)
+            self.log_to_optimizer(f"Moved {texture_name} to junk")
+            moved_count += 1
+            if report_progress:
+                self.report_optimizer_progress(index, len(unused))
+        
+        return moved_count
     
     def optimize_all_alts(self):
         """Optimize textures for all alts of the selected fighter"""
@@ -1206,46 +1270,48 @@ class TextureManagerApp:
             messagebox.showwarning("Selection Required", "Please select a fighter first.")
             return
         
-        self.log_to_optimizer(f"Optimizing textures for all alts of {self.selected_optimizer_fighter}...")
+        fighter = self.selected_optimizer_fighter
+        self.run_optimizer_job("Optimizing all alts", self.optimize_all_alts_job,
+                               fighter, self.get_alts(fighter), self.selected_optimizer_alt)
+    
+    def optimize_all_alts_job(self, fighter, alts, current_alt):
+        """
+        Background part of optimize_all_alts, with the same rules as optimize_selected for each alt
+        
+        The unused textures of every alt are found in parallel, the moves are done one alt
+        at a time in order as the results arrive.
+        """
+        self.log_to_optimizer(f"Optimizing textures for all alts of {fighter}...")
+        if not alts:
+            return
         
-        alts = self.get_alts(self.selected_optimizer_fighter)
-        for alt in alts:
-            self.selected_optimizer_alt = alt
-            self.log_to_optimizer(f"Processing alt {alt}...")
-            
-            # Get textures
-            path = os.path.join(self.mod_dir, "fighter", self.selected_optimizer_fighter, "model", "body", f"c{alt}")
-            if not os.path.exists(path):
-                self.log_to_optimizer(f"Path not found: {path}")
-                continue
-                
-            textures = self.get_textures_in_directory(path)
-            
-            # Get used textures
-            model_files = self.get_model_files(self.selected_optimizer_fighter, alt)
-            used_textures = self.get_used_textures(model_files)
-            
-            # Create junk directory if it doesn't exist
-            junk_dir = os.path.join(self.mod_dir, "junk", "fighter", self.selected_optimizer_fighter, "model", "body", f"c{alt}")
-            os.makedirs(junk_dir, exist_ok=True)
-            
-            # Move unused textures to junk
-            moved_count = 0
-            for texture in textures:
-                texture_name = os.path.basename(texture)
-                is_used = any(texture_name.startswith(used_name) for used_name in used_textures)
-                
-                if not is_used:
-                    junk_path = os.path.join(junk_dir, texture_name)
-                    shutil.move(texture, junk_path)
-                    moved_count += 1
+        with ThreadPoolExecutor(max_workers=min(len(alts), os.cpu_count() or 1)) as pool:
+            # Each alt keeps its messages, they are shown in order when the alt is processed
+            futures = []
+            for alt in alts:
+                messages = []
+                futures.append((alt, messages, pool.submit(self.find_unused_alt_textures, fighter, alt, messages.append)))
             
-            self.log_to_optimizer(f"Alt {alt}: Moved {moved_count} unused textures to junk")
+            for index, (alt, messages, future) in enumerate(futures, 1):
+                if self.optimizer_cancel.is_set():
+                    for _, _, pending in futures:
+                        pending.cancel()
+                    self.log_to_optimizer("Optimization cancelled by user.")
+                    return
+                unused = future.result()
+                self.log_to_optimizer(f"Processing alt {alt}...")
+                for message in messages:
+                    self.log_to_optimizer(message)
+                moved_count = self.move_unused_alt_textures(fighter, alt, report_progress=False, unused=unused)
+                if moved_count is not None:
+                    self.log_to_optimizer(f"Alt {alt}: Moved {moved_count} unused textures to junk")
+                self.report_optimizer_progress(index, len(alts))
         
         self.log_to_optimizer("All alts optimization complete!")
         
-        # Refresh the analysis for the current alt
-        self.analyze_optimizer_selected()
+        # Refresh the analysis for the current alt only
+        if current_alt:
+            self.analyze_optimizer_job(fighter, current_alt)
     
     def restore_junk(self):
         """Restore textures from junk directory"""
@@ -1255,30 +1321,41 @@ class TextureManagerApp:
         
         restore_all = messagebox.askyesno("Restore Options", "Restore all alts? Select 'No' to restore only the current alt.")
         
+        fighter = self.selected_optimizer_fighter
         if restore_all:
             # Restore all alts
-            alts = self.get_alts(self.selected_optimizer_fighter)
-            for alt in alts:
-                self.restore_alt_junk(alt)
+            alts = self.get_alts(fighter)
         else:
             # Restore current alt only
             if not self.selected_optimizer_alt:
                 messagebox.showwarning("Selection Required", "Please select an alt first.")
                 return
-            self.restore_alt_junk(self.selected_optimizer_alt)
+            alts = [self.selected_optimizer_alt]
+        
+        self.run_optimizer_job("Restoring textures", self.restore_junk_job, fighter, alts, self.selected_optimizer_alt)
+    
+    def restore_junk_job(self, fighter, alts, current_alt):
+        """Background part of restore_junk"""
+        for index, alt in enumerate(alts, 1):
+            if self.optimizer_cancel.is_set():
+                self.log_to_optimizer("Restore cancelled by user.")
+                return
+            self.restore_alt_junk(fighter, alt)
+            self.report_optimizer_progress(index, len(alts))
         
         self.log_to_optimizer("Restore complete!")
         
         # Refresh the analysis
-        self.analyze_optimizer_selected()
+        if current_alt:
+            self.analyze_optimizer_job(fighter, current_alt)
     
-    def restore_alt_junk(self, alt):
+    def restore_alt_junk(self, fighter, alt):
         """Restore junk files for a specific alt"""
-        junk_dir = os.path.join(self.mod_dir, "junk", "fighter", self.selected_optimizer_fighter, "model", "body", f"c{alt}")
-        target_dir = os.path.join(self.mod_dir, "fighter", self.selected_optimizer_fighter, "model", "body", f"c{alt}")
+        junk_dir = os.path.join(self.mod_dir, "junk", "fighter", fighter, "model", "body", f"c{alt}")
+        target_dir = os.path.join(self.mod_dir, "fighter", fighter, "model", "body", f"c{alt}")
         
         if not os.path.exists(junk_dir):
-            self.log_to_optimizer(f"No junk directory found for {self.selected_optimizer_fighter} alt {alt}")
+            self.log_to_optimizer(f"No junk directory found for {fighter} alt {alt}")
             return
         
         os.makedirs(target_dir, exist_ok=True)
@@ -1313,7 +1390,7 @@ class TextureManagerApp:
         # Refresh the active tab data if needed
         if tab_name == "Texture Optimizer" and self.mod_dir:
             # If we have selections, refresh the analysis
-            if self.selected_optimizer_fighter and self.selected_optimizer_alt:
+            if self.selected_optimizer_fighter and self.selected_optimizer_alt and not self.optimizer_busy():
                 self.analyze_optimizer_selected()
 
     def browse_output_dir(self):
@@ -1356,11 +1433,19 @@ class TextureManagerApp:
         if hasattr(self, 'analyzer_thread') and self.analyzer_thread and self.analyzer_thread.is_alive():
             if not messagebox.askyesno("Warning", "An analysis is in progress. Are you sure you want to exit?"):
                 return
+        if self.optimizer_busy():
+            if not messagebox.askyesno("Warning", "An optimizer operation is in progress. Are you sure you want to exit?"):
+                return
+            # The running job stops before its next file, queued ones are dropped
+            self.optimizer_cancel.set()
+        self.optimizer_executor.shutdown(wait=False)
         self.root.destroy()
         sys.exit(0)
 
 # Create the main application window
 if __name__ == "__main__":
+    # Needed by the analysis process pool in the frozen (pyinstaller) build
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = TextureManagerApp(root)
     root.mainloop() 
\ No newline at end of file